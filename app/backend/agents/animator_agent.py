@@ -3,112 +3,206 @@ import asyncio
 from pathlib import Path
 import json
 
+from services.render_pool import get_render_pool
+from services.file_cache import FileCache, write_replacing
+from services.raster_cache import RasterStats, with_raster_stats
+from services.render_profiles import DEFAULT_RENDER_PROFILE, get_profile
+
+# Bump whenever render_scene output changes so stale cache entries are not reused
+RENDER_PROFILE_VERSION = 3
+# "numpy" composites frames directly, "moviepy" keeps the CompositeVideoClip path
+RENDERER = os.environ.get('ANIMATOR_RENDERER', 'numpy')
+# Optional motion for the numpy renderer: fade in/out seconds and description pan in pixels
+EFFECTS = {
+    "fade": float(os.environ.get('ANIMATOR_FADE_SECONDS', '0')),
+    "pan": int(os.environ.get('ANIMATOR_PAN_PIXELS', '0'))
+}
+
 
 class AnimatorAgent:
     """Animator Agent - Creates 3D scenes using Blender (simplified version using MoviePy for MVP)."""
     
-    def __init__(self):
-        self.output_dir = Path("/app/backend/output/animations")
+    def __init__(self, render_pool=None):
+        self.output_dir = Path(os.environ.get('OUTPUT_DIR', '/app/backend/output')) / "animations"
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.render_pool = render_pool or get_render_pool()
+        self.raster_stats = RasterStats()  # Caption cache counters reported by render workers
+        
+        self.cache = None
+        if os.environ.get('RENDER_CACHE_ENABLED', '1') == '1':
+            self.cache = FileCache(
+                os.environ.get('RENDER_CACHE_DIR', os.path.join(os.environ.get('OUTPUT_DIR', '/app/backend/output'), 'cache', 'animations')),
+                int(os.environ.get('RENDER_CACHE_MAX_BYTES', str(2 * 1024 ** 3))),
+                suffix=".mp4"
+            )
+    
+    def cache_key(self, scene_data: dict, profile: str = DEFAULT_RENDER_PROFILE) -> str:
+        """Key a render on everything that affects its pixels."""
+        description = " ".join(str(scene_data.get('description', 'Scene')).split())
+        return FileCache.make_key(
+            "scene",
+            RENDER_PROFILE_VERSION,
+            get_profile(profile),
+            RENDERER,
+            EFFECTS if RENDERER == 'numpy' else None,
+            description,
+            int(scene_data.get('scene_number', 1)),
+            round(float(scene_data.get('duration', 5.0)), 3)
+        )
+    
+    def output_path(self, scene_id: str, profile: str) -> Path:
+        # Previews get their own file so a final render never overwrites what users are reviewing
+        suffix = "" if profile == DEFAULT_RENDER_PROFILE else f"_{profile}"
+        return self.output_dir / f"scene_{scene_id}{suffix}.mp4"
     
-    async def create_scene_animation(self, scene_id: str, scene_data: dict) -> str:
+    async def create_scene_animation(self, scene_id: str, scene_data: dict, profile: str = DEFAULT_RENDER_PROFILE) -> str:
         """Create a 3D animated scene. For MVP, creates a simple video with text."""
         
+        output_path = self.output_path(scene_id, profile)
+        settings = get_profile(profile)
+        description = scene_data.get('description', 'Scene')
+        scene_number = scene_data.get('scene_number', 1)
+        duration = scene_data.get('duration', 5.0)
+        
         try:
-            from moviepy import TextClip, ColorClip, CompositeVideoClip
-            
-            description = scene_data.get('description', 'Scene')
-            duration = scene_data.get('duration', 5.0)
-            scene_number = scene_data.get('scene_number', 1)
-            
-            # Use smaller resolution to save memory
-            width, height = 854, 480  # 480p instead of 720p
-            
-            # Create a simple colored background
-            background = ColorClip(
-                size=(width, height),
-                color=(50, 50, 100),
-                duration=duration
-            )
-            
-            # Create text overlay with scene description
-            title_text = TextClip(
-                text=f"Scene {scene_number}",
-                font="Arial",
-                font_size=40,
-                color="white",
-                size=(800, None),
-                method='caption'
-            ).with_position(('center', 80)).with_duration(duration)
+            render = render_scene_numpy if RENDERER == 'numpy' else render_scene
+            # Encoding is blocking, so it runs in the render pool
+            async def produce(tmp_path: str):
+                await self._render(render, tmp_path, description, scene_number, duration, settings)
             
-            # Create description text (truncate if too long)
-            desc_short = description[:100] + "..." if len(description) > 100 else description
-            desc_text = TextClip(
-                text=desc_short,
-                font="Arial",
-                font_size=24,
-                color="white",
-                size=(750, None),
-                method='caption'
-            ).with_position(('center', 'center')).with_duration(duration)
-            
-            # Composite the video
-            video = CompositeVideoClip([background, title_text, desc_text])
-            
-            # Export the video
-            output_path = self.output_dir / f"scene_{scene_id}.mp4"
-            video.write_videofile(
-                str(output_path),
-                fps=15,  # Lower FPS to save memory
-                codec='libx264',
-                audio=False,
-                logger=None,
-                preset='ultrafast',  # Faster encoding
-                threads=2  # Limit threads
-            )
-            
-            # Close clips to free memory immediately
-            video.close()
-            background.close()
-            title_text.close()
-            desc_text.close()
-            
-            return str(output_path)
+            if self.cache is None:
+                # Never written in place: the file may still be linked to a cache entry
+                return await write_replacing(str(output_path), produce)
+            return await self.cache.place(self.cache_key(scene_data, profile), produce, str(output_path))
             
         except Exception as e:
             print(f"Animation error: {e}")
             # Fallback: create a very simple video
-            return await self._create_fallback_animation(scene_id, scene_data)
+            return await self._create_fallback_animation(scene_id, scene_data, profile)
+    
+    async def _render(self, render, *args) -> str:
+        path, counters = await self.render_pool.submit(with_raster_stats, render, *args, job=render.__name__)
+        self.raster_stats.add(counters)
+        return path
     
-    async def _create_fallback_animation(self, scene_id: str, scene_data: dict) -> str:
+    async def _create_fallback_animation(self, scene_id: str, scene_data: dict, profile: str = DEFAULT_RENDER_PROFILE) -> str:
         """Create a basic fallback animation."""
         try:
-            from moviepy import ColorClip
-            
-            duration = scene_data.get('duration', 5.0)
-            
-            # Just a colored background (smaller resolution)
-            video = ColorClip(
-                size=(854, 480),
-                color=(30, 30, 80),
-                duration=duration
-            )
-            
-            output_path = self.output_dir / f"scene_{scene_id}.mp4"
-            video.write_videofile(
-                str(output_path),
-                fps=15,
-                codec='libx264',
-                audio=False,
-                logger=None,
-                preset='ultrafast',
-                threads=2
-            )
-            
-            video.close()
-            
-            return str(output_path)
+            output_path = self.output_path(scene_id, profile)
+            # The scene's earlier render may be a hard link into the cache
+            return await write_replacing(str(output_path), lambda tmp_path: self.render_pool.submit(
+                render_fallback,
+                tmp_path,
+                scene_data.get('duration', 5.0),
+                get_profile(profile)
+            ))
             
         except Exception as e:
             print(f"Fallback animation error: {e}")
             raise Exception(f"Could not create animation: {e}")
+
+
+def render_scene(output_path: str, description: str, scene_number: int, duration: float, settings: dict) -> str:
+    """Render a scene clip (runs in a render pool worker)."""
+    from moviepy import ImageClip, ColorClip, CompositeVideoClip
+    from services.raster_cache import get_raster_cache
+    
+    captions = get_raster_cache()
+    
+    width, height = settings["width"], settings["height"]
+    # The layout was designed at 854x480; scale it to the profile's size
+    scale = height / 480
+    
+    # Create a simple colored background
+    background = ColorClip(
+        size=(width, height),
+        color=(50, 50, 100),
+        duration=duration
+    )
+    
+    # Create text overlay with scene description
+    title_text = ImageClip(
+        captions.caption(f"Scene {scene_number}", round(40 * scale), (255, 255, 255), round(800 * width / 854)),
+        transparent=True
+    ).with_position(('center', round(80 * scale))).with_duration(duration)
+    
+    # Create description text (truncate if too long)
+    desc_short = description[:100] + "..." if len(description) > 100 else description
+    desc_text = ImageClip(
+        captions.caption(desc_short, round(24 * scale), (255, 255, 255), round(750 * width / 854)),
+        transparent=True
+    ).with_position(('center', 'center')).with_duration(duration)
+    
+    # Composite the video
+    video = CompositeVideoClip([background, title_text, desc_text])
+    
+    # Export the video
+    video.write_videofile(
+        output_path,
+        fps=settings["fps"],
+        codec=settings["codec"],
+        audio=False,
+        logger=None,
+        preset=settings["preset"],
+        threads=settings["threads"]
+    )
+    
+    # Close clips to free memory immediately
+    video.close()
+    background.close()
+    title_text.close()
+    desc_text.close()
+    
+    return output_path
+
+
+def render_scene_numpy(output_path: str, description: str, scene_number: int, duration: float, settings: dict) -> str:
+    """Render the same layout as render_scene with the NumPy compositor (runs in a render pool worker)."""
+    from services.compositor import FrameCompositor, render_composite
+    from services.raster_cache import get_raster_cache
+    
+    captions = get_raster_cache()
+    
+    width, height = settings["width"], settings["height"]
+    # The layout was designed at 854x480; scale it to the profile's size
+    scale = height / 480
+    
+    compositor = FrameCompositor(width, height, (50, 50, 100))
+    compositor.add_caption(
+        captions.caption(f"Scene {scene_number}", round(40 * scale), (255, 255, 255), round(800 * width / 854)),
+        y=round(80 * scale)
+    )
+    desc_short = description[:100] + "..." if len(description) > 100 else description
+    compositor.add_caption(
+        captions.caption(desc_short, round(24 * scale), (255, 255, 255), round(750 * width / 854)),
+        pan=True
+    )
+    
+    render_composite(output_path, compositor, float(duration), settings, EFFECTS["fade"], EFFECTS["pan"])
+    return output_path
+
+
+def render_fallback(output_path: str, duration: float, settings: dict) -> str:
+    """Render a plain background clip (runs in a render pool worker)."""
+    from moviepy import ColorClip
+    
+    # Just a colored background, sized like regular scenes so clips still join by stream copy
+    video = ColorClip(
+        size=(settings["width"], settings["height"]),
+        color=(30, 30, 80),
+        duration=duration
+    )
+    
+    video.write_videofile(
+        output_path,
+        fps=settings["fps"],
+        codec=settings["codec"],
+        audio=False,
+        logger=None,
+        preset=settings["preset"],
+        threads=settings["threads"]
+    )
+    
+    video.close()
+    
+    return output_path
@@ -1,11 +1,122 @@
 import os
+import re
+import json
+import copy
 import asyncio
-from typing import List, Dict
+import hashlib
+from typing import AsyncIterator, Callable, List, Dict, Optional
+from cachetools import TTLCache
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 from dotenv import load_dotenv
 
+from services.singleflight import SingleFlight
+
 load_dotenv()
 
+ANALYZE_SYSTEM_MESSAGE = "You are a professional film director specializing in 3D animated movies. Your job is to break down stories into detailed scenes with camera directions, character actions, and dialogue."
+REFINE_SYSTEM_MESSAGE = "You are a 3D animation expert. Simplify scene descriptions for easy 3D rendering."
+
+
+class ResponseParseError(Exception):
+    """Raised when the model's answer can't be parsed."""
+
+
+def parse_scene_breakdown(response: str) -> Dict:
+    """Parse the director's JSON response, tolerating markdown code fences."""
+    # Extract JSON from markdown code blocks if present
+    response_text = response.strip()
+    if "```json" in response_text:
+        response_text = response_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in response_text:
+        response_text = response_text.split("```")[1].split("```")[0].strip()
+    
+    return json.loads(response_text)
+
+
+class SceneStreamParser:
+    """Incremental parser that pulls complete scene objects out of a partial response.
+    
+    Text is fed as it arrives. Anything before the first "{" (prose, code
+    fences) is skipped, and every object inside the top-level "scenes" array
+    is returned as soon as its closing brace has been seen.
+    """
+    
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.started = False
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.last_key = None
+        self.scenes_depth = None
+        self.scene_start = None
+    
+    def feed(self, chunk: str) -> List[Dict]:
+        """Consume a chunk of text and return the scenes it completed."""
+        self.buffer += chunk
+        scenes = []
+        
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+            
+            if not self.started:
+                self.started = ch == "{"
+                if not self.started:
+                    self.pos += 1
+                    continue
+            
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if len(self.stack) == 1:
+                        self.last_key = self.buffer[self.string_start + 1:self.pos]
+            elif ch == '"':
+                self.in_string = True
+                self.string_start = self.pos
+            elif ch in "{[":
+                if ch == "[" and len(self.stack) == 1 and self.last_key == "scenes":
+                    self.scenes_depth = 2
+                self.stack.append(ch)
+                if ch == "{" and self.scenes_depth and len(self.stack) == self.scenes_depth + 1:
+                    self.scene_start = self.pos
+            elif ch in "}]":
+                if ch == "}" and self.scene_start is not None and len(self.stack) == self.scenes_depth + 1:
+                    scene = self._load(self.buffer[self.scene_start:self.pos + 1])
+                    if scene is not None:
+                        scenes.append(scene)
+                    self.scene_start = None
+                elif ch == "]" and len(self.stack) == self.scenes_depth:
+                    self.scenes_depth = None
+                if self.stack:
+                    self.stack.pop()
+            
+            self.pos += 1
+        
+        # Drop text that no pending scene or key still refers to
+        if self.scene_start is None and not self.in_string:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        
+        return scenes
+    
+    @staticmethod
+    def _load(text: str) -> Optional[Dict]:
+        try:
+            return json.loads(text)
+        except ValueError:
+            pass
+        # Models sometimes leave trailing commas behind
+        try:
+            return json.loads(re.sub(r",\s*([}\]])", r"\1", text))
+        except ValueError:
+            return None
+
 
 class DirectorAgent:
     """Director Agent - Breaks down stories into scenes and creates detailed scripts."""
@@ -14,17 +125,86 @@ class DirectorAgent:
         self.api_key = os.environ.get('EMERGENT_LLM_KEY')
         self.model = "gpt-4o-mini"
         self.provider = "openai"
+        
+        # Identical prompts are answered from memory for LLM_CACHE_TTL seconds
+        self.cache = TTLCache(
+            maxsize=int(os.environ.get('LLM_CACHE_SIZE', '256')),
+            ttl=float(os.environ.get('LLM_CACHE_TTL', '3600'))
+        )
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.inflight = SingleFlight()
+        self._idle_chats: Dict[str, List] = {}
     
-    async def analyze_story(self, story_input: str, genre: str = "general") -> Dict:
-        """Analyze story and break it down into acts and scenes."""
+    def _acquire_chat(self, kind: str, system_message: str):
+        """Reuse an idle chat client for this role, or construct one."""
+        idle = self._idle_chats.get(kind)
+        if idle:
+            return idle.pop()
         
         chat = LlmChat(
             api_key=self.api_key,
-            session_id=f"director_{asyncio.current_task().get_name()}",
-            system_message="You are a professional film director specializing in 3D animated movies. Your job is to break down stories into detailed scenes with camera directions, character actions, and dialogue."
+            session_id=f"director_{kind}_{asyncio.current_task().get_name()}",
+            system_message=system_message
         ).with_model(self.provider, self.model)
+        return chat, len(getattr(chat, 'messages', None) or [])
+    
+    def _release_chat(self, kind: str, entry):
+        """Return a chat client to the pool once its history is reset."""
+        chat, base_length = entry
+        history = getattr(chat, 'messages', None)
+        # Every director call is a single self-contained turn. Clients whose
+        # history we can't trim back are dropped rather than reused.
+        if isinstance(history, list):
+            del history[base_length:]
+            self._idle_chats.setdefault(kind, []).append(entry)
+    
+    def _cache_key(self, system_message: str, prompt: str) -> str:
+        return hashlib.sha256(json.dumps(
+            [self.provider, self.model, system_message, " ".join(prompt.split())]
+        ).encode("utf-8")).hexdigest()
+    
+    async def _ask(self, kind: str, system_message: str, prompt: str, parse: Callable):
+        """Send a prompt, serving repeats from the cache and coalescing duplicates.
+        
+        Only responses that parse are cached, so a malformed answer is retried
+        next time instead of being pinned for the TTL.
+        """
+        key = self._cache_key(system_message, prompt)
+        
+        if key in self.cache:
+            self.cache_hits += 1
+            return copy.deepcopy(self.cache[key])
+        self.cache_misses += 1
         
-        prompt = f"""
+        async def call():
+            entry = self._acquire_chat(kind, system_message)
+            response = await entry[0].send_message(UserMessage(text=prompt))
+            # Only clients that completed a turn go back to the pool
+            self._release_chat(kind, entry)
+            
+            try:
+                result = parse(response)
+            except Exception as e:
+                raise ResponseParseError(f"Could not parse {kind} response: {e}")
+            self.cache[key] = result
+            return result
+        
+        return copy.deepcopy(await self.inflight.do(key, call))
+    
+    def stats(self) -> Dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / lookups, 3) if lookups else 0.0,
+            "size": len(self.cache),
+            "max_size": self.cache.maxsize,
+            **self.inflight.stats()
+        }
+    
+    def _analyze_prompt(self, story_input: str, genre: str) -> str:
+        return f"""
 Analyze this story and break it down into a detailed scene-by-scene breakdown for a 3D animated movie.
 Genre: {genre}
 
@@ -49,48 +229,83 @@ Provide a JSON response with the following structure:
 
 Keep each scene between 3-8 seconds. Make scenes simple and clear for 3D animation. Focus on basic character movements and clear backgrounds.
 """
+    
+    def _fallback_breakdown(self, story_input: str, genre: str) -> Dict:
+        """Simple single-scene breakdown used when the model's answer is unusable."""
+        return {
+            "title": "Untitled Animation",
+            "genre": genre,
+            "total_duration": "30",
+            "scenes": [
+                {
+                    "scene_number": 1,
+                    "description": story_input[:200],
+                    "dialogue": "This is a simple animated story.",
+                    "camera_direction": "Wide shot, slow pan",
+                    "duration": 5
+                }
+            ]
+        }
+    
+    async def analyze_story(self, story_input: str, genre: str = "general") -> Dict:
+        """Analyze story and break it down into acts and scenes."""
         
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        prompt = self._analyze_prompt(story_input, genre)
         
-        # Parse the response
-        import json
         try:
-            # Extract JSON from markdown code blocks if present
-            response_text = response.strip()
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-            scene_data = json.loads(response_text)
-            return scene_data
-        except Exception as e:
+            return await self._ask("analyze", ANALYZE_SYSTEM_MESSAGE, prompt, parse_scene_breakdown)
+        except ResponseParseError as e:
             # Fallback: create a simple scene breakdown
-            return {
-                "title": "Untitled Animation",
-                "genre": genre,
-                "total_duration": "30",
-                "scenes": [
-                    {
-                        "scene_number": 1,
-                        "description": story_input[:200],
-                        "dialogue": "This is a simple animated story.",
-                        "camera_direction": "Wide shot, slow pan",
-                        "duration": 5
-                    }
-                ]
-            }
+            return self._fallback_breakdown(story_input, genre)
+    
+    async def stream_scenes(self, story_input: str, genre: str = "general") -> AsyncIterator[Dict]:
+        """Yield each scene of the breakdown as soon as the model has finished writing it."""
+        
+        prompt = self._analyze_prompt(story_input, genre)
+        key = self._cache_key(ANALYZE_SYSTEM_MESSAGE, prompt)
+        
+        if key in self.cache:
+            self.cache_hits += 1
+            for scene in copy.deepcopy(self.cache[key]).get('scenes', []):
+                yield scene
+            return
+        self.cache_misses += 1
+        
+        parser = SceneStreamParser()
+        chunks = []
+        emitted = 0
+        
+        entry = self._acquire_chat("analyze", ANALYZE_SYSTEM_MESSAGE)
+        stream = getattr(entry[0], 'stream_message', None)
+        if stream is not None:
+            async for chunk in stream(UserMessage(text=prompt)):
+                chunks.append(chunk)
+                for scene in parser.feed(chunk):
+                    emitted += 1
+                    yield scene
+        else:
+            # Clients without a streaming API deliver the whole answer at once
+            response = await entry[0].send_message(UserMessage(text=prompt))
+            chunks.append(response)
+            for scene in parser.feed(response):
+                emitted += 1
+                yield scene
+        self._release_chat("analyze", entry)
+        
+        breakdown = None
+        try:
+            breakdown = parse_scene_breakdown("".join(chunks))
+            self.cache[key] = breakdown
+        except Exception:
+            pass
+        
+        if emitted == 0:
+            for scene in (breakdown or self._fallback_breakdown(story_input, genre)).get('scenes', []):
+                yield scene
     
     async def refine_scene(self, scene_description: str) -> str:
         """Refine a scene description for better 3D animation."""
         
-        chat = LlmChat(
-            api_key=self.api_key,
-            session_id=f"director_refine_{asyncio.current_task().get_name()}",
-            system_message="You are a 3D animation expert. Simplify scene descriptions for easy 3D rendering."
-        ).with_model(self.provider, self.model)
-        
         prompt = f"""Simplify this scene for basic 3D animation:
 {scene_description}
 
@@ -102,7 +317,4 @@ Provide a clear, simple description focusing on:
 
 Return only the simplified description."""
         
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        
-        return response.strip()
+        return await self._ask("refine", REFINE_SYSTEM_MESSAGE, prompt, str.strip)
@@ -1,76 +1,175 @@
 import os
 import asyncio
+import tempfile
+import threading
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Tuple
+
+from services.render_pool import get_render_pool
+from services.ffmpeg_tools import run_ffmpeg, probe_media, video_signature
+from services.hls import HLSPlaylist, PLAYLIST_NAME, read_media_playlist
+from services.render_profiles import DEFAULT_RENDER_PROFILE, encoder_settings, get_profile
+from services.metrics import BYTES_BUCKETS, current_rss_bytes, get_metrics
+from services.artifact_store import get_artifact_store
+
+# Scene fields holding the local copy of each stage output in the artifact store
+ARTIFACT_FIELDS = {"animation": "animation_path", "voice": "voice_path", "video": "video_path"}
+
+
+class NonUniformScenes(Exception):
+    """Raised when scene clips can't be joined without re-encoding."""
 
 
 class EditorAgent:
     """Editor Agent - Compiles scenes into final video with audio."""
     
-    def __init__(self):
-        self.output_dir = Path("/app/backend/output/final")
+    def __init__(self, render_pool=None):
+        self.output_dir = Path(os.environ.get('OUTPUT_DIR', '/app/backend/output')) / "final"
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.render_pool = render_pool or get_render_pool()
+        self.store = get_artifact_store()
+        self.compile_timeout = float(os.environ.get('COMPILE_JOB_TIMEOUT', '1800'))
+        # "auto" joins uniform scenes by stream copy, "compose" always re-encodes
+        self.compile_mode = os.environ.get('COMPILE_MODE', 'auto')
+        # Compose keeps at most this many scenes open at once, shrinking the
+        # window when the worker's memory passes the ceiling (0 disables it)
+        self.compile_window = int(os.environ.get('COMPILE_WINDOW_SCENES', '8'))
+        self.compile_memory_limit = int(os.environ.get('COMPILE_MEMORY_LIMIT_MB', '0')) * 1024 * 1024
+        # Scenes are muxed into finished A/V segments as soon as they are rendered
+        self.segments_dir = Path(os.environ.get('OUTPUT_DIR', '/app/backend/output')) / "segments"
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Progressive HLS: each finished scene is appended to a live playlist
+        self.hls_enabled = os.environ.get('HLS_OUTPUT', '0') == '1'
+        self.hls_dir = Path(os.environ.get('OUTPUT_DIR', '/app/backend/output')) / "hls"
+        self.hls_segment_seconds = int(os.environ.get('HLS_SEGMENT_SECONDS', '4'))
+        # With HLS the MP4 can be skipped and built later through the compile endpoint
+        self.hls_compile_mp4 = os.environ.get('HLS_COMPILE_MP4', '1') == '1'
+        self.playlists: Dict[str, HLSPlaylist] = {}
+    
+    def segment_path(self, scene_id: str, profile: str) -> Path:
+        suffix = "" if profile == DEFAULT_RENDER_PROFILE else f"_{profile}"
+        return self.segments_dir / f"segment_{scene_id}{suffix}.mp4"
     
-    async def compile_movie(self, project_id: str, scenes: List[dict]) -> str:
+    async def build_segment(self, scene: dict, profile: str = DEFAULT_RENDER_PROFILE) -> str:
+        """Mux a scene's voiceover onto its animation, giving the segment the movie is joined from."""
+        await self.materialize(scene)
+        return await self.render_pool.submit(
+            mux_scene_segment,
+            scene['animation_path'],
+            scene.get('voice_path'),
+            str(self.segment_path(scene['id'], profile)),
+            get_profile(profile)
+        )
+    
+    async def materialize(self, scene: dict):
+        """Fetch the stage outputs of a scene that was rendered on another host."""
+        if self.store is None:
+            return
+        artifacts = scene.get('artifacts') or {}
+        for stage, field in ARTIFACT_FIELDS.items():
+            path = scene.get(field)
+            if artifacts.get(stage) and path and not os.path.exists(path):
+                await self.store.fetch(artifacts[stage], path)
+    
+    def playlist_url(self, project_id: str) -> str:
+        return f"/output/hls/{project_id}/{PLAYLIST_NAME}"
+    
+    def open_playlist(self, project_id: str, reset: bool) -> HLSPlaylist:
+        """Start (or, on resume, reattach to) a project's live playlist."""
+        playlist = HLSPlaylist(self.hls_dir / project_id, self.hls_segment_seconds)
+        if reset:
+            playlist.reset()
+        else:
+            playlist.directory.mkdir(parents=True, exist_ok=True)
+        self.playlists[project_id] = playlist
+        return playlist
+    
+    def close_playlist(self, project_id: str):
+        self.playlists.pop(project_id, None)
+    
+    async def publish_scene(self, project_id: str, scene: dict, reuse: bool = False) -> bool:
+        """Package a finished scene as HLS segments and append it to the live playlist.
+        
+        With reuse, segments already packaged by an earlier attempt are kept.
+        """
+        playlist = self.playlists.get(project_id)
+        if playlist is None:
+            return False
+        
+        scene_playlist = playlist.directory / f"scene_{scene['scene_number']:04d}.m3u8"
+        if reuse and scene_playlist.exists():
+            playlist.add_scene(scene['scene_number'], read_media_playlist(str(scene_playlist)))
+            return True
+        
+        try:
+            await self.materialize(scene)
+            segments = await self.render_pool.submit(
+                package_hls_scene,
+                str(playlist.directory),
+                scene['scene_number'],
+                scene['animation_path'],
+                scene.get('voice_path'),
+                self.hls_segment_seconds,
+                get_profile(scene.get('render_profile') or DEFAULT_RENDER_PROFILE),
+                scene.get('video_path')
+            )
+        except Exception as e:
+            # The MP4 compile doesn't depend on HLS, so this never fails the project
+            print(f"[Editor] Could not package scene {scene.get('scene_number')} for HLS: {e}")
+            return False
+        
+        playlist.add_scene(scene['scene_number'], segments)
+        return True
+    
+    def finish_playlist(self, project_id: str):
+        playlist = self.playlists.get(project_id)
+        if playlist is not None:
+            playlist.finish()
+    
+    async def compile_movie(self, project_id: str, scenes: List[dict], profile: str = DEFAULT_RENDER_PROFILE) -> str:
         """Compile all scenes into a final movie."""
         
+        suffix = "" if profile == DEFAULT_RENDER_PROFILE else f"_{profile}"
+        output_path = self.output_dir / f"movie_{project_id}{suffix}.mp4"
+        
+        for scene in scenes:
+            await self.materialize(scene)
+        
+        if self.compile_mode == 'auto':
+            try:
+                return await self.render_pool.submit(
+                    concat_scenes,
+                    str(output_path),
+                    scenes,
+                    get_profile(profile),
+                    timeout=self.compile_timeout
+                )
+            except NonUniformScenes as e:
+                print(f"[Editor] {e}, falling back to re-encoding")
+            except Exception as e:
+                print(f"[Editor] Stream-copy compile failed ({e}), falling back to re-encoding")
+        
         try:
-            from moviepy import VideoFileClip, AudioFileClip, concatenate_videoclips
-            import gc
-            
-            video_clips = []
-            
-            for scene in sorted(scenes, key=lambda x: x.get('scene_number', 0)):
-                animation_path = scene.get('animation_path')
-                voice_path = scene.get('voice_path')
-                
-                if animation_path and os.path.exists(animation_path):
-                    video_clip = VideoFileClip(animation_path)
-                    
-                    # Add voiceover if available
-                    if voice_path and os.path.exists(voice_path):
-                        try:
-                            audio_clip = AudioFileClip(voice_path)
-                            # Adjust video duration to match audio if audio is longer
-                            if audio_clip.duration > video_clip.duration:
-                                video_clip = video_clip.with_duration(audio_clip.duration)
-                            video_clip = video_clip.with_audio(audio_clip)
-                        except Exception as e:
-                            print(f"Audio error for scene: {e}")
-                    
-                    video_clips.append(video_clip)
-            
-            if not video_clips:
-                raise Exception("No video clips to compile")
-            
-            # Concatenate all clips
-            final_video = concatenate_videoclips(video_clips, method="compose")
-            
-            # Export final movie with optimized settings
-            output_path = self.output_dir / f"movie_{project_id}.mp4"
-            final_video.write_videofile(
+            # Compose re-encodes the whole movie, so it runs in the render pool
+            movie_path, report = await self.render_pool.submit(
+                compile_scenes,
                 str(output_path),
-                fps=15,
-                codec='libx264',
-                audio_codec='aac',
-                logger=None,
-                preset='ultrafast',
-                threads=2,
-                bitrate='500k'  # Lower bitrate to reduce file size
+                scenes,
+                get_profile(profile),
+                self.compile_window,
+                self.compile_memory_limit,
+                timeout=self.compile_timeout
             )
-            
-            # Close clips to free memory immediately
-            for clip in video_clips:
-                try:
-                    clip.close()
-                except:
-                    pass
-            final_video.close()
-            
-            # Force garbage collection
-            gc.collect()
-            
-            return str(output_path)
+            get_metrics().observe(
+                "compile_peak_rss_bytes", report["peak_rss_bytes"], BYTES_BUCKETS,
+                "Peak worker RSS while composing a movie", profile=profile
+            )
+            print(
+                f"[Editor] Composed {report['scenes']} scenes in {report['windows']} windows "
+                f"(last window {report['window']} scenes), peak RSS {report['peak_rss_bytes'] / 1024 ** 2:.0f} MiB"
+            )
+            return movie_path
             
         except Exception as e:
             print(f"Movie compilation error: {e}")
@@ -80,3 +179,305 @@ class EditorAgent:
         """Add background music to the video (optional feature)."""
         # TODO: Implement background music mixing
         return video_path
+
+
+AUDIO_ARGS = ["-c:a", "aac", "-ar", "44100", "-ac", "2"]
+
+
+def build_scene_segment(animation_path: str, voice_path: Optional[str], output_path: str, settings: Dict) -> str:
+    """Mux a scene's voiceover onto its animation, copying the video stream.
+    
+    Every segment gets the same audio layout (silence when there is no voice)
+    so segments can be concatenated by stream copy. The video is only
+    re-encoded when the voiceover outlasts it and the last frame has to be
+    held, and then with the render profile's encoder settings, so the
+    segment still joins with clips the animator encoded.
+    """
+    video = probe_media(animation_path)
+    
+    audio = None
+    if voice_path and os.path.exists(voice_path):
+        try:
+            audio = probe_media(voice_path)
+        except Exception as e:
+            print(f"Audio error for scene: {e}")
+    
+    if audio is None:
+        args = [
+            "-i", animation_path,
+            "-f", "lavfi", "-i", "anullsrc=r=44100:cl=stereo",
+            "-map", "0:v:0", "-map", "1:a:0",
+            "-c:v", "copy", *AUDIO_ARGS, "-shortest"
+        ]
+    elif (audio["duration"] or 0) > (video["duration"] or 0) + 0.05:
+        # Hold the last frame for the rest of the voiceover
+        extra = audio["duration"] - video["duration"]
+        args = [
+            "-i", animation_path, "-i", voice_path,
+            "-map", "0:v:0", "-map", "1:a:0",
+            "-vf", f"tpad=stop_mode=clone:stop_duration={extra:.3f}",
+            "-c:v", settings["codec"], "-preset", settings["preset"], "-threads", str(settings["threads"]),
+            "-r", str(settings["fps"]), "-pix_fmt", video["pix_fmt"] or "yuv420p",
+            *AUDIO_ARGS
+        ]
+    else:
+        # Pad the voiceover with silence up to the end of the clip. With the
+        # video stream-copied ffmpeg ignores -shortest and would pad forever,
+        # so the pad and the output are capped at the clip's length
+        length = f"{video['duration']:.3f}"
+        args = [
+            "-i", animation_path, "-i", voice_path,
+            "-map", "0:v:0", "-map", "1:a:0",
+            "-c:v", "copy", "-af", f"apad=whole_dur={length}", *AUDIO_ARGS, "-t", length
+        ]
+    
+    run_ffmpeg([*args, output_path])
+    return output_path
+
+
+def mux_scene_segment(animation_path: str, voice_path: Optional[str], output_path: str, settings: Dict) -> str:
+    """Build a scene's A/V segment and move it into place (runs in a render pool worker)."""
+    tmp_path = f"{output_path}.tmp.mp4"
+    try:
+        build_scene_segment(animation_path, voice_path, tmp_path, settings)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output_path
+
+
+def muxed_segment(scene: dict) -> Optional[str]:
+    """The scene's finished A/V segment, when the scene stage produced one."""
+    video_path = scene.get('video_path')
+    return video_path if video_path and os.path.exists(video_path) else None
+
+
+def package_hls_scene(
+    directory: str, scene_number: int, animation_path: str, voice_path: Optional[str], segment_seconds: int,
+    settings: Dict, video_path: Optional[str] = None
+) -> List[Tuple[float, str]]:
+    """Cut one scene into MPEG-TS segments (runs in a render pool worker).
+    
+    The scene's muxed segment is used when there is one, otherwise the scene
+    is muxed exactly as for the MP4 so both outputs match. Either way it is
+    segmented by stream copy. Returns the (duration, filename) of each segment.
+    """
+    prefix = f"scene_{scene_number:04d}"
+    scene_playlist = os.path.join(directory, f"{prefix}.m3u8")
+    
+    if video_path and os.path.exists(video_path):
+        segment_path = video_path
+    else:
+        segment_path = os.path.join(directory, f".{prefix}.mp4")
+        build_scene_segment(animation_path, voice_path, segment_path, settings)
+    try:
+        run_ffmpeg([
+            "-i", segment_path,
+            "-c", "copy",
+            "-f", "hls",
+            "-hls_time", str(segment_seconds),
+            "-hls_playlist_type", "vod",
+            "-hls_segment_filename", os.path.join(directory, f"{prefix}_%03d.ts"),
+            scene_playlist
+        ])
+    finally:
+        if segment_path != video_path:
+            os.remove(segment_path)
+    
+    return read_media_playlist(scene_playlist)
+
+
+def concat_scenes(output_path: str, scenes: List[dict], settings: Dict) -> str:
+    """Join scene clips without re-encoding video (runs in a render pool worker)."""
+    ordered = [
+        scene for scene in sorted(scenes, key=lambda x: x.get('scene_number', 0))
+        if scene.get('animation_path') and os.path.exists(scene['animation_path'])
+    ]
+    
+    if not ordered:
+        raise Exception("No video clips to compile")
+    
+    # Stream copy only works when every clip was encoded with the same settings
+    # as the segments re-encoded below
+    rendered_with = {
+        encoder_settings(get_profile(scene.get('render_profile') or DEFAULT_RENDER_PROFILE)) for scene in ordered
+    }
+    if rendered_with != {encoder_settings(settings)}:
+        raise NonUniformScenes("Scene clips were encoded with other settings than the movie's profile")
+    
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(output_path)) as work_dir:
+        segments = []
+        for index, scene in enumerate(ordered):
+            # Scenes muxed during the scene stage are joined as they are
+            segment_path = muxed_segment(scene)
+            if segment_path is None:
+                segment_path = os.path.join(work_dir, f"segment_{index:04d}.mp4")
+                build_scene_segment(scene['animation_path'], scene.get('voice_path'), segment_path, settings)
+            segments.append(segment_path)
+        
+        # ...and when the files actually joined share their codec parameters;
+        # a held last frame means a segment was re-encoded from its clip
+        signatures = {video_signature(probe_media(segment)) for segment in segments}
+        if len(signatures) != 1 or None in signatures:
+            raise NonUniformScenes(f"Scene segments have mixed video parameters: {sorted(map(str, signatures))}")
+        
+        join_segments(segments, output_path, work_dir)
+    
+    return output_path
+
+
+def join_segments(segments: List[str], output_path: str, work_dir: str):
+    """Concatenate files with identical stream parameters by stream copy."""
+    list_path = os.path.join(work_dir, "segments.txt")
+    with open(list_path, "w") as f:
+        for segment in segments:
+            escaped = segment.replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    
+    run_ffmpeg([
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-c", "copy", "-movflags", "+faststart",
+        output_path
+    ])
+
+
+class MemoryWatch:
+    """Samples this process's RSS on a background thread while a block runs."""
+    
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+    
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes())
+    
+    def __enter__(self):
+        self.peak = current_rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+        return False
+
+
+def compile_scenes(
+    output_path: str, scenes: List[dict], settings: dict, window: int = 8, memory_limit: int = 0
+) -> Tuple[str, Dict]:
+    """Re-encode scenes with their voiceovers, window by window (runs in a render pool worker).
+    
+    Only `window` scenes have readers open at a time: each window is written to
+    its own part and closed before the next one opens, and the parts, encoded
+    with identical settings, are joined by stream copy. Returns the movie's
+    path and a report with the peak RSS seen.
+    """
+    ordered = [
+        scene for scene in sorted(scenes, key=lambda x: x.get('scene_number', 0))
+        if scene.get('animation_path') and os.path.exists(scene['animation_path'])
+    ]
+    
+    if not ordered:
+        raise Exception("No video clips to compile")
+    
+    window = max(1, window)
+    peak = 0
+    parts = []
+    position = 0
+    
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(output_path)) as work_dir:
+        while position < len(ordered):
+            batch = ordered[position:position + window]
+            part_path = os.path.join(work_dir, f"part_{len(parts):04d}.mp4")
+            with MemoryWatch() as watch:
+                compose_window(part_path, batch, settings)
+            parts.append(part_path)
+            position += len(batch)
+            peak = max(peak, watch.peak)
+            
+            if memory_limit and watch.peak > memory_limit and position < len(ordered):
+                if window == 1:
+                    raise Exception(
+                        f"Composing a single scene used {watch.peak / 1024 ** 2:.0f} MiB, "
+                        f"above the {memory_limit / 1024 ** 2:.0f} MiB ceiling"
+                    )
+                window = max(1, window // 2)
+                print(f"[Editor] Window used {watch.peak / 1024 ** 2:.0f} MiB, continuing with {window} scenes per window")
+        
+        join_segments(parts, output_path, work_dir)
+    
+    return output_path, {"scenes": len(ordered), "windows": len(parts), "window": window, "peak_rss_bytes": peak}
+
+
+def compose_window(output_path: str, scenes: List[dict], settings: dict):
+    """Concatenate a few scene clips with their voiceovers into one part, closing every reader after."""
+    from moviepy import VideoFileClip, AudioFileClip, AudioClip, concatenate_videoclips
+    import numpy as np
+    import gc
+    
+    size = (settings["width"], settings["height"])
+    opened = []  # Clips that own an ffmpeg reader
+    video_clips = []
+    window_video = None
+    
+    try:
+        for scene in scenes:
+            # A muxed segment already carries its voiceover
+            segment_path = muxed_segment(scene)
+            video_clip = VideoFileClip(segment_path or scene['animation_path'])
+            opened.append(video_clip)
+            # Parts are joined by stream copy, so every one has the profile's frame size
+            if tuple(video_clip.size) != size:
+                video_clip = video_clip.resized(size)
+            
+            # Add voiceover if available
+            voice_path = scene.get('voice_path')
+            if segment_path is None and voice_path and os.path.exists(voice_path):
+                try:
+                    audio_clip = AudioFileClip(voice_path)
+                    opened.append(audio_clip)
+                    # Adjust video duration to match audio if audio is longer
+                    if audio_clip.duration > video_clip.duration:
+                        video_clip = video_clip.with_duration(audio_clip.duration)
+                    video_clip = video_clip.with_audio(audio_clip)
+                except Exception as e:
+                    print(f"Audio error for scene: {e}")
+            
+            video_clips.append(video_clip)
+        
+        window_video = concatenate_videoclips(video_clips, method="compose")
+        if window_video.audio is None:
+            # Every part needs an audio stream for the stream-copy join
+            silence = AudioClip(
+                lambda t: np.zeros((len(t), 2)) if np.ndim(t) else np.zeros(2),
+                duration=window_video.duration,
+                fps=44100
+            )
+            window_video = window_video.with_audio(silence)
+        
+        window_video.write_videofile(
+            output_path,
+            fps=settings["fps"],
+            codec=settings["codec"],
+            audio_codec='aac',
+            audio_fps=44100,
+            logger=None,
+            preset=settings["preset"],
+            threads=settings["threads"],
+            bitrate=settings["bitrate"]
+        )
+    finally:
+        # Release the readers before the next window opens its own
+        for clip in opened:
+            try:
+                clip.close()
+            except Exception:
+                pass
+        if window_video is not None:
+            window_video.close()
+        gc.collect()
@@ -1,42 +1,128 @@
 import os
+import wave
 import asyncio
 from pathlib import Path
-from gtts import gTTS
+from concurrent.futures import ThreadPoolExecutor
+
+from services.file_cache import FileCache, link_or_copy, write_replacing
+from services.singleflight import SingleFlight
+
+
+class GTTSBackend:
+    """Google Text-to-Speech backend."""
+    
+    name = "gtts"
+    extension = "mp3"
+    
+    def __init__(self, slow: bool = False):
+        self.settings = {"slow": slow}
+    
+    def synthesize(self, text: str, language: str, output_path: str):
+        from gtts import gTTS
+        tts = gTTS(text=text, lang=language, slow=self.settings["slow"])
+        tts.save(output_path)
+
+
+class StubTTSBackend:
+    """Offline backend that writes silence sized to the text, for tests and benchmarks."""
+    
+    name = "stub"
+    extension = "wav"
+    
+    def __init__(self, seconds_per_word: float = 0.35, sample_rate: int = 22050):
+        self.settings = {"seconds_per_word": seconds_per_word, "sample_rate": sample_rate}
+    
+    def synthesize(self, text: str, language: str, output_path: str):
+        duration = max(0.5, len(text.split()) * self.settings["seconds_per_word"])
+        frames = int(duration * self.settings["sample_rate"])
+        with wave.open(output_path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(self.settings["sample_rate"])
+            f.writeframes(b"\x00\x00" * frames)
+
+
+TTS_BACKENDS = {
+    "gtts": GTTSBackend,
+    "stub": StubTTSBackend
+}
 
 
 class VoiceAgent:
     """Voice Agent - Generates voiceovers using Google Text-to-Speech."""
     
-    def __init__(self):
-        self.output_dir = Path("/app/backend/output/voices")
+    def __init__(self, backend=None):
+        self.output_dir = Path(os.environ.get('OUTPUT_DIR', '/app/backend/output')) / "voices"
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.backend = backend or TTS_BACKENDS[os.environ.get('TTS_BACKEND', 'gtts')]()
+        
+        # Dedicated, bounded pool so a burst of projects can't exhaust threads
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.environ.get('TTS_WORKERS', '4')),
+            thread_name_prefix="tts"
+        )
+        self.max_retries = int(os.environ.get('TTS_MAX_RETRIES', '3'))
+        self.retry_backoff = float(os.environ.get('TTS_RETRY_BACKOFF', '0.5'))
+        self.inflight = SingleFlight()
+        
+        self.cache = None
+        if os.environ.get('TTS_CACHE_ENABLED', '1') == '1':
+            self.cache = FileCache(
+                os.environ.get('TTS_CACHE_DIR', os.path.join(os.environ.get('OUTPUT_DIR', '/app/backend/output'), 'cache', 'voices')),
+                int(os.environ.get('TTS_CACHE_MAX_BYTES', str(512 * 1024 ** 2))),
+                suffix=f".{self.backend.extension}"
+            )
+    
+    def cache_key(self, text: str, language: str) -> str:
+        return FileCache.make_key("tts", self.backend.name, self.backend.settings, " ".join(text.split()), language)
     
     async def generate_voiceover(self, scene_id: str, text: str, language: str = "en") -> str:
-        """Generate voiceover for a scene using gTTS."""
+        """Generate voiceover for a scene using the configured TTS backend."""
         
         if not text or text.strip() == "":
             return None
         
         try:
-            # Run gTTS in a thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            output_path = self.output_dir / f"voice_{scene_id}.mp3"
+            output_path = self.output_dir / f"voice_{scene_id}.{self.backend.extension}"
             
-            await loop.run_in_executor(
-                None,
-                self._generate_tts,
-                text,
-                str(output_path),
-                language
-            )
+            async def produce(tmp_path: str):
+                await self._synthesize(text, language, tmp_path)
+            
+            if self.cache is None:
+                # Never written in place: the file may still be linked to a cache entry
+                return await write_replacing(str(output_path), produce)
             
+            # Identical lines in flight at the same time are synthesised once
+            key = self.cache_key(text, language)
+            cached_path = await self.inflight.do(key, lambda: self.cache.get_or_create(key, produce))
+            try:
+                link_or_copy(str(cached_path), str(output_path))
+            except FileNotFoundError:
+                # Evicted since it was produced
+                await self.cache.place(key, produce, str(output_path))
             return str(output_path)
             
         except Exception as e:
             print(f"Voice generation error: {e}")
             return None
     
-    def _generate_tts(self, text: str, output_path: str, language: str):
-        """Generate TTS (runs in thread pool)."""
-        tts = gTTS(text=text, lang=language, slow=False)
-        tts.save(output_path)
+    async def _synthesize(self, text: str, language: str, output_path: str):
+        """Run the TTS backend in the voice pool, retrying with exponential backoff."""
+        loop = asyncio.get_running_loop()
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                await loop.run_in_executor(
+                    self.executor,
+                    self.backend.synthesize,
+                    text,
+                    language,
+                    output_path
+                )
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                print(f"[Voice] TTS attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
@@ -1,34 +1,93 @@
+import os
+import math
 import asyncio
-from typing import Dict, List
+from typing import Dict, List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import encode
 from datetime import datetime, timezone
 
 from agents.director_agent import DirectorAgent
 from agents.animator_agent import AnimatorAgent
 from agents.voice_agent import VoiceAgent
-from agents.editor_agent import EditorAgent
+from agents.editor_agent import ARTIFACT_FIELDS, EditorAgent
 from models import Project, Scene, ProjectStatus, SceneStatus
+from services.write_coalescer import WriteCoalescer
+from services.events import EventBus, project_event, scene_event
+from services.render_profiles import DEFAULT_RENDER_PROFILE, PREVIEW_PROFILE, get_profile
+from services.ffmpeg_tools import probe_media
+from services.file_cache import FileCache
+from services.metrics import get_metrics
+from services.profiling import ProfilingSession, ProfilingBusy
 
 
 class WorkflowAgent:
     """Workflow Orchestrator - Manages the entire pipeline from story to final video."""
     
-    def __init__(self, db: AsyncIOMotorDatabase):
+    def __init__(self, db: AsyncIOMotorDatabase, events: Optional[EventBus] = None):
         self.db = db
         self.director = DirectorAgent()
         self.animator = AnimatorAgent()
         self.voice = VoiceAgent()
         self.editor = EditorAgent()
-        self.active_projects = {}  # Track running projects
+        self.active_projects = {}  # Track running projects and their progress
+        self.writes = WriteCoalescer(db)  # Batches the per-scene hot-path writes
+        self.events = events or EventBus()  # Pushes status transitions to watchers
+        self.metrics = get_metrics()
+        self.store = self.editor.store  # Shares stage outputs between hosts when configured
+        self.profile_dir = os.path.join(os.environ.get('OUTPUT_DIR', '/app/backend/output'), 'profiles')
+        
+        # Scene fan-out: "concurrent" renders scenes in parallel (animation and
+        # voice for a scene also run together), "sequential" keeps the old loop.
+        self.scene_mode = os.environ.get('SCENE_PROCESSING_MODE', 'concurrent')
+        self.scene_concurrency = int(os.environ.get('SCENE_CONCURRENCY', '4'))
+        self.global_scene_slots = asyncio.Semaphore(
+            int(os.environ.get('GLOBAL_SCENE_CONCURRENCY', os.cpu_count() or 4))
+        )
+        # Start rendering scenes while the director is still writing the rest
+        self.director_streaming = os.environ.get('DIRECTOR_STREAMING', '0') == '1'
+        # "audio_first" voices scenes with dialogue before animating them, and
+        # renders the animation to the voiceover's length instead of the director's guess
+        self.audio_first = os.environ.get('SCENE_SCHEDULING', 'parallel') == 'audio_first'
     
     async def start_project(self, project_id: str):
         """Start processing a project through the entire pipeline."""
+        await self._run_project(project_id, resume=False)
+    
+    async def resume_project(self, project_id: str):
+        """Continue an interrupted project from its last checkpoint.
         
+        Scenes whose animation and voiceover are already on disk are not redone;
+        the director only runs again if its breakdown never finished.
+        """
+        await self._run_project(project_id, resume=True)
+    
+    async def resume_interrupted_projects(self) -> List[str]:
+        """Resume every project left in `processing` by a previous process.
+        
+        Projects carry no owner in inline mode, so this assumes this is the only
+        API process; with several, use the job queue, which recovers projects
+        through expired leases.
+        """
+        project_ids = [
+            project["id"]
+            async for project in self.db.projects.find(
+                {"status": ProjectStatus.PROCESSING.value}, {"_id": 0, "id": 1}
+            )
+            if project["id"] not in self.active_projects
+        ]
+        for project_id in project_ids:
+            print(f"[Resume] Resuming interrupted project {project_id}")
+            asyncio.create_task(self.resume_project(project_id))
+        return project_ids
+    
+    async def _run_project(self, project_id: str, resume: bool):
+        """Run the pipeline, either from scratch or from the stored checkpoint."""
         if project_id in self.active_projects:
             print(f"Project {project_id} is already running")
             return
         
-        self.active_projects[project_id] = True
+        self.active_projects[project_id] = {"total_scenes": 0, "completed_scenes": 0}
+        profiling = None
         
         try:
             # Get project from database
@@ -38,118 +97,581 @@ class WorkflowAgent:
             
             project = Project(**project_data)
             
-            # Update status to processing
-            await self.db.projects.update_one(
-                {"id": project_id},
-                {"$set": {"status": ProjectStatus.PROCESSING.value, "updated_at": datetime.now(timezone.utc).isoformat()}}
-            )
+            if project.profiling:
+                profiling = self._start_profiling(project_id)
             
-            # Step 1: Director analyzes story and creates scenes
-            print(f"[Director] Analyzing story for project {project_id}")
-            scene_breakdown = await self.director.analyze_story(project.story_input, project.genre)
+            previewing = project.preview_first and not project.preview_accepted
+            profile = self.run_profile(project)
+            self.active_projects[project_id]["profile"] = profile
             
-            # Create scene documents
-            scenes = []
-            for scene_data in scene_breakdown.get('scenes', []):
-                scene = Scene(
-                    project_id=project_id,
-                    scene_number=scene_data['scene_number'],
-                    description=scene_data['description'],
-                    dialogue=scene_data.get('dialogue'),
-                    camera_direction=scene_data.get('camera_direction'),
-                    duration=scene_data.get('duration', 5.0)
-                )
-                scenes.append(scene)
-            
-            # Save scenes to database
-            for scene in scenes:
-                scene_dict = scene.model_dump()
-                scene_dict['created_at'] = scene_dict['created_at'].isoformat()
-                await self.db.scenes.insert_one(scene_dict)
+            checkpointed = None
+            if resume and project.breakdown_complete:
+                checkpointed = [
+                    Scene(**scene_data)
+                    for scene_data in await self.db.scenes.find({"project_id": project_id}, {"_id": 0}).to_list(None)
+                ]
             
-            # Update project with total scenes
-            await self.db.projects.update_one(
-                {"id": project_id},
-                {"$set": {"total_scenes": len(scenes), "updated_at": datetime.now(timezone.utc).isoformat()}}
-            )
+            if self.editor.hls_enabled:
+                # A resumed run keeps the segments of scenes that are already done,
+                # unless it is the final pass replacing a preview
+                final_after_preview = project.status == ProjectStatus.PREVIEW_READY
+                self.editor.open_playlist(project_id, reset=checkpointed is None or final_after_preview)
+            await self._update_project(project_id, {
+                "playlist_url": self.editor.playlist_url(project_id) if self.editor.hls_enabled else None
+            })
             
-            # Step 2: Process each scene (Animator + Voice)
-            for scene in scenes:
-                print(f"[Processing] Scene {scene.scene_number} for project {project_id}")
-                
-                # Update scene status
-                await self.db.scenes.update_one(
-                    {"id": scene.id},
-                    {"$set": {"status": SceneStatus.ANIMATING.value}}
-                )
-                
-                # Animator creates the scene
-                animation_path = await self.animator.create_scene_animation(
-                    scene.id,
-                    scene.model_dump()
-                )
-                
-                # Update scene with animation path
-                await self.db.scenes.update_one(
-                    {"id": scene.id},
-                    {"$set": {"animation_path": animation_path, "status": SceneStatus.VOICE_GENERATING.value}}
-                )
-                
-                # Voice agent generates voiceover
-                voice_path = None
-                if scene.dialogue:
-                    voice_path = await self.voice.generate_voiceover(scene.id, scene.dialogue)
-                    await self.db.scenes.update_one(
-                        {"id": scene.id},
-                        {"$set": {"voice_path": voice_path}}
-                    )
-                
-                # Mark scene as completed
-                await self.db.scenes.update_one(
-                    {"id": scene.id},
-                    {"$set": {"status": SceneStatus.COMPLETED.value}}
-                )
-                
-                # Update project progress
-                await self.db.projects.update_one(
-                    {"id": project_id},
-                    {"$inc": {"completed_scenes": 1}, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}}
-                )
+            if checkpointed is not None:
+                await self._resume_scenes(project_id, checkpointed)
+            else:
+                await self._run_director_and_scenes(project_id, project)
+            
+            self.editor.finish_playlist(project_id)
             
             # Step 3: Editor compiles all scenes into final movie
-            print(f"[Editor] Compiling final movie for project {project_id}")
-            scenes_data = await self.db.scenes.find({"project_id": project_id}, {"_id": 0}).to_list(1000)
+            if previewing:
+                preview_path = await self._compile(project_id, profile)
+                await self._update_project(project_id, {
+                    "status": ProjectStatus.PREVIEW_READY.value,
+                    "preview_url": preview_path,
+                    "updated_at": datetime.now(timezone.utc).isoformat()
+                })
+                print(f"[SUCCESS] Preview for project {project_id} ready: {preview_path}")
+                return
             
-            final_video_path = await self.editor.compile_movie(project_id, scenes_data)
+            final_video_path = None
+            if self.editor.hls_enabled and not self.editor.hls_compile_mp4:
+                print(f"[Editor] Project {project_id} streamed as HLS, MP4 left for on-demand compile")
+                await self.writes.flush()
+            else:
+                final_video_path = await self._compile(project_id, profile)
             
             # Update project with final video and mark as completed
-            await self.db.projects.update_one(
-                {"id": project_id},
-                {"$set": {
-                    "status": ProjectStatus.COMPLETED.value,
-                    "video_url": final_video_path,
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }}
-            )
+            await self._update_project(project_id, {
+                "status": ProjectStatus.COMPLETED.value,
+                "video_url": final_video_path,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            })
             
             print(f"[SUCCESS] Project {project_id} completed! Video: {final_video_path}")
             
         except Exception as e:
             print(f"[ERROR] Project {project_id} failed: {e}")
+            try:
+                await self.writes.flush()
+            except Exception as flush_error:
+                print(f"[ERROR] Could not flush scene updates for {project_id}: {flush_error}")
+            
             # Mark project as failed
-            await self.db.projects.update_one(
-                {"id": project_id},
-                {"$set": {
-                    "status": ProjectStatus.FAILED.value,
-                    "error_message": str(e),
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }}
-            )
-        
+            await self._update_project(project_id, {
+                "status": ProjectStatus.FAILED.value,
+                "error_message": str(e),
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            })
+            
         finally:
             # Remove from active projects
             if project_id in self.active_projects:
                 del self.active_projects[project_id]
+            self.editor.close_playlist(project_id)
+            if profiling is not None:
+                await self._finish_profiling(project_id, profiling)
+    
+    def _start_profiling(self, project_id: str) -> Optional[ProfilingSession]:
+        session = ProfilingSession(project_id, self.profile_dir)
+        try:
+            session.start()
+        except ProfilingBusy as e:
+            print(f"[Profiling] Running project {project_id} unprofiled: {e}")
+            return None
+        print(f"[Profiling] Profiling project {project_id}")
+        return session
+    
+    async def _finish_profiling(self, project_id: str, session: ProfilingSession):
+        try:
+            archive_path = session.stop()
+        except Exception as e:
+            print(f"[Profiling] Could not write the profile of project {project_id}: {e}")
+            return
+        await self._update_project(project_id, {
+            "profile_url": f"/output/profiles/{os.path.basename(archive_path)}"
+        })
+        print(f"[Profiling] Profile for project {project_id} written to {archive_path}")
+    
+    @staticmethod
+    def _final_profile(project: Project) -> str:
+        return project.render_profile or DEFAULT_RENDER_PROFILE
+    
+    def run_profile(self, project: Project) -> str:
+        """Profile the project's next run renders with."""
+        # Preview-first projects render everything twice: a cheap preview,
+        # then the real profile once the preview has been accepted
+        if project.preview_first and not project.preview_accepted:
+            return PREVIEW_PROFILE
+        return self._final_profile(project)
+    
+    def _profile(self, project_id: str) -> str:
+        """Profile the current run of a project renders with."""
+        return self.active_projects.get(project_id, {}).get("profile", DEFAULT_RENDER_PROFILE)
+    
+    async def _compile(self, project_id: str, profile: str) -> str:
+        print(f"[Editor] Compiling {profile} movie for project {project_id}")
+        await self.writes.flush()  # Stage boundary: the editor reads what scenes wrote
+        scenes_data = await self.db.scenes.find({"project_id": project_id}, {"_id": 0}).to_list(1000)
+        
+        with self.metrics.span("compile", project_id=project_id, profile=profile) as span:
+            output_path = await self.editor.compile_movie(project_id, scenes_data, profile)
+            span.bytes_written = os.path.getsize(output_path)
+        
+        if self.store is not None:
+            with self.metrics.span("store", project_id=project_id, artifact="movie"):
+                key = await self.store.put_file(output_path)
+            project = await self.db.projects.find_one({"id": project_id}, {"_id": 0, "artifacts": 1}) or {}
+            kind = "preview" if profile == PREVIEW_PROFILE else "video"
+            await self._update_project(project_id, {"artifacts": {**project.get("artifacts", {}), kind: key}})
+        return output_path
+    
+    async def compile_project(self, project_id: str):
+        """Build the MP4 for a completed project that was only streamed as HLS."""
+        try:
+            project = Project(**await self.db.projects.find_one({"id": project_id}, {"_id": 0}))
+            final_video_path = await self._compile(project_id, self._final_profile(project))
+        except Exception as e:
+            print(f"[ERROR] On-demand compile for {project_id} failed: {e}")
+            return
+        
+        await self._update_project(project_id, {
+            "video_url": final_video_path,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        })
+    
+    async def _run_director_and_scenes(self, project_id: str, project: Project):
+        """Steps 1 and 2 from scratch: break the story down, then render every scene."""
+        # Scenes from an attempt whose breakdown never finished can't be trusted
+        await self.db.scenes.delete_many({"project_id": project_id})
+        
+        # Update status to processing
+        await self._update_project(project_id, {
+            "status": ProjectStatus.PROCESSING.value,
+            "total_scenes": 0,
+            "completed_scenes": 0,
+            "breakdown_complete": False,
+            "error_message": None,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        })
+        
+        if self.director_streaming:
+            # Steps 1 and 2 overlap: scenes are dispatched as the director writes them
+            print(f"[Director] Streaming scene breakdown for project {project_id}")
+            await self._stream_and_process_scenes(project_id, project)
+            return
+        
+        # Step 1: Director analyzes story and creates scenes
+        print(f"[Director] Analyzing story for project {project_id}")
+        with self.metrics.span("director", project_id=project_id, mode="batch"):
+            scene_breakdown = await self.director.analyze_story(project.story_input, project.genre)
+        
+        # Create scene documents
+        scenes = [
+            self._build_scene(project_id, scene_data)
+            for scene_data in scene_breakdown.get('scenes', [])
+        ]
+        
+        # Save scenes to database
+        scene_dicts = []
+        for scene in scenes:
+            scene_dict = scene.model_dump()
+            scene_dict['created_at'] = scene_dict['created_at'].isoformat()
+            scene_dicts.append(scene_dict)
+        await self.writes.insert_many("scenes", scene_dicts)
+        self._expect_scenes(project_id, scenes)
+        
+        # Update project with total scenes; the breakdown is now checkpointed
+        await self._update_project(project_id, {
+            "total_scenes": len(scenes),
+            "breakdown_complete": True,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        })
+        
+        # Step 2: Process each scene (Animator + Voice)
+        await self._process_scenes(project_id, scenes)
+    
+    async def _resume_scenes(self, project_id: str, scenes: List[Scene]):
+        """Step 2 from a checkpoint: only scenes with missing artifacts are processed.
+        
+        Outputs another host published to the artifact store count as present.
+        """
+        done = [scene for scene in scenes if self._scene_done(scene)]
+        pending = [scene for scene in scenes if not self._scene_done(scene)]
+        print(f"[Resume] Project {project_id}: {len(done)}/{len(scenes)} scenes already rendered")
+        
+        self._expect_scenes(project_id, scenes)
+        for scene in sorted(done, key=lambda scene: scene.scene_number):
+            await self.editor.publish_scene(project_id, scene.model_dump(), reuse=True)
+        
+        if done:
+            await self.db.scenes.update_many(
+                {"id": {"$in": [scene.id for scene in done]}},
+                {"$set": {"status": SceneStatus.COMPLETED.value}}
+            )
+        await self._update_project(project_id, {
+            "status": ProjectStatus.PROCESSING.value,
+            "total_scenes": len(scenes),
+            "completed_scenes": len(done),
+            "error_message": None,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        })
+        
+        await self._process_scenes(project_id, sorted(pending, key=lambda scene: scene.scene_number))
+    
+    async def _process_scenes(self, project_id: str, scenes: List[Scene]):
+        if self.scene_mode == 'concurrent':
+            await self._process_scenes_concurrently(project_id, scenes)
+        else:
+            for scene in scenes:
+                await self._process_scene(project_id, scene)
+    
+    async def _update_project(self, project_id: str, fields: Dict):
+        """Write project fields immediately and announce the transition."""
+        with self.metrics.span("mongo_write", project_id=project_id, collection="projects", op="update_one") as span:
+            span.bytes_written = len(encode(fields))
+            await self.db.projects.update_one({"id": project_id}, {"$set": fields})
+        
+        progress = self.active_projects.get(project_id)
+        if progress is not None:
+            for counter in ("total_scenes", "completed_scenes"):
+                if counter in fields:
+                    progress[counter] = fields[counter]
+        self.events.publish(project_id, project_event(project_id, fields))
+    
+    def _publish_progress(self, project_id: str, counter: str):
+        """Announce a counter that was incremented through the write coalescer."""
+        progress = self.active_projects.get(project_id)
+        if progress is None:
+            return
+        progress[counter] += 1
+        self.events.publish(project_id, project_event(project_id, {counter: progress[counter]}))
+    
+    def _update_scene(self, scene: Scene, fields: Dict):
+        """Queue scene fields on the write coalescer and announce them right away."""
+        self.writes.update("scenes", scene.id, set=fields)
+        self.events.publish(scene.project_id, scene_event(scene.id, {"scene_number": scene.scene_number, **fields}))
+    
+    def _expect_scenes(self, project_id: str, scenes: List[Scene]):
+        playlist = self.editor.playlists.get(project_id)
+        if playlist is not None:
+            playlist.expect([scene.scene_number for scene in scenes])
+    
+    def _artifact_ok(self, scene: Scene, stage: str, path: Optional[str]) -> bool:
+        """A checkpointed stage output counts if it is on disk or was published to the artifact store."""
+        if path and os.path.isfile(path) and os.path.getsize(path) > 0:
+            return True
+        # Published outputs are fetched on demand, before a stage or the editor reads them
+        return bool(path) and self.store is not None and bool(scene.artifacts.get(stage))
+    
+    async def _fetch_artifacts(self, scene: Scene):
+        """Fetch the current stage outputs of a scene that another host rendered."""
+        if self.store is None or not scene.artifacts:
+            return
+        expected = self.fingerprints(scene, self._profile(scene.project_id))
+        current = {
+            stage: key for stage, key in scene.artifacts.items()
+            if self._fingerprint_ok(scene, stage, expected.get(stage))
+        }
+        try:
+            await self.editor.materialize({**scene.model_dump(), "artifacts": current})
+        except Exception as e:
+            print(f"[Store] Could not fetch the outputs of scene {scene.scene_number}, rendering them again: {e}")
+            # Without the key, whatever is missing locally counts as stale again
+            for stage, field in ARTIFACT_FIELDS.items():
+                path = getattr(scene, field)
+                if stage in current and not (path and os.path.exists(path)):
+                    scene.artifacts.pop(stage, None)
+    
+    def fingerprints(self, scene: Scene, profile: str) -> Dict[str, Optional[str]]:
+        """Hash of every input each stage output depends on; a changed hash means a stale output."""
+        animation = self.animator.cache_key(scene.model_dump(), profile)
+        voice = self.voice.cache_key(scene.dialogue, "en") if scene.dialogue else None
+        return {
+            "animation": animation,
+            "voice": voice,
+            "video": FileCache.make_key("segment", animation, voice)
+        }
+    
+    def stale_stages(self, scene: Scene, profile: str) -> List[str]:
+        """Stages whose stored output no longer matches the scene, in the order they run."""
+        stale = []
+        if scene.dialogue and not self._voice_current(scene):
+            stale.append("voice")
+        # Audio-first animations take their length from the voiceover
+        if not self._animation_current(scene, profile) or (self.audio_first and "voice" in stale):
+            stale.append("animation")
+        if stale or not self._segment_current(scene, profile):
+            stale.append("video")
+        return stale
+    
+    def _fingerprint_ok(self, scene: Scene, stage: str, expected: Optional[str]) -> bool:
+        # Outputs checkpointed before fingerprints were recorded are trusted
+        recorded = scene.fingerprints.get(stage)
+        return recorded is None or recorded == expected
+    
+    def _animation_current(self, scene: Scene, profile: Optional[str] = None) -> bool:
+        """The checkpointed animation exists and was rendered from the scene as it is now."""
+        profile = profile or self._profile(scene.project_id)
+        rendered_with = scene.render_profile or DEFAULT_RENDER_PROFILE
+        return self._artifact_ok(scene, "animation", scene.animation_path) and rendered_with == profile and self._fingerprint_ok(
+            scene, "animation", self.fingerprints(scene, profile)["animation"]
+        )
+    
+    def _voice_current(self, scene: Scene) -> bool:
+        return self._artifact_ok(scene, "voice", scene.voice_path) and self._fingerprint_ok(
+            scene, "voice", self.voice.cache_key(scene.dialogue, "en")
+        )
+    
+    def _segment_current(self, scene: Scene, profile: Optional[str] = None) -> bool:
+        """The muxed segment exists for this run's profile and was muxed from the current stage outputs."""
+        profile = profile or self._profile(scene.project_id)
+        expected = str(self.editor.segment_path(scene.id, profile))
+        if scene.video_path != expected or not self._artifact_ok(scene, "video", scene.video_path):
+            return False
+        if scene.fingerprints.get("video") is not None:
+            return scene.fingerprints["video"] == self.fingerprints(scene, profile)["video"]
+        if not os.path.exists(scene.video_path):
+            # Only the fingerprint can tell whether a segment that isn't here yet is current
+            return False
+        sources = [path for path in (scene.animation_path, scene.voice_path) if path and os.path.exists(path)]
+        return all(os.path.getmtime(scene.video_path) >= os.path.getmtime(path) for path in sources)
+    
+    def _scene_done(self, scene: Scene) -> bool:
+        return not self.stale_stages(scene, self._profile(scene.project_id))
+    
+    def _build_scene(self, project_id: str, scene_data: Dict) -> Scene:
+        return Scene(
+            project_id=project_id,
+            scene_number=scene_data['scene_number'],
+            description=scene_data['description'],
+            dialogue=scene_data.get('dialogue'),
+            camera_direction=scene_data.get('camera_direction'),
+            duration=scene_data.get('duration', 5.0)
+        )
+    
+    async def _stream_and_process_scenes(self, project_id: str, project: Project):
+        """Persist and dispatch each scene as soon as the director emits it."""
+        concurrent = self.scene_mode == 'concurrent'
+        project_slots = asyncio.Semaphore(self.scene_concurrency if concurrent else 1)
+        tasks = []
+        
+        try:
+            # Spans the stream only; the scenes it dispatches are measured on their own
+            with self.metrics.span("director", project_id=project_id, mode="streaming"):
+                async for scene_data in self.director.stream_scenes(project.story_input, project.genre):
+                    scene = self._build_scene(project_id, scene_data)
+                    
+                    scene_dict = scene.model_dump()
+                    scene_dict['created_at'] = scene_dict['created_at'].isoformat()
+                    # Inserted right away: the scene's own updates are keyed on it existing
+                    with self.metrics.span("mongo_write", project_id=project_id, collection="scenes", op="insert_one") as span:
+                        span.bytes_written = len(encode(scene_dict))
+                        await self.db.scenes.insert_one(scene_dict)
+                    self.writes.update(
+                        "projects", project_id,
+                        set={"updated_at": datetime.now(timezone.utc).isoformat()},
+                        inc={"total_scenes": 1}
+                    )
+                    self._publish_progress(project_id, "total_scenes")
+                    self._expect_scenes(project_id, [scene])
+                    
+                    print(f"[Director] Scene {scene.scene_number} ready for project {project_id}")
+                    tasks.append(asyncio.create_task(
+                        self._run_scene(project_id, scene, project_slots, concurrent)
+                    ))
+            
+            await self.db.projects.update_one(
+                {"id": project_id},
+                {"$set": {"breakdown_complete": True}}
+            )
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        
+        await self._await_scenes(tasks)
+    
+    async def _process_scenes_concurrently(self, project_id: str, scenes: List[Scene]):
+        """Fan scenes out, bounded per project and across all projects."""
+        project_slots = asyncio.Semaphore(self.scene_concurrency)
+        tasks = [
+            asyncio.create_task(self._run_scene(project_id, scene, project_slots, True))
+            for scene in scenes
+        ]
+        await self._await_scenes(tasks)
+    
+    async def _run_scene(self, project_id: str, scene: Scene, project_slots: asyncio.Semaphore, concurrent_stages: bool):
+        async with project_slots, self.global_scene_slots:
+            await self._process_scene(project_id, scene, concurrent_stages=concurrent_stages)
+    
+    async def _await_scenes(self, tasks: List[asyncio.Task]):
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            # One failed scene fails the project; stop spending work on the rest
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    
+    async def _process_scene(self, project_id: str, scene: Scene, concurrent_stages: bool = False):
+        """Run the animator and voice stages for a single scene, then mux its segment."""
+        print(f"[Processing] Scene {scene.scene_number} for project {project_id}")
+        
+        # Update scene status
+        self._update_scene(scene, {"status": SceneStatus.ANIMATING.value})
+        
+        try:
+            # Outputs rendered on another host are reused rather than rendered again
+            await self._fetch_artifacts(scene)
+            
+            if self.audio_first and scene.dialogue:
+                self._update_scene(scene, {"status": SceneStatus.VOICE_GENERATING.value})
+                await self._generate_voice(scene)
+                await self._fit_duration_to_voice(scene)
+                
+                self._update_scene(scene, {"status": SceneStatus.ANIMATING.value})
+                await self._animate(scene)
+            elif concurrent_stages:
+                # Animation and voiceover are independent, run them together
+                await asyncio.gather(self._animate(scene), self._generate_voice(scene))
+            else:
+                # Animator creates the scene
+                await self._animate(scene)
+                
+                self._update_scene(scene, {"status": SceneStatus.VOICE_GENERATING.value})
+                
+                # Voice agent generates voiceover
+                await self._generate_voice(scene)
+            
+            # Finish the scene as one A/V segment, so the editor only joins
+            await self._mux(scene)
+            
+            # Mark scene as completed
+            self._update_scene(scene, {"status": SceneStatus.COMPLETED.value, "error_message": None})
+        except Exception as e:
+            self._update_scene(scene, {"status": SceneStatus.FAILED.value, "error_message": str(e)})
+            raise
+        
+        # Append the scene to the live playlist before it counts as done
+        await self.editor.publish_scene(project_id, scene.model_dump())
+        
+        # Update project progress
+        self.writes.update(
+            "projects", project_id,
+            set={"updated_at": datetime.now(timezone.utc).isoformat()},
+            inc={"completed_scenes": 1}
+        )
+        self._publish_progress(project_id, "completed_scenes")
+    
+    async def _animate(self, scene: Scene) -> str:
+        """Render the scene's animation unless a current checkpointed one is still on disk."""
+        if self._animation_current(scene):
+            return scene.animation_path
+        
+        profile = self._profile(scene.project_id)
+        with self.metrics.span("animate", project_id=scene.project_id, scene_id=scene.id, profile=profile) as span:
+            scene.animation_path = await self.animator.create_scene_animation(scene.id, scene.model_dump(), profile)
+            span.bytes_written = os.path.getsize(scene.animation_path)
+        scene.render_profile = profile
+        scene.fingerprints["animation"] = self.fingerprints(scene, profile)["animation"]
+        # The published copy is of the previous render until this one is stored
+        scene.artifacts.pop("animation", None)
+        
+        # Checkpoint the stage output as soon as it exists
+        self._update_scene(scene, {
+            "animation_path": scene.animation_path,
+            "render_profile": profile,
+            "fingerprints": scene.fingerprints,
+            "artifacts": scene.artifacts
+        })
+        await self._store_artifact(scene, "animation", scene.animation_path)
+        return scene.animation_path
+    
+    async def _generate_voice(self, scene: Scene) -> Optional[str]:
+        """Generate the voiceover for a scene, if it has dialogue and no current one is checkpointed."""
+        if not scene.dialogue:
+            if scene.voice_path:
+                # The dialogue was edited away; its old voiceover must not be muxed
+                scene.voice_path = None
+                scene.fingerprints["voice"] = None
+                scene.artifacts.pop("voice", None)
+                self._update_scene(scene, {
+                    "voice_path": None,
+                    "fingerprints": scene.fingerprints,
+                    "artifacts": scene.artifacts
+                })
+            return None
+        if self._voice_current(scene):
+            return scene.voice_path
+        
+        with self.metrics.span("voice", project_id=scene.project_id, scene_id=scene.id) as span:
+            scene.voice_path = await self.voice.generate_voiceover(scene.id, scene.dialogue)
+            if scene.voice_path:
+                span.bytes_written = os.path.getsize(scene.voice_path)
+        scene.fingerprints["voice"] = self.voice.cache_key(scene.dialogue, "en")
+        scene.artifacts.pop("voice", None)
+        
+        self._update_scene(scene, {
+            "voice_path": scene.voice_path,
+            "fingerprints": scene.fingerprints,
+            "artifacts": scene.artifacts
+        })
+        await self._store_artifact(scene, "voice", scene.voice_path)
+        return scene.voice_path
+    
+    async def _fit_duration_to_voice(self, scene: Scene):
+        """Set the scene's duration to its voiceover's, rounded up to a whole frame."""
+        if not scene.voice_path:
+            return
+        try:
+            media = await asyncio.to_thread(probe_media, scene.voice_path)
+        except Exception as e:
+            print(f"[Voice] Could not probe the voiceover of scene {scene.scene_number}, keeping {scene.duration}s: {e}")
+            return
+        if not media["duration"]:
+            return
+        
+        # A whole number of frames, so the clip never ends short of the audio
+        fps = get_profile(self._profile(scene.project_id))["fps"]
+        duration = math.ceil(media["duration"] * fps) / fps
+        if duration != scene.duration:
+            scene.duration = duration
+            self._update_scene(scene, {"duration": duration})
+    
+    async def _mux(self, scene: Scene) -> str:
+        """Mux the scene's voiceover onto its animation unless a current segment is on disk."""
+        if self._segment_current(scene):
+            return scene.video_path
+        
+        with self.metrics.span("mux", project_id=scene.project_id, scene_id=scene.id) as span:
+            scene.video_path = await self.editor.build_segment(scene.model_dump(), self._profile(scene.project_id))
+            span.bytes_written = os.path.getsize(scene.video_path)
+        scene.fingerprints["video"] = self.fingerprints(scene, self._profile(scene.project_id))["video"]
+        scene.artifacts.pop("video", None)
+        
+        self._update_scene(scene, {
+            "video_path": scene.video_path,
+            "fingerprints": scene.fingerprints,
+            "artifacts": scene.artifacts
+        })
+        await self._store_artifact(scene, "video", scene.video_path)
+        return scene.video_path
+    
+    async def _store_artifact(self, scene: Scene, stage: str, path: Optional[str]):
+        """Publish a stage output to the artifact store, so a host without the file can fetch it."""
+        if self.store is None or not path:
+            return
+        with self.metrics.span("store", project_id=scene.project_id, scene_id=scene.id, artifact=stage) as span:
+            scene.artifacts[stage] = await self.store.put_file(path)
+            span.bytes_written = os.path.getsize(path)
+        self._update_scene(scene, {"artifacts": scene.artifacts})
     
     async def process_multiple_projects(self, project_ids: List[str]):
         """Process multiple projects in parallel."""
@@ -8,6 +8,7 @@ from enum import Enum
 class ProjectStatus(str, Enum):
     PENDING = "pending"
     PROCESSING = "processing"
+    PREVIEW_READY = "preview_ready"  # Preview rendered, waiting to be accepted for the final render
     COMPLETED = "completed"
     FAILED = "failed"
 
@@ -33,6 +34,15 @@ class Project(BaseModel):
     total_scenes: int = 0
     completed_scenes: int = 0
     video_url: Optional[str] = None
+    playlist_url: Optional[str] = None  # Live HLS playlist, playable while scenes render
+    render_profile: Optional[str] = None  # preview, standard or final; None means the server default
+    preview_first: bool = False  # Render a low-res preview and wait for acceptance before the final render
+    preview_accepted: bool = False
+    preview_url: Optional[str] = None
+    profiling: bool = False  # Record a CPU/allocation profile of the next pipeline run
+    profile_url: Optional[str] = None
+    artifacts: Dict[str, str] = Field(default_factory=dict)  # Artifact store keys of the movie and preview
+    breakdown_complete: bool = False  # Director output fully stored, scenes can be resumed
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     error_message: Optional[str] = None
@@ -42,6 +52,13 @@ class ProjectCreate(BaseModel):
     title: str
     story_input: str
     genre: Optional[str] = "general"
+    render_profile: Optional[str] = None
+    preview_first: bool = False
+    profiling: bool = False
+
+
+class ProfilingToggle(BaseModel):
+    enabled: bool = True
 
 
 class Scene(BaseModel):
@@ -58,10 +75,20 @@ class Scene(BaseModel):
     animation_path: Optional[str] = None
     voice_path: Optional[str] = None
     video_path: Optional[str] = None
+    render_profile: Optional[str] = None  # Profile animation_path was rendered with
+    fingerprints: Dict[str, Optional[str]] = Field(default_factory=dict)  # Inputs each stage output was built from
+    artifacts: Dict[str, str] = Field(default_factory=dict)  # Artifact store key of each stage output
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     error_message: Optional[str] = None
 
 
+class SceneUpdate(BaseModel):
+    description: Optional[str] = None
+    dialogue: Optional[str] = None
+    camera_direction: Optional[str] = None
+    duration: Optional[float] = None
+
+
 class Character(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
@@ -80,7 +107,14 @@ class JobStatus(BaseModel):
     project_id: str
     scene_id: Optional[str] = None
     status: str = "pending"  # pending, running, completed, failed
+    active: bool = True  # Pending or running; a project has at most one active job
     progress: int = 0  # 0-100
     message: Optional[str] = None
+    payload: Dict[str, Any] = Field(default_factory=dict)
+    attempts: int = 0
+    max_attempts: int = 3
+    available_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    lease_owner: Optional[str] = None  # worker id holding the job
+    lease_expires_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
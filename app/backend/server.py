@@ -1,21 +1,34 @@
-from fastapi import FastAPI, APIRouter, BackgroundTasks, HTTPException
+from fastapi import FastAPI, APIRouter, BackgroundTasks, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import re
+import json
+import asyncio
+import time
+import base64
 import logging
 from pathlib import Path
-from typing import List
-from datetime import datetime
+from typing import List, Optional
+from datetime import datetime, timezone
 
 # Import models
 from models import (
-    Project, ProjectCreate, Scene, ProjectStatus, SceneStatus
+    Project, ProjectCreate, ProfilingToggle, Scene, SceneUpdate, ProjectStatus, SceneStatus
 )
 
 # Import agents
 from agents.workflow_agent import WorkflowAgent
+from services.render_pool import get_render_pool
+from services.job_queue import JobQueue
+from services.db_indexes import ensure_indexes, verify_indexes
+from services.events import EventBus, bridge_change_streams
+from services.render_profiles import DEFAULT_RENDER_PROFILE, RENDER_PROFILES
+from services.metrics import get_metrics
+from services.artifact_store import content_type, valid_key
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -26,13 +39,22 @@ client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
 # Create output directories
-output_dir = Path("/app/backend/output")
+output_dir = Path(os.environ.get('OUTPUT_DIR', '/app/backend/output'))
 (output_dir / "animations").mkdir(parents=True, exist_ok=True)
 (output_dir / "voices").mkdir(parents=True, exist_ok=True)
 (output_dir / "final").mkdir(parents=True, exist_ok=True)
+(output_dir / "hls").mkdir(parents=True, exist_ok=True)
+(output_dir / "segments").mkdir(parents=True, exist_ok=True)
+(output_dir / "profiles").mkdir(parents=True, exist_ok=True)
 
 # Initialize Workflow Agent
-workflow_agent = WorkflowAgent(db)
+event_bus = EventBus()
+workflow_agent = WorkflowAgent(db, events=event_bus)
+change_stream_task = None
+
+# "inline" runs pipelines in this process, "queue" hands them to worker.py
+job_execution_mode = os.environ.get('JOB_EXECUTION_MODE', 'inline')
+job_queue = JobQueue(db)
 
 # Create the main app without a prefix
 app = FastAPI(title="Swami - Autonomous 3D Animation Generator")
@@ -46,10 +68,17 @@ api_router = APIRouter(prefix="/api")
 @api_router.post("/projects", response_model=Project)
 async def create_project(input: ProjectCreate, background_tasks: BackgroundTasks):
     """Create a new 3D animation project."""
+    render_profile = input.render_profile or DEFAULT_RENDER_PROFILE
+    if render_profile not in RENDER_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown render profile, expected one of {sorted(RENDER_PROFILES)}")
+    
     project = Project(
         title=input.title,
         story_input=input.story_input,
-        genre=input.genre
+        genre=input.genre,
+        render_profile=render_profile,
+        preview_first=input.preview_first,
+        profiling=input.profiling
     )
     
     # Save to database
@@ -60,24 +89,83 @@ async def create_project(input: ProjectCreate, background_tasks: BackgroundTasks
     await db.projects.insert_one(project_dict)
     
     # Start processing in background
-    background_tasks.add_task(workflow_agent.start_project, project.id)
+    if job_execution_mode == 'queue':
+        await job_queue.enqueue("project", project.id)
+    else:
+        background_tasks.add_task(workflow_agent.start_project, project.id)
     
     return project
 
 
-@api_router.get("/projects", response_model=List[Project])
-async def get_projects():
-    """Get all projects."""
-    projects = await db.projects.find({}, {"_id": 0}).to_list(1000)
+# ==================== LISTING HELPERS ====================
+
+PROJECT_FIELDS = {field: 1 for field in Project.model_fields}
+PROJECT_SUMMARY_FIELDS = {field: 1 for field in Project.model_fields if field != 'story_input'}
+SCENE_FIELDS = {field: 1 for field in Scene.model_fields}
+
+
+def encode_cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def stream_ndjson(cursor):
+    """Write documents out one per line as the driver yields them."""
+    async for document in cursor:
+        yield json.dumps(document) + "\n"
+
+
+def page_response(documents: List[dict], next_cursor: Optional[str]) -> JSONResponse:
+    # Documents are stored in their JSON form already, so skip model re-validation;
+    # the listings declare no response_model for that reason
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return JSONResponse(content=documents, headers=headers)
+
+
+@api_router.get("/projects")
+async def get_projects(
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    view: str = Query("full", pattern="^(full|summary)$"),
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """Get projects, newest first.
+    
+    Pages are keyed on (created_at, id); pass the X-Next-Cursor header of a
+    page as `cursor` to fetch the next one. `view=summary` leaves out the
+    story text and `format=ndjson` streams every matching project for export.
+    """
+    query = {}
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query = {"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": last_id}}
+        ]}
     
-    # Convert ISO string timestamps back to datetime objects
-    for project in projects:
-        if isinstance(project.get('created_at'), str):
-            project['created_at'] = datetime.fromisoformat(project['created_at'])
-        if isinstance(project.get('updated_at'), str):
-            project['updated_at'] = datetime.fromisoformat(project['updated_at'])
+    projection = PROJECT_SUMMARY_FIELDS if view == "summary" else PROJECT_FIELDS
+    find = db.projects.find(query, {**projection, "_id": 0}).sort([("created_at", -1), ("id", -1)])
     
-    return projects
+    if format == "ndjson":
+        if limit:
+            find = find.limit(limit)
+        return StreamingResponse(stream_ndjson(find), media_type="application/x-ndjson")
+    
+    # Unpaged requests get everything up to 1000, as before pagination
+    limit = limit or 1000
+    projects = await find.limit(limit).to_list(limit)
+    
+    next_cursor = None
+    if len(projects) == limit:
+        next_cursor = encode_cursor(projects[-1]['created_at'], projects[-1]['id'])
+    
+    return page_response(projects, next_cursor)
 
 
 @api_router.get("/projects/{project_id}", response_model=Project)
@@ -97,6 +185,147 @@ async def get_project(project_id: str):
     return project
 
 
+def sse_message(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@api_router.get("/projects/{project_id}/events")
+async def stream_project_events(project_id: str, request: Request):
+    """Push project and scene status transitions as Server-Sent Events."""
+    # Subscribe before taking the snapshot so no transition falls in between
+    subscription = event_bus.subscribe(project_id)
+    project = await db.projects.find_one({"id": project_id}, {**PROJECT_SUMMARY_FIELDS, "_id": 0})
+    if not project:
+        event_bus.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    keepalive = float(os.environ.get('EVENTS_KEEPALIVE', '15'))
+    # A preview waits for someone to accept it, so its stream ends there too;
+    # accepting restarts the pipeline and clients subscribe again
+    terminal = {ProjectStatus.COMPLETED.value, ProjectStatus.FAILED.value, ProjectStatus.PREVIEW_READY.value}
+    
+    async def events():
+        try:
+            scenes = await db.scenes.find(
+                {"project_id": project_id}, {**SCENE_FIELDS, "_id": 0}
+            ).sort("scene_number", 1).to_list(1000)
+            yield sse_message("snapshot", {"project": project, "scenes": scenes})
+            
+            status = project.get("status")
+            while status not in terminal:
+                if await request.is_disconnected():
+                    break
+                batch = await subscription.next_batch(keepalive)
+                if not batch:
+                    yield ": keepalive\n\n"
+                    continue
+                for event in batch:
+                    if event["type"] == "project":
+                        status = event.get("status", status)
+                    yield sse_message(event["type"], event)
+        finally:
+            event_bus.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def project_is_running(project_id: str) -> bool:
+    """Whether a pipeline for the project is running here or queued/running on a worker."""
+    if job_execution_mode == 'queue':
+        return await job_queue.active_job(project_id) is not None
+    return project_id in workflow_agent.active_projects
+
+
+@api_router.post("/projects/{project_id}/resume")
+async def resume_project(project_id: str, background_tasks: BackgroundTasks):
+    """Resume an interrupted or failed project from its last checkpoint."""
+    project = await db.projects.find_one({"id": project_id}, {"_id": 0, "status": 1})
+    
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if project["status"] == ProjectStatus.COMPLETED.value:
+        raise HTTPException(status_code=400, detail="Project already completed")
+    if await project_is_running(project_id):
+        raise HTTPException(status_code=409, detail="Project is already running")
+    
+    if job_execution_mode == 'queue':
+        await job_queue.enqueue("project", project_id)
+    else:
+        background_tasks.add_task(workflow_agent.resume_project, project_id)
+    
+    return {"message": "Project resumed"}
+
+
+@api_router.post("/projects/{project_id}/accept")
+async def accept_preview(project_id: str, background_tasks: BackgroundTasks):
+    """Accept a project's preview and start its final render in the background."""
+    # The preview run's job may still be wrapping up; its enqueue would be swallowed
+    if await project_is_running(project_id):
+        raise HTTPException(status_code=409, detail="Project is still running, accept the preview once it finishes")
+    
+    # Conditional update, so a double click can't start two final renders
+    project = await db.projects.find_one_and_update(
+        {"id": project_id, "status": ProjectStatus.PREVIEW_READY.value, "preview_accepted": False},
+        {"$set": {"preview_accepted": True, "updated_at": datetime.now(timezone.utc).isoformat()}},
+        projection={"_id": 0, "id": 1}
+    )
+    
+    if not project:
+        if not await db.projects.find_one({"id": project_id}, {"_id": 0, "id": 1}):
+            raise HTTPException(status_code=404, detail="Project not found")
+        raise HTTPException(status_code=409, detail="Project has no preview waiting for acceptance")
+    
+    if job_execution_mode == 'queue':
+        await job_queue.enqueue("project", project_id)
+    else:
+        background_tasks.add_task(workflow_agent.resume_project, project_id)
+    
+    return {"message": "Final render started"}
+
+
+@api_router.post("/projects/{project_id}/profiling")
+async def set_project_profiling(project_id: str, toggle: ProfilingToggle):
+    """Turn profiling on or off for a project's next run or resume."""
+    result = await db.projects.update_one(
+        {"id": project_id},
+        {"$set": {"profiling": toggle.enabled, "updated_at": datetime.now(timezone.utc).isoformat()}}
+    )
+    
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    message = "Profiling enabled" if toggle.enabled else "Profiling disabled"
+    if await project_is_running(project_id):
+        message += ", takes effect on the next run"
+    return {"message": message, "profiling": toggle.enabled}
+
+
+@api_router.get("/render-profiles")
+async def get_render_profiles():
+    """List the render profiles projects can choose from."""
+    return {"default": DEFAULT_RENDER_PROFILE, "profiles": RENDER_PROFILES}
+
+
+@api_router.post("/projects/{project_id}/compile")
+async def compile_project(project_id: str, background_tasks: BackgroundTasks):
+    """Build the MP4 for a project that was delivered as HLS only."""
+    project = await db.projects.find_one({"id": project_id}, {"_id": 0, "status": 1, "video_url": 1})
+    
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if project["status"] != ProjectStatus.COMPLETED.value:
+        raise HTTPException(status_code=400, detail="Project has not finished rendering")
+    if project.get("video_url"):
+        return {"message": "Movie already compiled", "video_url": project["video_url"]}
+    
+    background_tasks.add_task(workflow_agent.compile_project, project_id)
+    return {"message": "Movie compilation started"}
+
+
 @api_router.delete("/projects/{project_id}")
 async def delete_project(project_id: str):
     """Delete a project and its scenes."""
@@ -114,20 +343,38 @@ async def delete_project(project_id: str):
 
 # ==================== SCENE ENDPOINTS ====================
 
-@api_router.get("/projects/{project_id}/scenes", response_model=List[Scene])
-async def get_project_scenes(project_id: str):
-    """Get all scenes for a project."""
-    scenes = await db.scenes.find({"project_id": project_id}, {"_id": 0}).to_list(1000)
+@api_router.get("/projects/{project_id}/scenes")
+async def get_project_scenes(
+    project_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """Get scenes for a project in scene order, optionally paged by scene number."""
+    query = {"project_id": project_id}
+    if cursor:
+        scene_number, last_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"scene_number": {"$gt": scene_number}},
+            {"scene_number": scene_number, "id": {"$gt": last_id}}
+        ]
     
-    # Convert ISO string timestamps
-    for scene in scenes:
-        if isinstance(scene.get('created_at'), str):
-            scene['created_at'] = datetime.fromisoformat(scene['created_at'])
+    # Sorted by the (project_id, scene_number) index rather than in Python
+    find = db.scenes.find(query, {**SCENE_FIELDS, "_id": 0}).sort([("scene_number", 1), ("id", 1)])
+    
+    if format == "ndjson":
+        if limit:
+            find = find.limit(limit)
+        return StreamingResponse(stream_ndjson(find), media_type="application/x-ndjson")
     
-    # Sort by scene number
-    scenes.sort(key=lambda x: x.get('scene_number', 0))
+    limit = limit or 1000
+    scenes = await find.limit(limit).to_list(limit)
     
-    return scenes
+    next_cursor = None
+    if len(scenes) == limit:
+        next_cursor = encode_cursor(scenes[-1]['scene_number'], scenes[-1]['id'])
+    
+    return page_response(scenes, next_cursor)
 
 
 @api_router.get("/scenes/{scene_id}", response_model=Scene)
@@ -145,25 +392,199 @@ async def get_scene(scene_id: str):
     return scene
 
 
+@api_router.patch("/scenes/{scene_id}")
+async def update_scene(scene_id: str, update: SceneUpdate, background_tasks: BackgroundTasks):
+    """Edit a scene, then re-render only the stages the edit made stale and re-join the movie."""
+    fields = update.model_dump(exclude_unset=True)
+    if not fields:
+        raise HTTPException(status_code=400, detail="No scene fields to update")
+    # Omit a field to leave it as it is; the scene can't run without these
+    cleared = [field for field in ("description", "duration") if field in fields and fields[field] is None]
+    if cleared:
+        raise HTTPException(status_code=400, detail=f"Scene fields can't be null: {', '.join(cleared)}")
+    if "duration" in fields and fields["duration"] <= 0:
+        raise HTTPException(status_code=400, detail="Scene duration must be positive")
+    
+    scene_data = await db.scenes.find_one({"id": scene_id}, {"_id": 0})
+    if not scene_data:
+        raise HTTPException(status_code=404, detail="Scene not found")
+    
+    project_id = scene_data["project_id"]
+    project_data = await db.projects.find_one({"id": project_id}, {"_id": 0})
+    if not project_data:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if await project_is_running(project_id):
+        raise HTTPException(status_code=409, detail="Project is running, edit its scenes once it finishes")
+    if not project_data.get("breakdown_complete"):
+        raise HTTPException(status_code=409, detail="Project has no finished scene breakdown to edit")
+    
+    scene = Scene(**{**scene_data, **fields})
+    stale = workflow_agent.stale_stages(scene, workflow_agent.run_profile(Project(**project_data)))
+    
+    await db.scenes.update_one(
+        {"id": scene_id},
+        {"$set": {**fields, **({"status": SceneStatus.PENDING.value} if stale else {})}}
+    )
+    if not stale:
+        return {"message": "Scene updated, nothing to re-render", "stale": stale}
+    
+    # A resume re-runs exactly the scenes whose outputs are stale and re-joins the rest
+    if job_execution_mode == 'queue':
+        await job_queue.enqueue("project", project_id)
+    else:
+        background_tasks.add_task(workflow_agent.resume_project, project_id)
+    
+    return {"message": "Scene re-render started", "stale": stale}
+
+
+# ==================== ARTIFACT ENDPOINT ====================
+
+@api_router.get("/artifacts/{key:path}")
+async def get_artifact(key: str, request: Request):
+    """Stream an artifact from the store, honouring a single HTTP byte range."""
+    store = workflow_agent.store
+    if store is None:
+        raise HTTPException(status_code=404, detail="No artifact store configured")
+    if not valid_key(key):
+        raise HTTPException(status_code=400, detail="Invalid artifact key")
+    if not await asyncio.to_thread(store.exists, key):
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    
+    size = await asyncio.to_thread(store.size, key)
+    start, end = 0, size - 1
+    status_code = 200
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": "public, max-age=31536000, immutable"}
+    
+    range_header = request.headers.get("range")
+    if range_header:
+        match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+        if not match or match.groups() == ("", ""):
+            raise HTTPException(status_code=416, detail="Only a single byte range is supported")
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        else:
+            start = max(0, size - int(last))  # Suffix range: the last N bytes
+        if start > end:
+            raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        store.read_range(key, start, end),
+        status_code=status_code,
+        media_type=content_type(key),
+        headers=headers
+    )
+
+
 # ==================== STATS ENDPOINT ====================
 
+# Dashboards poll this endpoint, so a snapshot is served for STATS_CACHE_TTL seconds
+stats_cache_ttl = float(os.environ.get('STATS_CACHE_TTL', '2'))
+stats_snapshot = {"value": None, "expires_at": 0.0}
+
+
 @api_router.get("/stats")
 async def get_stats():
     """Get overall system statistics."""
-    total_projects = await db.projects.count_documents({})
-    completed_projects = await db.projects.count_documents({"status": ProjectStatus.COMPLETED.value})
-    processing_projects = await db.projects.count_documents({"status": ProjectStatus.PROCESSING.value})
-    failed_projects = await db.projects.count_documents({"status": ProjectStatus.FAILED.value})
-    
-    total_scenes = await db.scenes.count_documents({})
-    
-    return {
-        "total_projects": total_projects,
-        "completed_projects": completed_projects,
-        "processing_projects": processing_projects,
-        "failed_projects": failed_projects,
+    if stats_snapshot["value"] is not None and time.monotonic() < stats_snapshot["expires_at"]:
+        return stats_snapshot["value"]
+    
+    # One pass over projects instead of a count per status
+    status_counts = {}
+    async for row in db.projects.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+        status_counts[row["_id"]] = row["count"]
+    
+    # Served from collection metadata, no scan
+    total_scenes = await db.scenes.estimated_document_count()
+    
+    stats = {
+        "total_projects": sum(status_counts.values()),
+        "completed_projects": status_counts.get(ProjectStatus.COMPLETED.value, 0),
+        "processing_projects": status_counts.get(ProjectStatus.PROCESSING.value, 0),
+        "preview_ready_projects": status_counts.get(ProjectStatus.PREVIEW_READY.value, 0),
+        "failed_projects": status_counts.get(ProjectStatus.FAILED.value, 0),
         "total_scenes": total_scenes
     }
+    
+    if stats_cache_ttl > 0:
+        stats_snapshot["value"] = stats
+        stats_snapshot["expires_at"] = time.monotonic() + stats_cache_ttl
+    
+    return stats
+
+
+# ==================== SYSTEM ENDPOINTS ====================
+
+@api_router.get("/system/render-pool")
+async def get_render_pool_stats():
+    """Get render worker pool utilisation and queue depth."""
+    return get_render_pool().stats()
+
+
+@api_router.get("/system/caches")
+async def get_cache_stats():
+    """Get hit/miss counters for the render caches."""
+    caches = {"llm": workflow_agent.director.stats(), "captions": workflow_agent.animator.raster_stats.stats()}
+    if workflow_agent.animator.cache is not None:
+        caches["animations"] = workflow_agent.animator.cache.stats()
+    if workflow_agent.voice.cache is not None:
+        caches["voices"] = {**workflow_agent.voice.cache.stats(), **workflow_agent.voice.inflight.stats()}
+    if workflow_agent.store is not None:
+        caches["artifacts"] = workflow_agent.store.stats()
+    return caches
+
+
+@api_router.get("/system/writes")
+async def get_write_stats():
+    """Get MongoDB write coalescing counters for the workflow hot path."""
+    return workflow_agent.writes.stats()
+
+
+@api_router.get("/system/indexes")
+async def get_index_report():
+    """Report which of the expected MongoDB indexes exist."""
+    return await verify_indexes(db)
+
+
+@api_router.get("/system/events")
+async def get_event_stats():
+    """Get progress stream subscriber counts."""
+    return event_bus.stats()
+
+
+@api_router.get("/system/jobs")
+async def get_job_stats():
+    """Get job queue depth by status."""
+    return {"mode": job_execution_mode, **(await job_queue.stats())}
+
+
+@api_router.get("/system/spans")
+async def get_recent_spans(limit: int = Query(100, ge=1, le=1000), project_id: Optional[str] = None):
+    """Get the most recent pipeline stage spans, optionally for one project."""
+    return get_metrics().spans(limit, project_id)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """Prometheus scrape endpoint: stage histograms plus live queue and project gauges."""
+    pool = get_render_pool().stats()
+    gauges = {
+        "active_projects": ("Projects running in this process", {(): len(workflow_agent.active_projects)}),
+        "render_pool_busy_workers": ("Render workers running a job", {(): pool["busy_workers"]}),
+        "render_pool_queue_depth": ("Render jobs waiting for a worker", {(): pool["queue_depth"]}),
+        "event_subscribers": ("Open progress streams", {(): event_bus.stats()["subscribers"]}),
+        "pending_writes": ("Documents with buffered updates", {(): workflow_agent.writes.stats()["pending_documents"]})
+    }
+    if job_execution_mode == 'queue':
+        jobs = await job_queue.stats()
+        gauges["job_queue_depth"] = ("Jobs in the durable queue by status", {
+            (("status", status),): count for status, count in jobs.items()
+        })
+    
+    return PlainTextResponse(get_metrics().render(gauges), media_type="text/plain; version=0.0.4")
 
 
 # Health check endpoint
@@ -176,7 +597,7 @@ async def root():
 app.include_router(api_router)
 
 # Mount static files for serving videos
-app.mount("/output", StaticFiles(directory="/app/backend/output"), name="output")
+app.mount("/output", StaticFiles(directory=str(output_dir)), name="output")
 
 app.add_middleware(
     CORSMiddleware,
@@ -184,6 +605,8 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    # Browsers only let clients read response headers listed here
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Configure logging
@@ -193,6 +616,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def setup_indexes():
+    report = await ensure_indexes(db)
+    if not report["ok"]:
+        logger.warning(f"Some MongoDB indexes are missing: {report}")
+
+
+@app.on_event("startup")
+async def setup_job_queue():
+    if job_execution_mode == 'queue':
+        # Workers recover interrupted projects through expired job leases
+        await job_queue.ensure_indexes()
+    elif os.environ.get('RESUME_ON_STARTUP', '0') == '1':
+        # Only safe with a single API process: nothing stops two processes
+        # from both resuming the same project. Use queue mode to scale out.
+        resumed = await workflow_agent.resume_interrupted_projects()
+        if resumed:
+            logger.info(f"Resuming {len(resumed)} interrupted projects")
+
+
+@app.on_event("startup")
+async def setup_change_streams():
+    global change_stream_task
+    # Workers and other replicas only reach this process's subscribers through MongoDB
+    if os.environ.get('EVENTS_CHANGE_STREAM', '0') == '1':
+        change_stream_task = asyncio.create_task(bridge_change_streams(db, event_bus))
+
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if change_stream_task is not None:
+        change_stream_task.cancel()
     client.close()
+    get_render_pool().shutdown()
@@ -0,0 +1,256 @@
+import os
+import re
+import uuid
+import shutil
+import asyncio
+import hashlib
+import mimetypes
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+CHUNK_SIZE = 1024 * 1024
+# "ab/<sha256>.ext": the first two hex digits spread blobs over directories/prefixes
+KEY_PATTERN = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{64}(\.[A-Za-z0-9]{1,8})?$")
+
+
+def valid_key(key: str) -> bool:
+    return bool(KEY_PATTERN.match(key))
+
+
+def content_key(path: str) -> str:
+    """Key a file on the SHA-256 of its bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    hexdigest = digest.hexdigest()
+    return f"{hexdigest[:2]}/{hexdigest}{Path(path).suffix.lower()}"
+
+
+def content_type(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class ArtifactStore(ABC):
+    """Content-addressed storage for pipeline outputs, shared by every host.
+    
+    Agents keep rendering into local working files, since ffmpeg needs them;
+    finished files are published here under the hash of their bytes, so
+    identical outputs are stored once, and fetched back by hosts that don't
+    have them. Backends implement the blocking primitives below.
+    """
+    
+    backend: str  # Reported in stats(); each backend names itself
+    
+    def __init__(self):
+        self.uploads = 0
+        self.dedup_hits = 0
+        self.fetches = 0
+        self.bytes_uploaded = 0
+        self.bytes_deduplicated = 0
+    
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+    
+    @abstractmethod
+    def size(self, key: str) -> int:
+        ...
+    
+    @abstractmethod
+    def read_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield bytes start..end (inclusive, like an HTTP range) in chunks."""
+    
+    @abstractmethod
+    def _upload(self, path: str, key: str):
+        ...
+    
+    @abstractmethod
+    def _download(self, key: str, path: str):
+        ...
+    
+    async def put_file(self, path: str) -> str:
+        """Publish a local file and return its key; a file already stored is not uploaded again."""
+        return await asyncio.to_thread(self._put_file, path)
+    
+    def _put_file(self, path: str) -> str:
+        key = content_key(path)
+        size = os.path.getsize(path)
+        if self.exists(key):
+            self.dedup_hits += 1
+            self.bytes_deduplicated += size
+            return key
+        
+        self._upload(path, key)
+        self.uploads += 1
+        self.bytes_uploaded += size
+        return key
+    
+    async def fetch(self, key: str, path: str) -> str:
+        """Make an artifact available at a local path, downloading it unless it is already there."""
+        return await asyncio.to_thread(self._fetch, key, path)
+    
+    def _fetch(self, key: str, path: str) -> str:
+        if os.path.exists(path) and os.path.getsize(path) == self.size(key):
+            return path
+        
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            self._download(key, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.fetches += 1
+        return path
+    
+    def stats(self) -> Dict:
+        return {
+            "backend": self.backend,
+            "uploads": self.uploads,
+            "dedup_hits": self.dedup_hits,
+            "fetches": self.fetches,
+            "bytes_uploaded": self.bytes_uploaded,
+            "bytes_deduplicated": self.bytes_deduplicated
+        }
+
+
+class LocalArtifactStore(ArtifactStore):
+    """Artifacts on a local (or network-mounted) filesystem; also the stand-in for S3 in tests."""
+    
+    backend = "local"
+    
+    def __init__(self, root: str):
+        super().__init__()
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+    
+    def _path(self, key: str) -> Path:
+        if not valid_key(key):
+            raise Exception(f"Invalid artifact key '{key}'")
+        return self.root / key
+    
+    def exists(self, key: str) -> bool:
+        return self._path(key).exists()
+    
+    def size(self, key: str) -> int:
+        return self._path(key).stat().st_size
+    
+    def read_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+    
+    @staticmethod
+    def _copy(src: str, dst: str):
+        # Always a copy, never a hard link: working files are rewritten in place by ffmpeg
+        with open(src, "rb") as source, open(dst, "wb") as target:
+            shutil.copyfileobj(source, target, CHUNK_SIZE)
+    
+    def _upload(self, path: str, key: str):
+        destination = self._path(key)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = destination.parent / f".{destination.name}.{uuid.uuid4().hex}.tmp"
+        try:
+            self._copy(path, str(tmp_path))
+            os.replace(tmp_path, destination)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+    
+    def _download(self, key: str, path: str):
+        self._copy(str(self._path(key)), path)
+
+
+class S3ArtifactStore(ArtifactStore):
+    """Artifacts in an S3-compatible bucket (AWS, MinIO, ...), uploaded and downloaded in parts."""
+    
+    backend = "s3"
+    
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None, part_size: int = 8 * 1024 ** 2):
+        super().__init__()
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None)
+        self.bucket = bucket
+        self.prefix = prefix
+        # Files above one part are sent as a multipart upload, streamed from disk part by part
+        self.transfer = TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size)
+    
+    def _object(self, key: str) -> str:
+        if not valid_key(key):
+            raise Exception(f"Invalid artifact key '{key}'")
+        return f"{self.prefix}{key}"
+    
+    def _head(self, key: str) -> Optional[Dict]:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._object(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+    
+    def exists(self, key: str) -> bool:
+        return self._head(key) is not None
+    
+    def size(self, key: str) -> int:
+        head = self._head(key)
+        if head is None:
+            raise Exception(f"Artifact {key} not found")
+        return head["ContentLength"]
+    
+    def read_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        response = self.client.get_object(Bucket=self.bucket, Key=self._object(key), Range=byte_range)
+        body = response["Body"]
+        try:
+            for chunk in body.iter_chunks(CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+    
+    def _upload(self, path: str, key: str):
+        self.client.upload_file(
+            path, self.bucket, self._object(key),
+            ExtraArgs={"ContentType": content_type(key)},
+            Config=self.transfer
+        )
+    
+    def _download(self, key: str, path: str):
+        self.client.download_file(self.bucket, self._object(key), path, Config=self.transfer)
+
+
+_store: Optional[ArtifactStore] = None
+
+
+def get_artifact_store() -> Optional[ArtifactStore]:
+    """Process-wide artifact store, or None when ARTIFACT_STORE is unset."""
+    global _store
+    if _store is None:
+        backend = os.environ.get('ARTIFACT_STORE', '')
+        if backend == 'local':
+            _store = LocalArtifactStore(os.environ.get(
+                'ARTIFACT_STORE_DIR',
+                os.path.join(os.environ.get('OUTPUT_DIR', '/app/backend/output'), 'artifacts')
+            ))
+        elif backend == 's3':
+            _store = S3ArtifactStore(
+                os.environ['ARTIFACT_S3_BUCKET'],
+                prefix=os.environ.get('ARTIFACT_S3_PREFIX', ''),
+                endpoint_url=os.environ.get('ARTIFACT_S3_ENDPOINT'),
+                part_size=int(os.environ.get('ARTIFACT_S3_PART_MB', '8')) * 1024 ** 2
+            )
+        elif backend:
+            raise Exception(f"Unknown ARTIFACT_STORE '{backend}', expected 'local' or 's3'")
+    return _store
@@ -0,0 +1,199 @@
+import os
+import tempfile
+import subprocess
+import functools
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from services.ffmpeg_tools import ffmpeg_exe, run_ffmpeg
+
+# Tried in order; the first one that loads is used
+FONT_CANDIDATES = ("Arial.ttf", "arial.ttf", "DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+
+
+@functools.lru_cache(maxsize=32)
+def load_font(size: int) -> ImageFont.ImageFont:
+    """Load the caption font once per size and process."""
+    for name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def wrap_text(text: str, font: ImageFont.ImageFont, box_width: int) -> List[str]:
+    """Greedy word wrap to box_width pixels, like MoviePy's caption method."""
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if line and font.getlength(candidate) > box_width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def rasterize_caption(text: str, font_size: int, color: Tuple[int, int, int], box_width: int) -> np.ndarray:
+    """Render centred, wrapped text into an RGBA array of width box_width."""
+    font = load_font(font_size)
+    lines = wrap_text(text, font, box_width)
+    
+    ascent, descent = font.getmetrics()
+    line_height = ascent + descent
+    image = Image.new("RGBA", (box_width, max(line_height * len(lines), 1)), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    for index, line in enumerate(lines):
+        x = (box_width - font.getlength(line)) / 2
+        draw.text((x, index * line_height), line, font=font, fill=(*color, 255))
+    
+    return np.asarray(image)
+
+
+class Layer:
+    """An RGBA overlay split into premultiplied colour and coverage, ready for blending."""
+    
+    def __init__(self, rgba: np.ndarray, x: int, y: int):
+        alpha = rgba[..., 3:4].astype(np.float32) / 255.0
+        self.color = rgba[..., :3].astype(np.float32) * alpha
+        self.inverse_alpha = 1.0 - alpha
+        self.x = x
+        self.y = y
+        self.height, self.width = rgba.shape[:2]
+    
+    def blend(self, frame: np.ndarray, dx: int = 0, dy: int = 0):
+        """Alpha-blend onto a float32 frame in place, clipped to the frame."""
+        frame_height, frame_width = frame.shape[:2]
+        x, y = self.x + dx, self.y + dy
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + self.width, frame_width), min(y + self.height, frame_height)
+        if left >= right or top >= bottom:
+            return
+        
+        src = (slice(top - y, bottom - y), slice(left - x, right - x))
+        region = frame[top:bottom, left:right]
+        region *= self.inverse_alpha[src]
+        region += self.color[src]
+
+
+class FrameCompositor:
+    """Composites a scene from a solid background and static text layers.
+    
+    Overlays are rasterized once; effects are whole-array operations, so the
+    cost per frame is a few vector ops instead of a full MoviePy composite.
+    """
+    
+    def __init__(self, width: int, height: int, background: Tuple[int, int, int]):
+        self.width = width
+        self.height = height
+        self.background = np.empty((height, width, 3), dtype=np.float32)
+        self.background[:] = background
+        self.static: List[Layer] = []
+        self.panned: List[Layer] = []
+    
+    def add_caption(self, rgba: np.ndarray, y: Optional[int] = None, pan: bool = False):
+        """Place a caption centred horizontally, at y or centred vertically."""
+        height, width = rgba.shape[:2]
+        x = (self.width - width) // 2
+        if y is None:
+            y = (self.height - height) // 2
+        (self.panned if pan else self.static).append(Layer(rgba, x, y))
+    
+    def base_frame(self) -> np.ndarray:
+        frame = self.background.copy()
+        for layer in self.static:
+            layer.blend(frame)
+        return frame
+    
+    def still_frame(self) -> np.ndarray:
+        """The scene with every layer at rest, for clips where nothing moves."""
+        frame = self.base_frame()
+        for layer in self.panned:
+            layer.blend(frame)
+        return frame
+    
+    def frames(self, duration: float, fps: int, fade: float = 0.0, pan: int = 0):
+        """Yield rgb24 frame buffers; unchanged frames reuse the previous buffer."""
+        total = max(int(round(duration * fps)), 1)
+        base = self.base_frame()
+        fade_frames = min(int(round(fade * fps)), total // 2)
+        previous_key, previous = None, None
+        
+        for index in range(total):
+            offset = int(round(pan * (index / max(total - 1, 1) - 0.5))) if self.panned else 0
+            
+            level = 1.0
+            if fade_frames:
+                level = min(1.0, (index + 1) / fade_frames, (total - index) / fade_frames)
+            
+            key = (offset, level)
+            if key != previous_key:
+                frame = base.copy() if self.panned else base
+                for layer in self.panned:
+                    layer.blend(frame, dx=offset)
+                if level < 1.0:
+                    frame = frame * level
+                previous = np.clip(frame + 0.5, 0, 255).astype(np.uint8).tobytes()
+                previous_key = key
+            yield previous
+    
+    def is_static(self, fade: float, pan: int) -> bool:
+        return fade <= 0 and (pan == 0 or not self.panned)
+
+
+def encode_still(output_path: str, frame: np.ndarray, duration: float, settings: Dict):
+    """Encode one frame held for the whole duration."""
+    with tempfile.NamedTemporaryFile(suffix=".png", dir=os.path.dirname(output_path) or None) as still:
+        Image.fromarray(np.clip(frame + 0.5, 0, 255).astype(np.uint8)).save(still.name, compress_level=1)
+        run_ffmpeg([
+            "-loop", "1", "-framerate", str(settings["fps"]), "-i", still.name,
+            "-t", f"{duration:.3f}",
+            "-c:v", settings["codec"], "-preset", settings["preset"], "-threads", str(settings["threads"]),
+            *(["-tune", "stillimage"] if settings["codec"] == "libx264" else []),
+            "-pix_fmt", "yuv420p", "-r", str(settings["fps"]),
+            output_path
+        ])
+
+
+def encode_frames(output_path: str, frames, settings: Dict):
+    """Pipe raw rgb24 buffers straight into the encoder."""
+    process = subprocess.Popen(
+        [
+            ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "rgb24",
+            "-s", f"{settings['width']}x{settings['height']}",
+            "-framerate", str(settings["fps"]), "-i", "pipe:0",
+            "-c:v", settings["codec"], "-preset", settings["preset"], "-threads", str(settings["threads"]),
+            "-pix_fmt", "yuv420p",
+            output_path
+        ],
+        stdin=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    try:
+        for frame in frames:
+            process.stdin.write(frame)
+        process.stdin.close()
+    except BrokenPipeError:
+        pass
+    except Exception:
+        process.kill()
+        process.wait()
+        raise
+    stderr = process.stderr.read().decode(errors="replace")
+    if process.wait() != 0:
+        raise Exception(f"ffmpeg failed: {stderr.strip()[-500:]}")
+
+
+def render_composite(output_path: str, compositor: FrameCompositor, duration: float, settings: Dict, fade: float = 0.0, pan: int = 0):
+    """Encode a composited scene, taking the still-image path when nothing moves."""
+    if compositor.is_static(fade, pan):
+        encode_still(output_path, compositor.still_frame(), duration, settings)
+    else:
+        encode_frames(output_path, compositor.frames(duration, settings["fps"], fade, pan), settings)
@@ -0,0 +1,64 @@
+from typing import Dict, List
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING
+
+
+# Every lookup in the API and the workflow filters on one of these
+INDEX_SPECS = {
+    "projects": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("status", ASCENDING)]},
+        {"keys": [("created_at", DESCENDING), ("id", DESCENDING)]},
+    ],
+    "scenes": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("project_id", ASCENDING), ("scene_number", ASCENDING)]},
+        {"keys": [("status", ASCENDING)]},
+    ],
+}
+
+
+def _key_tuple(keys) -> tuple:
+    return tuple((field, int(direction)) for field, direction in keys)
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> Dict:
+    """Create any missing indexes. Failures are reported instead of raised."""
+    errors = []
+    for collection, specs in INDEX_SPECS.items():
+        for spec in specs:
+            try:
+                await db[collection].create_index(spec["keys"], unique=spec.get("unique", False))
+            except Exception as e:
+                # e.g. duplicate ids blocking a unique index; the API still works without it
+                errors.append({"collection": collection, "keys": spec["keys"], "error": str(e)})
+    
+    report = await verify_indexes(db)
+    report["errors"] = errors
+    return report
+
+
+async def verify_indexes(db: AsyncIOMotorDatabase) -> Dict:
+    """Compare the indexes that exist against INDEX_SPECS."""
+    report = {"ok": True, "collections": {}}
+    
+    for collection, specs in INDEX_SPECS.items():
+        existing = {
+            _key_tuple(info["key"]): info
+            for info in (await db[collection].index_information()).values()
+        }
+        
+        entries: List[Dict] = []
+        for spec in specs:
+            info = existing.get(_key_tuple(spec["keys"]))
+            present = info is not None and bool(info.get("unique")) == spec.get("unique", False)
+            entries.append({
+                "keys": [field for field, _ in spec["keys"]],
+                "unique": spec.get("unique", False),
+                "present": present
+            })
+            report["ok"] = report["ok"] and present
+        
+        report["collections"][collection] = entries
+    
+    return report
@@ -0,0 +1,124 @@
+import os
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List, Set
+
+PROJECT_FIELDS = ("status", "total_scenes", "completed_scenes", "video_url", "playlist_url", "preview_url", "profile_url", "artifacts", "error_message")
+SCENE_FIELDS = ("scene_number", "status", "animation_path", "voice_path", "video_path", "error_message")
+
+
+class Subscription:
+    """A subscriber's pending events, coalesced to the latest state per entity.
+    
+    A slow client never blocks publishers and never grows without bound: if
+    it falls behind, several transitions of the same scene collapse into the
+    newest one, so the final state is always delivered.
+    """
+    
+    def __init__(self, project_id: str, max_pending: int):
+        self.project_id = project_id
+        self.max_pending = max_pending
+        self.pending: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self.ready = asyncio.Event()
+        self.coalesced = 0
+        self.dropped = 0
+    
+    def push(self, event: Dict):
+        key = (event["type"], event["id"])
+        if key in self.pending:
+            # Merge so fields from the superseded event aren't lost
+            self.pending[key] = {**self.pending.pop(key), **event}
+            self.coalesced += 1
+        else:
+            self.pending[key] = event
+            if len(self.pending) > self.max_pending:
+                self.pending.popitem(last=False)
+                self.dropped += 1
+        self.ready.set()
+    
+    async def next_batch(self, timeout: float) -> List[Dict]:
+        """Wait up to timeout for events and return everything pending."""
+        if not self.pending:
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        
+        batch = list(self.pending.values())
+        self.pending.clear()
+        self.ready.clear()
+        return batch
+
+
+class EventBus:
+    """In-process pub/sub for project and scene status transitions."""
+    
+    def __init__(self):
+        self.max_pending = int(os.environ.get('EVENTS_MAX_PENDING', '500'))
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self.published = 0
+    
+    def subscribe(self, project_id: str) -> Subscription:
+        subscription = Subscription(project_id, self.max_pending)
+        self._subscribers.setdefault(project_id, set()).add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.project_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.project_id]
+    
+    def publish(self, project_id: str, event: Dict):
+        """Deliver an event to every subscriber of the project without blocking."""
+        self.published += 1
+        for subscription in self._subscribers.get(project_id, ()):
+            subscription.push(event)
+    
+    def stats(self) -> Dict:
+        subscriptions = [s for subscribers in self._subscribers.values() for s in subscribers]
+        return {
+            "subscribers": len(subscriptions),
+            "watched_projects": len(self._subscribers),
+            "published": self.published,
+            "coalesced": sum(s.coalesced for s in subscriptions),
+            "dropped": sum(s.dropped for s in subscriptions)
+        }
+
+
+def project_event(project_id: str, fields: Dict) -> Dict:
+    return {"type": "project", "id": project_id, **{k: v for k, v in fields.items() if k in PROJECT_FIELDS}}
+
+
+def scene_event(scene_id: str, fields: Dict) -> Dict:
+    return {"type": "scene", "id": scene_id, **{k: v for k, v in fields.items() if k in SCENE_FIELDS}}
+
+
+async def bridge_change_streams(db, bus: EventBus):
+    """Republish MongoDB change stream updates on the local bus.
+    
+    Needed when pipelines run on other replicas or queue workers. Change
+    streams require MongoDB to run as a replica set.
+    """
+    pipeline = [{"$match": {
+        "ns.coll": {"$in": ["projects", "scenes"]},
+        "operationType": {"$in": ["insert", "update", "replace"]}
+    }}]
+    
+    while True:
+        try:
+            async with db.watch(pipeline, full_document="updateLookup") as stream:
+                async for change in stream:
+                    document = change.get("fullDocument")
+                    if not document:
+                        continue
+                    if change["ns"]["coll"] == "projects":
+                        bus.publish(document["id"], project_event(document["id"], document))
+                    else:
+                        bus.publish(document["project_id"], scene_event(document["id"], document))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[Events] Change stream error: {e}, reconnecting")
+            await asyncio.sleep(5)
@@ -0,0 +1,98 @@
+import os
+import re
+import subprocess
+from typing import Dict, List, Optional
+
+
+def ffmpeg_exe() -> str:
+    """Locate the ffmpeg binary (the one bundled with imageio-ffmpeg by default)."""
+    exe = os.environ.get('FFMPEG_BINARY')
+    if exe:
+        return exe
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except ImportError:
+        return "ffmpeg"
+
+
+# ffmpeg runs longer than this are killed, failing only the job that started them
+FFMPEG_TIMEOUT = float(os.environ.get('FFMPEG_TIMEOUT', '540'))
+
+
+def run_ffmpeg(args: List[str], timeout: Optional[float] = None):
+    """Run ffmpeg with the given arguments, raising on failure or when it outlives the timeout."""
+    timeout = timeout or FFMPEG_TIMEOUT
+    try:
+        result = subprocess.run(
+            [ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y", *args],
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        # subprocess.run has already killed it
+        raise Exception(f"ffmpeg did not finish within {timeout:.0f}s")
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg failed: {result.stderr.strip()[-500:]}")
+
+
+def probe_media(path: str) -> Dict:
+    """Read stream parameters from a media file header without decoding it."""
+    # The bundled ffmpeg has no ffprobe, so parse the banner of `ffmpeg -i`
+    result = subprocess.run(
+        [ffmpeg_exe(), "-hide_banner", "-i", path],
+        capture_output=True,
+        text=True
+    )
+    info = result.stderr
+    
+    if "No such file" in info or "Invalid data" in info:
+        raise Exception(f"Could not probe {path}")
+    
+    media = {
+        "duration": None,
+        "has_video": False,
+        "video_codec": None,
+        "pix_fmt": None,
+        "width": None,
+        "height": None,
+        "fps": None,
+        "has_audio": False,
+        "audio_codec": None,
+        "sample_rate": None,
+        "channels": None
+    }
+    
+    duration = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", info)
+    if duration:
+        hours, minutes, seconds = duration.groups()
+        media["duration"] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    
+    video = re.search(r"Stream #.*?: Video: (\w+)[^,]*, (\w+)(.*)", info)
+    if video:
+        media["has_video"] = True
+        media["video_codec"] = video.group(1)
+        media["pix_fmt"] = video.group(2)
+        size = re.search(r", (\d{2,5})x(\d{2,5})", video.group(3))
+        if size:
+            media["width"], media["height"] = int(size.group(1)), int(size.group(2))
+        fps = re.search(r"([\d.]+) fps", video.group(3))
+        if fps:
+            media["fps"] = float(fps.group(1))
+    
+    audio = re.search(r"Stream #.*?: Audio: (\w+).*?(\d+) Hz, ([\w.()]+)", info)
+    if audio:
+        media["has_audio"] = True
+        media["audio_codec"] = audio.group(1)
+        media["sample_rate"] = int(audio.group(2))
+        media["channels"] = audio.group(3)
+    
+    return media
+
+
+def video_signature(media: Dict) -> Optional[tuple]:
+    """Parameters that must match for segments to be joined without re-encoding."""
+    if not media.get("has_video"):
+        return None
+    return (media["video_codec"], media["pix_fmt"], media["width"], media["height"], media["fps"])
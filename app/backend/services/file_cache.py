@@ -0,0 +1,226 @@
+import os
+import json
+import uuid
+import fcntl
+import shutil
+import asyncio
+import hashlib
+import weakref
+from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+
+class FileCache:
+    """Content-addressed on-disk cache with a size budget and LRU eviction.
+    
+    Entries are immutable files named by the hash of their inputs. Recency is
+    tracked through the file mtime, so the cache survives restarts and can be
+    shared by every process on the host. Population of a key is serialised
+    with an in-process lock plus an flock on a lock file of its own, so
+    concurrent workers asking for the same key produce it once and the others
+    wait for the result, while other keys are never held up.
+    """
+    
+    def __init__(self, root: str, max_bytes: int, suffix: str = ""):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / "locks").mkdir(exist_ok=True)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._locks = weakref.WeakValueDictionary()
+        # Bytes in the cache as of the last scan plus what this process added since
+        self._size: Optional[int] = None
+        self._evicting = asyncio.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Hash JSON-serialisable inputs into a cache key."""
+        payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def path_for(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}{self.suffix}"
+    
+    def _lookup(self, key: str) -> Optional[Path]:
+        path = self.path_for(key)
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            return None
+        return path
+    
+    def get(self, key: str) -> Optional[Path]:
+        path = self._lookup(key)
+        if path:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return path
+    
+    @asynccontextmanager
+    async def lock(self, key: str):
+        """Exclusive lock on a key, across tasks and across processes."""
+        local = self._locks.get(key)
+        if local is None:
+            local = asyncio.Lock()
+            self._locks[key] = local
+        
+        async with local:
+            lock_path = self.root / "locks" / f"{key}.lock"
+            fd = await self._flock(lock_path)
+            try:
+                yield
+            finally:
+                # Deleted while still held, so lock files don't accumulate per key
+                try:
+                    os.unlink(lock_path)
+                except FileNotFoundError:
+                    pass
+                os.close(fd)  # Closing the descriptor releases the flock
+    
+    @staticmethod
+    async def _flock(lock_path: Path) -> int:
+        """Take an exclusive flock, polling so waiters don't each park an executor thread."""
+        delay = 0.01
+        while True:
+            fd = os.open(lock_path, os.O_CREAT | os.O_RDWR)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.5)
+                continue
+            
+            # A holder that finished deleted the file we locked; the lock only
+            # counts if it is on the file that is at the path now
+            try:
+                if os.fstat(fd).st_ino == os.stat(lock_path).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+    
+    async def get_or_create(self, key: str, produce: Callable[[str], Awaitable]) -> Path:
+        """Return the cached file for key, calling produce(tmp_path) to create it once."""
+        path = self._lookup(key)
+        if path:
+            self.hits += 1
+            return path
+        
+        async with self.lock(key):
+            # Another worker may have produced it while we waited
+            path = self._lookup(key)
+            if path:
+                self.hits += 1
+                self.coalesced += 1
+                return path
+            
+            self.misses += 1
+            path = self.path_for(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.parent / f"{key}.{uuid.uuid4().hex}.tmp{self.suffix}"
+            try:
+                await produce(str(tmp_path))
+                size = tmp_path.stat().st_size
+                os.replace(tmp_path, path)
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+        
+        await self._account(size)
+        return path
+    
+    async def place(self, key: str, produce: Callable[[str], Awaitable], destination: str) -> str:
+        """Expose the entry for key at destination, producing it first if needed.
+        
+        An entry evicted between the lookup and the link is produced again.
+        """
+        for attempt in range(2):
+            path = await self.get_or_create(key, produce)
+            try:
+                link_or_copy(str(path), destination)
+                return destination
+            except FileNotFoundError:
+                if attempt == 1:
+                    raise
+                print(f"[Cache] Entry {key[:12]} was evicted before it could be linked, producing it again")
+    
+    async def _account(self, added: int):
+        """Count a new entry, and scan the cache off the event loop only when it may be over budget."""
+        if self._size is not None:
+            self._size += added
+            if self._size <= self.max_bytes:
+                return
+        async with self._evicting:
+            if self._size is None or self._size > self.max_bytes:
+                self._size = await asyncio.to_thread(self.evict)
+    
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits its budget, returning the bytes left."""
+        entries = []
+        total = 0
+        for path in self.root.glob(f"*/*{self.suffix}"):
+            if path.parent.name == "locks" or ".tmp" in path.name:
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        return total
+    
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "max_bytes": self.max_bytes
+        }
+
+
+def link_or_copy(src: str, dst: str):
+    """Expose a cached file at dst without duplicating its bytes where possible."""
+    tmp_dst = f"{dst}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.link(src, tmp_dst)
+    except OSError:
+        shutil.copyfile(src, tmp_dst)
+    os.replace(tmp_dst, dst)
+
+
+async def write_replacing(path: str, produce: Callable[[str], Awaitable]) -> str:
+    """Have produce(tmp_path) write a new file, then move it onto path.
+    
+    Working outputs may be hard links to cache entries; replacing gives path a
+    new inode, where writing in place would rewrite the cached copy as well.
+    """
+    root, extension = os.path.splitext(path)
+    tmp_path = f"{root}.{uuid.uuid4().hex}.tmp{extension}"  # Same extension, so encoders pick the same format
+    try:
+        await produce(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
@@ -0,0 +1,114 @@
+import os
+import math
+import shutil
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PLAYLIST_NAME = "playlist.m3u8"
+
+
+def read_media_playlist(path: str) -> List[Tuple[float, str]]:
+    """Return the (duration, uri) pairs listed in an HLS media playlist."""
+    segments = []
+    duration = None
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",")[0])
+            elif line and not line.startswith("#") and duration is not None:
+                segments.append((duration, line))
+                duration = None
+    return segments
+
+
+class HLSPlaylist:
+    """Live EVENT playlist for one project that grows as scenes finish.
+    
+    Scenes complete out of order, but only the contiguous run of finished
+    scenes from the start is listed, so the playlist is strictly append-only
+    the way players expect. Every scene starts at timestamp zero, hence the
+    discontinuity tag between scenes.
+    """
+    
+    def __init__(self, directory: Path, target_duration: int):
+        self.directory = Path(directory)
+        self.target_duration = target_duration
+        self.expected: List[int] = []
+        self.segments: Dict[int, List[Tuple[float, str]]] = {}
+        self.published = 0
+        self.finished = False
+    
+    @property
+    def path(self) -> Path:
+        return self.directory / PLAYLIST_NAME
+    
+    def reset(self):
+        """Drop segments left over from an earlier attempt."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Players can load the playlist before the first scene is ready
+        self.write()
+    
+    def expect(self, scene_numbers: List[int]):
+        """Register scenes that will appear in the playlist, in playback order."""
+        self.expected = sorted(set(self.expected) | set(scene_numbers))
+    
+    def add_scene(self, scene_number: int, segments: List[Tuple[float, str]]):
+        self.segments[scene_number] = segments
+        if scene_number not in self.expected:
+            self.expect([scene_number])
+        self.write()
+    
+    def finish(self):
+        """List every packaged scene and close the playlist with ENDLIST."""
+        self.finished = True
+        self.write()
+    
+    def _listed(self) -> List[int]:
+        if self.finished:
+            # Published scenes stay a prefix; scenes that never packaged are skipped
+            return [number for number in self.expected if number in self.segments]
+        listed = []
+        for number in self.expected:
+            if number not in self.segments:
+                break
+            listed.append(number)
+        return listed
+    
+    def write(self):
+        listed = self._listed()
+        if len(listed) == self.published and not self.finished and self.path.exists():
+            return
+        
+        longest = max((duration for number in listed for duration, _ in self.segments[number]), default=0)
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{max(self.target_duration, math.ceil(longest))}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for index, number in enumerate(listed):
+            if index:
+                lines.append("#EXT-X-DISCONTINUITY")
+            for duration, uri in self.segments[number]:
+                lines.append(f"#EXTINF:{duration:.3f},")
+                lines.append(uri)
+        if self.finished:
+            lines.append("#EXT-X-ENDLIST")
+        
+        # Players poll the playlist, so it is replaced atomically
+        tmp_path = self.path.with_name(f".{PLAYLIST_NAME}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+        self.published = len(listed)
+    
+    def stats(self) -> Dict:
+        return {
+            "expected_scenes": len(self.expected),
+            "packaged_scenes": len(self.segments),
+            "published_scenes": self.published,
+            "finished": self.finished
+        }
@@ -0,0 +1,202 @@
+import os
+from typing import Dict, List, Optional
+from datetime import datetime, timezone, timedelta
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from models import JobStatus
+
+
+def _timestamp(dt: datetime) -> str:
+    # Fixed precision so ISO strings order the same way as the times they encode
+    return dt.isoformat(timespec='microseconds')
+
+
+class JobQueue:
+    """Durable job queue stored in the `jobs` collection.
+    
+    Workers claim a job by atomically taking a lease on it. The lease is
+    extended by heartbeats while the job runs; if a worker dies the lease
+    expires and the job becomes claimable again. Failed jobs are retried with
+    exponential backoff until they run out of attempts. A project has at most
+    one pending or running job, so two workers never run the same pipeline.
+    """
+    
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.jobs = db.jobs
+        self.lease_seconds = float(os.environ.get('JOB_LEASE_SECONDS', '60'))
+        self.retry_backoff = float(os.environ.get('JOB_RETRY_BACKOFF', '10'))
+        self.max_backoff = float(os.environ.get('JOB_MAX_BACKOFF', '600'))
+        self.max_attempts = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+    
+    async def ensure_indexes(self):
+        await self.jobs.create_index("id", unique=True)
+        await self.jobs.create_index([("status", ASCENDING), ("available_at", ASCENDING)])
+        await self.jobs.create_index([("status", ASCENDING), ("lease_expires_at", ASCENDING)])
+        await self.jobs.create_index(
+            "project_id", unique=True, partialFilterExpression={"active": True}, name="one_active_job_per_project"
+        )
+    
+    async def enqueue(self, job_type: str, project_id: str, payload: Optional[Dict] = None,
+                      scene_id: Optional[str] = None) -> JobStatus:
+        """Add a job to the queue, unless the project already has one pending or running.
+        
+        Returns the new job, or the active one that will run the project instead.
+        """
+        job = JobStatus(
+            job_type=job_type,
+            project_id=project_id,
+            scene_id=scene_id,
+            payload=payload or {},
+            max_attempts=self.max_attempts
+        )
+        
+        job_dict = job.model_dump()
+        for field in ('available_at', 'created_at', 'updated_at'):
+            job_dict[field] = _timestamp(job_dict[field])
+        try:
+            result = await self.jobs.update_one(
+                {"project_id": project_id, "active": True},
+                {"$setOnInsert": job_dict},
+                upsert=True
+            )
+            if result.upserted_id is not None:
+                return job
+        except DuplicateKeyError:
+            pass  # A concurrent enqueue for the same project won
+        
+        existing = await self.active_job(project_id)
+        return JobStatus(**existing) if existing else job
+    
+    async def active_job(self, project_id: str) -> Optional[Dict]:
+        """The project's pending or running job, if any."""
+        return await self.jobs.find_one({"project_id": project_id, "active": True}, {"_id": 0})
+    
+    async def claim(self, worker_id: str, job_types: Optional[List[str]] = None) -> Optional[Dict]:
+        """Lease the oldest runnable job, including ones whose previous lease expired."""
+        while True:
+            now = datetime.now(timezone.utc)
+            query = {"$or": [
+                {"status": "pending", "available_at": {"$lte": _timestamp(now)}},
+                {"status": "running", "lease_expires_at": {"$lt": _timestamp(now)}}
+            ]}
+            if job_types:
+                query["job_type"] = {"$in": job_types}
+            
+            job = await self.jobs.find_one_and_update(
+                query,
+                {
+                    "$set": {
+                        "status": "running",
+                        "lease_owner": worker_id,
+                        "lease_expires_at": _timestamp(now + timedelta(seconds=self.lease_seconds)),
+                        "updated_at": _timestamp(now)
+                    },
+                    "$inc": {"attempts": 1}
+                },
+                sort=[("available_at", ASCENDING)],
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+            if job is None:
+                return None
+            
+            # A job whose worker keeps dying must not be re-leased forever
+            if job["attempts"] > job["max_attempts"]:
+                await self.jobs.update_one(
+                    {"id": job["id"], "lease_owner": worker_id},
+                    {"$set": {
+                        "status": "failed",
+                        "active": False,
+                        "message": "Lease expired too many times",
+                        "lease_owner": None,
+                        "updated_at": _timestamp(now)
+                    }}
+                )
+                continue
+            
+            return job
+    
+    async def heartbeat(self, job_id: str, worker_id: str, progress: Optional[int] = None,
+                        message: Optional[str] = None) -> bool:
+        """Extend a lease. Returns False if the worker no longer holds the job."""
+        now = datetime.now(timezone.utc)
+        update = {
+            "lease_expires_at": _timestamp(now + timedelta(seconds=self.lease_seconds)),
+            "updated_at": _timestamp(now)
+        }
+        if progress is not None:
+            update["progress"] = progress
+        if message is not None:
+            update["message"] = message
+        
+        result = await self.jobs.update_one(
+            {"id": job_id, "lease_owner": worker_id, "status": "running"},
+            {"$set": update}
+        )
+        return result.matched_count == 1
+    
+    async def complete(self, job_id: str, worker_id: str):
+        await self.jobs.update_one(
+            {"id": job_id, "lease_owner": worker_id},
+            {"$set": {
+                "status": "completed",
+                "active": False,
+                "progress": 100,
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "updated_at": _timestamp(datetime.now(timezone.utc))
+            }}
+        )
+    
+    async def fail(self, job_id: str, worker_id: str, error: str):
+        """Schedule a retry with exponential backoff, or fail the job for good."""
+        job = await self.jobs.find_one({"id": job_id, "lease_owner": worker_id}, {"_id": 0})
+        if not job:
+            return
+        
+        now = datetime.now(timezone.utc)
+        update = {
+            "message": error,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "updated_at": _timestamp(now)
+        }
+        if job["attempts"] < job["max_attempts"]:
+            delay = min(self.max_backoff, self.retry_backoff * (2 ** (job["attempts"] - 1)))
+            update["status"] = "pending"
+            update["available_at"] = _timestamp(now + timedelta(seconds=delay))
+        else:
+            update["status"] = "failed"
+            update["active"] = False
+        
+        await self.jobs.update_one({"id": job_id, "lease_owner": worker_id}, {"$set": update})
+    
+    async def release(self, job_id: str, worker_id: str):
+        """Hand a job back without counting the attempt (e.g. on worker shutdown)."""
+        now = datetime.now(timezone.utc)
+        await self.jobs.update_one(
+            {"id": job_id, "lease_owner": worker_id},
+            {
+                "$set": {
+                    "status": "pending",
+                    "available_at": _timestamp(now),
+                    "lease_owner": None,
+                    "lease_expires_at": None,
+                    "updated_at": _timestamp(now)
+                },
+                "$inc": {"attempts": -1}
+            }
+        )
+    
+    async def stats(self) -> Dict:
+        """Job counts per status, plus how many are runnable right now."""
+        counts = {"pending": 0, "running": 0, "completed": 0, "failed": 0}
+        async for row in self.jobs.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        
+        counts["ready"] = await self.jobs.count_documents(
+            {"status": "pending", "available_at": {"$lte": _timestamp(datetime.now(timezone.utc))}}
+        )
+        return counts
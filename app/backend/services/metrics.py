@@ -0,0 +1,206 @@
+import os
+import sys
+import time
+import resource
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# Wide enough for both sub-millisecond Mongo writes and multi-minute compiles
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+BYTES_BUCKETS = (1024, 16 * 1024, 256 * 1024, 1024 ** 2, 16 * 1024 ** 2, 256 * 1024 ** 2, 1024 ** 3)
+# Span fields that identify one piece of work; logged, but never used as labels
+SPAN_ONLY_FIELDS = ("project_id", "scene_id")
+
+
+def peak_rss_bytes() -> int:
+    """High-water resident set size of this process."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process right now; the high-water mark where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class Span:
+    """Times one stage of the pipeline; use as a context manager.
+    
+    CPU time is the whole process's, so it is only exact for stages that
+    don't overlap; work done in render workers is measured there instead.
+    Set `bytes_written` before the span closes to record output size.
+    """
+    
+    def __init__(self, registry: "Metrics", stage: str, labels: Dict[str, str]):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+        self.bytes_written = 0
+        self.duration = 0.0
+        self.cpu = 0.0
+    
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._start
+        self.cpu = time.process_time() - self._cpu_start
+        self.registry.record_span(self, error=exc_type is not None)
+        return False
+
+
+class Metrics:
+    """Process-wide span histograms and counters, rendered in Prometheus text format."""
+    
+    def __init__(self, namespace: str = "swami", recent_spans: int = 500):
+        self.namespace = namespace
+        self.histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple], float] = {}
+        self.gauges: Dict[Tuple[str, Tuple], float] = {}
+        self.help: Dict[str, Tuple[str, str]] = {}
+        self.recent = deque(maxlen=recent_spans)
+    
+    def span(self, stage: str, **labels) -> Span:
+        return Span(self, stage, {k: str(v) for k, v in labels.items()})
+    
+    def record_span(self, span: Span, error: bool = False):
+        # Ids would explode label cardinality, they only go to the span log
+        labels = {k: v for k, v in span.labels.items() if k not in SPAN_ONLY_FIELDS}
+        labels["stage"] = span.stage
+        self.observe("stage_duration_seconds", span.duration, DURATION_BUCKETS, "Wall time per pipeline stage", **labels)
+        self.observe("stage_cpu_seconds", span.cpu, DURATION_BUCKETS, "Process CPU time per pipeline stage", **labels)
+        if span.bytes_written:
+            self.observe("stage_bytes_written", span.bytes_written, BYTES_BUCKETS, "Bytes written per pipeline stage", **labels)
+        if error:
+            self.inc("stage_errors_total", 1, "Pipeline stages that raised", **labels)
+        
+        self.recent.append({
+            "stage": span.stage,
+            **span.labels,
+            "duration": round(span.duration, 6),
+            "cpu": round(span.cpu, 6),
+            "bytes_written": span.bytes_written,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "error": error,
+            "finished_at": time.time()
+        })
+    
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...], help: str, **labels):
+        self.help.setdefault(name, ("histogram", help))
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+    
+    def inc(self, name: str, amount: float, help: str, **labels):
+        self.help.setdefault(name, ("counter", help))
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+    
+    def set_max(self, name: str, value: float, help: str, **labels):
+        """Keep a gauge at the highest value seen."""
+        self.help.setdefault(name, ("gauge", help))
+        key = (name, tuple(sorted(labels.items())))
+        self.gauges[key] = max(self.gauges.get(key, 0), value)
+    
+    def spans(self, limit: int = 100, project_id: Optional[str] = None) -> List[Dict]:
+        spans = [span for span in self.recent if project_id is None or span.get("project_id") == project_id]
+        return spans[-limit:]
+    
+    def _name(self, name: str) -> str:
+        return f"{self.namespace}_{name}"
+    
+    @staticmethod
+    def _labels(labels, extra: Tuple = ()) -> str:
+        pairs = [*labels, *extra]
+        if not pairs:
+            return ""
+        escaped = ",".join(f'{key}="{_escape(value)}"' for key, value in pairs)
+        return "{" + escaped + "}"
+    
+    def render(self, gauges: Optional[Dict[str, Tuple[str, Dict[Tuple, float]]]] = None) -> str:
+        """Prometheus exposition text; `gauges` adds point-in-time values read at scrape time."""
+        lines = []
+        described = set()
+        
+        def describe(name: str, kind: str, help: str):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {self._name(name)} {help}")
+                lines.append(f"# TYPE {self._name(name)} {kind}")
+        
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            describe(name, "histogram", self.help[name][1])
+            full = self._name(name)
+            # Bucket counts are already cumulative
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f"{full}_bucket{self._labels(labels, (('le', bound),))} {count}")
+            lines.append(f"{full}_bucket{self._labels(labels, (('le', '+Inf'),))} {histogram.count}")
+            lines.append(f"{full}_sum{self._labels(labels)} {histogram.sum}")
+            lines.append(f"{full}_count{self._labels(labels)} {histogram.count}")
+        
+        for source in (self.counters, self.gauges):
+            for (name, labels), value in sorted(source.items()):
+                describe(name, self.help[name][0], self.help[name][1])
+                lines.append(f"{self._name(name)}{self._labels(labels)} {value}")
+        
+        describe("process_peak_rss_bytes", "gauge", "High-water resident set size of the API process")
+        lines.append(f"{self._name('process_peak_rss_bytes')} {peak_rss_bytes()}")
+        
+        for name, (help, values) in (gauges or {}).items():
+            describe(name, "gauge", help)
+            for labels, value in values.items():
+                lines.append(f"{self._name(name)}{self._labels(labels)} {value}")
+        
+        return "\n".join(lines) + "\n"
+
+
+_metrics: Optional[Metrics] = None
+
+
+def get_metrics() -> Metrics:
+    """Process-wide metrics registry."""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics(recent_spans=int(os.environ.get('METRICS_RECENT_SPANS', '500')))
+    return _metrics
+
+
+def _cpu_seconds() -> float:
+    # ffmpeg runs as a child of the worker, so reaped children count too
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def measure_job(fn, *args):
+    """Run a render job and return its result with the worker's CPU time and peak RSS."""
+    cpu_start = _cpu_seconds()
+    result = fn(*args)
+    return result, {"cpu": _cpu_seconds() - cpu_start, "peak_rss_bytes": peak_rss_bytes()}
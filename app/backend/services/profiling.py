@@ -0,0 +1,130 @@
+import io
+import os
+import marshal
+import time
+import pstats
+import cProfile
+import zipfile
+import tracemalloc
+import contextvars
+from pathlib import Path
+from typing import Dict, Optional
+
+_session: contextvars.ContextVar = contextvars.ContextVar("profiling_session", default=None)
+_running: Optional["ProfilingSession"] = None
+
+
+class ProfilingBusy(Exception):
+    """Raised when another project is already being profiled in this process."""
+
+
+class _RawStats:
+    """Adapter so pstats can merge the stats dict a worker sent back."""
+    
+    def __init__(self, stats: Dict):
+        self.stats = stats
+    
+    def create_stats(self):
+        pass
+
+
+class ProfilingSession:
+    """CPU profile and allocation snapshot for one project's pipeline run.
+    
+    cProfile and tracemalloc are process-wide, so only one project is profiled
+    at a time, and coroutines of other projects interleaved on the same event
+    loop show up too. Render jobs started from the run are profiled inside
+    their worker processes and merged into a separate worker profile.
+    """
+    
+    def __init__(self, project_id: str, output_dir: Path):
+        self.project_id = project_id
+        self.output_dir = Path(output_dir)
+        self.profiler = cProfile.Profile()
+        self.worker_stats: Optional[pstats.Stats] = None
+        self.worker_jobs: Dict[str, int] = {}
+        self._token = None
+        self._started_tracemalloc = False
+    
+    def start(self):
+        global _running
+        if _running is not None:
+            raise ProfilingBusy(f"Project {_running.project_id} is already being profiled")
+        _running = self
+        
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(int(os.environ.get('PROFILE_TRACEBACK_DEPTH', '10')))
+            self._started_tracemalloc = True
+        self._token = _session.set(self)
+        self.started_at = time.perf_counter()
+        self.profiler.enable()
+    
+    def add_worker_stats(self, job: str, stats: Dict):
+        self.worker_jobs[job] = self.worker_jobs.get(job, 0) + 1
+        if self.worker_stats is None:
+            self.worker_stats = pstats.Stats(_RawStats(stats))
+        else:
+            self.worker_stats.add(_RawStats(stats))
+    
+    def stop(self) -> str:
+        """Stop collecting and write the artifact; returns the zip's path."""
+        global _running
+        self.profiler.disable()
+        elapsed = time.perf_counter() - self.started_at
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        _session.reset(self._token)
+        _running = None
+        
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        archive_path = self.output_dir / f"profile_{self.project_id}.zip"
+        tmp_path = archive_path.with_suffix(".zip.tmp")
+        
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            report = io.StringIO()
+            report.write(f"Project {self.project_id}: {elapsed:.2f}s wall, peak traced memory {peak / 1024 ** 2:.1f} MiB\n\n")
+            
+            stats = pstats.Stats(self.profiler, stream=report)
+            report.write("== Event loop process, by cumulative time ==\n")
+            stats.sort_stats("cumulative").print_stats(40)
+            archive.writestr("pipeline.prof", _dump(stats))
+            
+            if self.worker_stats is not None:
+                report.write(f"== Render workers ({self.worker_jobs}), by cumulative time ==\n")
+                self.worker_stats.stream = report
+                self.worker_stats.sort_stats("cumulative").print_stats(40)
+                archive.writestr("workers.prof", _dump(self.worker_stats))
+            
+            report.write("== Largest allocations still held at the end of the run ==\n")
+            for stat in snapshot.statistics("lineno")[:30]:
+                report.write(f"{stat}\n")
+            
+            archive.writestr("report.txt", report.getvalue())
+            archive.writestr("allocations.txt", "\n".join(str(stat) for stat in snapshot.statistics("traceback")[:100]))
+        
+        os.replace(tmp_path, archive_path)
+        return str(archive_path)
+
+
+def _dump(stats: pstats.Stats) -> bytes:
+    """Serialize stats in the format `pstats`/snakeviz load."""
+    return marshal.dumps(stats.stats)
+
+
+def current_session() -> Optional[ProfilingSession]:
+    """The profiling session of the pipeline run this code belongs to, if any."""
+    return _session.get()
+
+
+def profile_job(fn, *args):
+    """Run a render job under cProfile (in its worker) and return its result with the raw stats."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = fn(*args)
+    finally:
+        profiler.disable()
+    profiler.create_stats()
+    return result, profiler.stats
@@ -0,0 +1,107 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+_raster_cache = None
+
+
+class RasterCache:
+    """LRU cache of rendered caption bitmaps, bounded by their total size in bytes.
+    
+    Render workers are separate processes, so each keeps its own cache; the
+    counters are drained after every job so the API process can add them up.
+    """
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def caption(self, text: str, font_size: int, color: Tuple[int, int, int], box_width: int):
+        """Return the RGBA raster for a caption, rendering it on first use."""
+        from services.compositor import load_font, rasterize_caption
+        
+        key = (text, getattr(load_font(font_size), "path", None), font_size, tuple(color), box_width)
+        with self._lock:
+            raster = self._entries.get(key)
+            if raster is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return raster
+            self.misses += 1
+        
+        raster = rasterize_caption(text, font_size, color, box_width)
+        raster.setflags(write=False)  # Shared between renders
+        
+        with self._lock:
+            if key not in self._entries and raster.nbytes <= self.max_bytes:
+                self._entries[key] = raster
+                self.bytes += raster.nbytes
+                while self.bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.bytes -= evicted.nbytes
+                    self.evictions += 1
+        return raster
+    
+    def drain_counters(self) -> Dict:
+        """Return and reset the hit/miss/eviction counters."""
+        with self._lock:
+            counters = {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+            self.hits = self.misses = self.evictions = 0
+        return counters
+    
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes
+        }
+
+
+def get_raster_cache() -> RasterCache:
+    """Process-wide caption cache (one per render worker)."""
+    global _raster_cache
+    if _raster_cache is None:
+        _raster_cache = RasterCache(int(os.environ.get('RASTER_CACHE_MAX_BYTES', str(64 * 1024 ** 2))))
+    return _raster_cache
+
+
+def with_raster_stats(fn, *args):
+    """Run a render function and return its result with the cache counters it produced."""
+    result = fn(*args)
+    return result, get_raster_cache().drain_counters()
+
+
+class RasterStats:
+    """Caption cache counters summed over every render job, kept in the API process."""
+    
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes or int(os.environ.get('RASTER_CACHE_MAX_BYTES', str(64 * 1024 ** 2)))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def add(self, counters: Dict):
+        self.hits += counters.get("hits", 0)
+        self.misses += counters.get("misses", 0)
+        self.evictions += counters.get("evictions", 0)
+    
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "max_bytes_per_worker": self.max_bytes
+        }
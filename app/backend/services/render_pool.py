@@ -0,0 +1,163 @@
+import os
+import signal
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+
+from services.metrics import DURATION_BUCKETS, get_metrics, measure_job
+from services.profiling import current_session, profile_job
+
+
+class RenderTimeout(Exception):
+    """Raised when a render job exceeds its time budget."""
+
+
+class RenderPool:
+    """Render Farm - Runs blocking encodes in a pool of worker processes.
+    
+    Jobs are plain module-level functions so they can be pickled into the
+    workers. The pool keeps the event loop free while MoviePy/ffmpeg encode,
+    and a job that hangs or crashes its worker only costs that job: the pool
+    is replaced, together with any ffmpeg its workers started, and jobs that
+    were sharing it are resubmitted once.
+    """
+    
+    def __init__(self, max_workers: Optional[int] = None, job_timeout: Optional[float] = None):
+        self.max_workers = max_workers or int(os.environ.get('RENDER_WORKERS', os.cpu_count() or 2))
+        self.job_timeout = job_timeout or float(os.environ.get('RENDER_JOB_TIMEOUT', '600'))
+        self._executor = None
+        self._slots = asyncio.Semaphore(self.max_workers)
+        
+        # Introspection counters
+        self.queued = 0
+        self.busy = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.restarts = 0
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # "spawn" so workers don't inherit the API's event loop and driver threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_start_worker
+            )
+        return self._executor
+    
+    async def submit(self, fn: Callable, *args, timeout: Optional[float] = None, job: Optional[str] = None):
+        """Run fn(*args) in a worker process and return its result.
+        
+        `job` names the work in metrics when fn is a generic wrapper.
+        """
+        timeout = timeout or self.job_timeout
+        
+        # Waiting here (rather than inside the executor) keeps queue depth observable
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        
+        self.busy += 1
+        try:
+            return await self._run(fn, args, timeout, job or fn.__name__)
+        finally:
+            self.busy -= 1
+            self._slots.release()
+    
+    async def _run(self, fn: Callable, args: tuple, timeout: float, job: str):
+        loop = asyncio.get_running_loop()
+        metrics = get_metrics()
+        # Jobs started from a profiled project's run are profiled in the worker too
+        session = current_session()
+        call = (profile_job, fn, *args) if session is not None else (fn, *args)
+        
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                result, usage = await asyncio.wait_for(
+                    loop.run_in_executor(executor, measure_job, *call), timeout
+                )
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.failed += 1
+                self._restart(executor)
+                raise RenderTimeout(f"Render job {fn.__name__} exceeded {timeout:.0f}s")
+            except BrokenProcessPool:
+                # A worker died (OOM kill, native crash) or the pool was recycled
+                self._restart(executor)
+                if attempt == 0:
+                    continue
+                self.failed += 1
+                raise Exception(f"Render worker crashed while running {fn.__name__}")
+            except Exception:
+                self.failed += 1
+                raise
+            
+            self.completed += 1
+            if session is not None:
+                result, stats = result
+                session.add_worker_stats(job, stats)
+            metrics.observe("render_job_cpu_seconds", usage["cpu"], DURATION_BUCKETS, "CPU time of render jobs, including ffmpeg", job=job)
+            metrics.set_max("render_worker_peak_rss_bytes", usage["peak_rss_bytes"], "Highest worker RSS seen after a render job", job=job)
+            return result
+    
+    def _restart(self, executor: ProcessPoolExecutor):
+        """Kill the workers of a broken or hung pool; the next job starts a fresh one."""
+        if self._executor is not executor:
+            return  # Already replaced by a sibling job
+        
+        self._executor = None
+        self.restarts += 1
+        
+        # ProcessPoolExecutor can't cancel a running job, so kill its processes.
+        # Each worker leads its own process group, which takes its ffmpeg
+        # children down with it instead of leaving them running as orphans
+        for process in list((executor._processes or {}).values()):
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except Exception:
+                try:
+                    process.kill()
+                except Exception:
+                    pass
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    def stats(self) -> Dict:
+        """Queue depth and worker utilisation, for sizing the pool."""
+        return {
+            "workers": self.max_workers,
+            "busy_workers": self.busy,
+            "idle_workers": self.max_workers - self.busy,
+            "queue_depth": self.queued,
+            "completed_jobs": self.completed,
+            "failed_jobs": self.failed,
+            "timed_out_jobs": self.timeouts,
+            "pool_restarts": self.restarts,
+            "job_timeout": self.job_timeout
+        }
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _start_worker():
+    """Make the worker the leader of a new process group its children join."""
+    os.setpgrp()
+
+
+_render_pool: Optional[RenderPool] = None
+
+
+def get_render_pool() -> RenderPool:
+    """Process-wide render pool shared by the animator and the editor."""
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = RenderPool()
+    return _render_pool
@@ -0,0 +1,39 @@
+import os
+from typing import Dict, Tuple
+
+# Named encode settings. "standard" is what every project rendered with
+# before profiles existed, and can still be tuned through the RENDER_* variables.
+RENDER_PROFILES: Dict[str, Dict] = {
+    "preview": {
+        "width": 426, "height": 240, "fps": 12,
+        "codec": "libx264", "preset": "ultrafast", "threads": 2, "bitrate": "250k"
+    },
+    "standard": {
+        "width": int(os.environ.get('RENDER_WIDTH', '854')),
+        "height": int(os.environ.get('RENDER_HEIGHT', '480')),
+        "fps": int(os.environ.get('RENDER_FPS', '15')),
+        "codec": "libx264", "preset": "ultrafast", "threads": 2, "bitrate": "500k"
+    },
+    "final": {
+        "width": 1280, "height": 720, "fps": 24,
+        "codec": "libx264", "preset": "medium", "threads": 4, "bitrate": "2500k"
+    },
+}
+
+DEFAULT_RENDER_PROFILE = os.environ.get('RENDER_PROFILE', 'standard')
+PREVIEW_PROFILE = "preview"
+# Settings that shape the encoded stream's headers; clips can only be
+# joined by stream copy when they were all encoded with the same ones
+ENCODER_KEYS = ("codec", "preset", "threads", "fps")
+
+
+def get_profile(name: str) -> Dict:
+    """Look up a render profile by name."""
+    if name not in RENDER_PROFILES:
+        raise Exception(f"Unknown render profile '{name}', expected one of {sorted(RENDER_PROFILES)}")
+    return RENDER_PROFILES[name]
+
+
+def encoder_settings(settings: Dict) -> Tuple:
+    """The part of a profile a stream-copy join depends on."""
+    return tuple(settings[key] for key in ENCODER_KEYS)
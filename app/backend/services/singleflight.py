@@ -0,0 +1,56 @@
+import asyncio
+from typing import Awaitable, Callable, Dict
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into a single execution.
+    
+    The first caller for a key starts the work in its own task; every caller,
+    the first included, awaits that task shielded, so cancelling one caller
+    never cancels the others. The work is only cancelled once every caller
+    waiting for it has been cancelled.
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[str, _Call] = {}
+        self.executed = 0
+        self.shared = 0
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        call = self._inflight.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda task, key=key: self._finished(key, task))
+            self._inflight[key] = call
+            self.executed += 1
+        else:
+            self.shared += 1
+        
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Every caller gave up, nobody is left to use the result
+                call.task.cancel()
+    
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is not None and self._inflight[key].task is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved when every waiter had already left
+        if not task.cancelled():
+            task.exception()
+    
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._inflight),
+            "executed": self.executed,
+            "shared": self.shared
+        }
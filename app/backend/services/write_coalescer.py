@@ -0,0 +1,151 @@
+import os
+import asyncio
+from typing import Any, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from bson import encode
+
+from services.metrics import get_metrics
+
+# Write error codes that can succeed when retried (failover, interrupted
+# operations, network trouble, write conflicts). Anything else, such as a
+# duplicate key or a failed validation, fails the same way every time.
+TRANSIENT_WRITE_ERRORS = {6, 7, 50, 89, 91, 112, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436}
+
+
+class WriteCoalescer:
+    """Buffers per-document updates and writes them as one bulk_write per collection.
+    
+    Updates to the same document within the flush window are merged: later
+    $set values win and $inc amounts add up. Buffered writes go out when the
+    window elapses or when the caller flushes at a stage boundary. A batch
+    that fails to write is queued again, so the next flush retries it and an
+    explicit flush raises while the database keeps refusing it. Updates the
+    database rejects for good are logged and dropped instead.
+    """
+    
+    def __init__(self, db: AsyncIOMotorDatabase, window: Optional[float] = None):
+        self.db = db
+        self.window = window if window is not None else float(os.environ.get('WRITE_COALESCE_WINDOW', '0.25'))
+        self._pending: Dict[str, Dict[str, Dict[str, Dict[str, Any]]]] = {}
+        self._timer = None
+        self._flush_task = None
+        self._lock = asyncio.Lock()
+        
+        self.writes_requested = 0
+        self.round_trips = 0
+        self.dropped = 0
+    
+    def update(self, collection: str, doc_id: str, set: Optional[Dict] = None, inc: Optional[Dict] = None):
+        """Queue an update to the document with the given `id`."""
+        ops = self._pending.setdefault(collection, {}).setdefault(doc_id, {})
+        merge_ops(ops, set, inc)
+        
+        self.writes_requested += 1
+        
+        if self.window <= 0:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._schedule_flush)
+    
+    def _schedule_flush(self):
+        self._timer = None
+        self._flush_task = asyncio.ensure_future(self._background_flush())
+    
+    async def _background_flush(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            # The batch is queued again; the next flush retries it
+            print(f"[Writes] Background flush failed, will retry: {e}")
+            if self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(max(self.window, 1.0), self._schedule_flush)
+    
+    async def flush(self):
+        """Write everything buffered so far."""
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            
+            pending, self._pending = self._pending, {}
+            collections = list(pending.items())
+            for index, (collection, documents) in enumerate(collections):
+                batch = [(doc_id, ops) for doc_id, ops in documents.items() if ops]
+                if not batch:
+                    continue
+                try:
+                    with get_metrics().span("mongo_write", collection=collection, op="bulk_write") as span:
+                        span.bytes_written = sum(len(encode(ops)) for _, ops in batch)
+                        await self.db[collection].bulk_write(
+                            [UpdateOne({"id": doc_id}, ops) for doc_id, ops in batch], ordered=False
+                        )
+                except BulkWriteError as e:
+                    # Unordered: everything but the reported operations was applied
+                    retry = []
+                    for error in sorted(e.details.get("writeErrors", []), key=lambda error: error["index"]):
+                        doc_id, ops = batch[error["index"]]
+                        if error.get("code") in TRANSIENT_WRITE_ERRORS:
+                            retry.append((doc_id, ops))
+                        else:
+                            # Retrying can't fix it, and would hold its batch back every flush
+                            print(f"[Writes] Dropping update of {collection} {doc_id} ({error.get('code')}): {error.get('errmsg')}")
+                            self.dropped += 1
+                    if retry:
+                        self._requeue(collection, retry)
+                        self._requeue_all(collections[index + 1:])
+                        raise
+                except Exception:
+                    self._requeue(collection, batch)
+                    self._requeue_all(collections[index + 1:])
+                    raise
+                self.round_trips += 1
+    
+    def _requeue(self, collection: str, batch: List):
+        """Put unwritten updates back underneath anything queued since the flush began."""
+        documents = self._pending.setdefault(collection, {})
+        for doc_id, ops in batch:
+            newer = documents.get(doc_id, {})
+            merged = {key: dict(value) for key, value in ops.items()}
+            merge_ops(merged, newer.get("$set"), newer.get("$inc"))
+            documents[doc_id] = merged
+    
+    def _requeue_all(self, collections: List):
+        for collection, documents in collections:
+            self._requeue(collection, [(doc_id, ops) for doc_id, ops in documents.items() if ops])
+    
+    async def insert_many(self, collection: str, documents: List[Dict]):
+        """Insert documents in a single round trip."""
+        if not documents:
+            return
+        with get_metrics().span("mongo_write", collection=collection, op="insert_many") as span:
+            span.bytes_written = sum(len(encode(document)) for document in documents)
+            await self.db[collection].insert_many(documents, ordered=True)
+        self.writes_requested += len(documents)
+        self.round_trips += 1
+    
+    def stats(self) -> Dict:
+        return {
+            "writes_requested": self.writes_requested,
+            "round_trips": self.round_trips,
+            "round_trips_saved": self.writes_requested - self.round_trips,
+            "dropped_updates": self.dropped,
+            "pending_documents": sum(len(documents) for documents in self._pending.values())
+        }
+
+
+def merge_ops(ops: Dict, set: Optional[Dict] = None, inc: Optional[Dict] = None):
+    """Fold a newer update into queued update operators, in place."""
+    for field, value in (set or {}).items():
+        ops.setdefault("$set", {})[field] = value
+        # A later $set overrides any increment queued before it
+        ops.get("$inc", {}).pop(field, None)
+    for field, amount in (inc or {}).items():
+        if field in ops.get("$set", {}):
+            ops["$set"][field] += amount
+        else:
+            increments = ops.setdefault("$inc", {})
+            increments[field] = increments.get(field, 0) + amount
+    if "$inc" in ops and not ops["$inc"]:
+        del ops["$inc"]  # MongoDB rejects an empty operator
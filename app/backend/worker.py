@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Render worker - claims project jobs from the queue and runs the pipeline.
+
+Run one or more of these next to the API (JOB_EXECUTION_MODE=queue) to scale
+rendering independently of API replicas:
+    
+    python worker.py
+"""
+
+import asyncio
+import os
+import signal
+import socket
+from pathlib import Path
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from agents.workflow_agent import WorkflowAgent
+from services.job_queue import JobQueue
+from services.render_pool import get_render_pool
+from models import ProjectStatus
+
+# Load environment
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+
+class Worker:
+    """Polls the job queue and runs claimed projects with heartbeats."""
+    
+    def __init__(self, db, queue: JobQueue, workflow_agent: WorkflowAgent):
+        self.db = db
+        self.queue = queue
+        self.workflow_agent = workflow_agent
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency = int(os.environ.get('WORKER_CONCURRENCY', '2'))
+        self.poll_interval = float(os.environ.get('WORKER_POLL_INTERVAL', '2'))
+        self.running = {}  # job id -> task
+        self.stopping = asyncio.Event()
+    
+    async def run(self):
+        print(f"[Worker] {self.worker_id} started (concurrency {self.concurrency})")
+        
+        while not self.stopping.is_set():
+            job = None
+            if len(self.running) < self.concurrency:
+                job = await self.queue.claim(self.worker_id, job_types=["project"])
+            
+            if job is None:
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            task = asyncio.create_task(self.run_job(job))
+            self.running[job["id"]] = task
+            task.add_done_callback(lambda _, job_id=job["id"]: self.running.pop(job_id, None))
+        
+        await self.shutdown()
+    
+    async def run_job(self, job: dict):
+        project_id = job["project_id"]
+        print(f"[Worker] Claimed job {job['id']} for project {project_id} (attempt {job['attempts']})")
+        
+        # Retries and jobs recovered from a dead worker pick up from the checkpoint
+        pipeline = asyncio.create_task(self.workflow_agent.resume_project(project_id))
+        heartbeat = asyncio.create_task(self.keep_lease(job["id"], pipeline))
+        
+        try:
+            await pipeline
+        except asyncio.CancelledError:
+            return
+        finally:
+            heartbeat.cancel()
+        
+        project = await self.db.projects.find_one({"id": project_id}, {"_id": 0, "status": 1, "error_message": 1})
+        if project and project.get("status") in (ProjectStatus.COMPLETED.value, ProjectStatus.PREVIEW_READY.value):
+            await self.queue.complete(job["id"], self.worker_id)
+        else:
+            error = (project or {}).get("error_message") or "Project did not complete"
+            await self.queue.fail(job["id"], self.worker_id, error)
+    
+    async def keep_lease(self, job_id: str, pipeline: asyncio.Task):
+        """Heartbeat while the pipeline runs; stop it if another worker took the job."""
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            if not await self.queue.heartbeat(job_id, self.worker_id):
+                print(f"[Worker] Lost lease on job {job_id}, abandoning it")
+                pipeline.cancel()
+                return
+    
+    async def shutdown(self):
+        """Stop running jobs and hand them back to the queue."""
+        for job_id, task in list(self.running.items()):
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await self.queue.release(job_id, self.worker_id)
+        print(f"[Worker] {self.worker_id} stopped")
+
+
+async def main():
+    # Connect to MongoDB
+    mongo_url = os.environ['MONGO_URL']
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ['DB_NAME']]
+    
+    queue = JobQueue(db)
+    await queue.ensure_indexes()
+    worker = Worker(db, queue, WorkflowAgent(db))
+    
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stopping.set)
+    
+    try:
+        await worker.run()
+    finally:
+        get_render_pool().shutdown()
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
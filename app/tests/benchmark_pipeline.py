@@ -0,0 +1,251 @@
+"""Offline end-to-end pipeline benchmark.
+
+Runs WorkflowAgent.start_project against an in-memory MongoDB, a canned LLM
+and the stub TTS backend, so it needs no network, database or API key. Every
+combination of the parameter lists is run in its own process, so peak memory,
+gauges and render pool counters belong to that case alone, and the results are
+written to tests/benchmark_results/ as JSON, tagged with the current commit.
+
+    cd app && python -m tests.benchmark_pipeline --scenes 3 8 --concurrency 1 4
+    cd app && python -m tests.benchmark_pipeline --compare tests/benchmark_results/<earlier>.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import itertools
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+TESTS_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = TESTS_DIR.parent / "backend"
+RESULTS_DIR = TESTS_DIR / "benchmark_results"
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenes", type=int, nargs="+", default=[5], help="Scenes per project")
+    parser.add_argument("--story-words", type=int, nargs="+", default=[200], help="Story length in words")
+    parser.add_argument("--profile", nargs="+", default=["standard"], help="Render profiles")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4], help="SCENE_CONCURRENCY values")
+    parser.add_argument("--projects", type=int, default=2, help="Projects started together per run")
+    parser.add_argument("--renderer", default="numpy", help="ANIMATOR_RENDERER")
+    parser.add_argument("--render-workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--scene-duration", type=float, default=4.0)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds added to every LLM call")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Seconds added to every database round trip")
+    parser.add_argument("--cache", action="store_true", help="Keep the render/TTS caches on (off by default)")
+    parser.add_argument("--output", type=Path, help="Result file (default: benchmark_results/<time>_<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="Earlier result file to compare against")
+    # Set by main() when it runs a single case in a child process
+    parser.add_argument("--case", type=json.loads, help=argparse.SUPPRESS)
+    parser.add_argument("--case-output", type=Path, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, work_dir: str):
+    """Settings read at import time, so this runs before the backend is imported."""
+    os.environ.update({
+        "OUTPUT_DIR": work_dir,
+        "TTS_BACKEND": "stub",
+        "ANIMATOR_RENDERER": args.renderer,
+        "RENDER_WORKERS": str(args.render_workers),
+        "RENDER_CACHE_ENABLED": "1" if args.cache else "0",
+        "TTS_CACHE_ENABLED": "1" if args.cache else "0",
+        "METRICS_RECENT_SPANS": "1000000",
+        "EMERGENT_LLM_KEY": "offline"
+    })
+    sys.path.insert(0, str(BACKEND_DIR))
+    sys.path.insert(0, str(TESTS_DIR.parent))
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=TESTS_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def make_story(words: int, seed: int) -> str:
+    vocabulary = ["a", "fox", "found", "the", "river", "and", "sang", "under", "bright", "stars", "while", "wind"]
+    return " ".join(vocabulary[(seed + index * 7) % len(vocabulary)] for index in range(words))
+
+
+async def run_case(case: Dict, args) -> Dict:
+    from tests.fakes import FakeDatabase, FakeLlmChat
+    import agents.director_agent as director_agent
+    from agents.workflow_agent import WorkflowAgent
+    from models import Project
+    from services.metrics import get_metrics, peak_rss_bytes
+    from services.render_pool import get_render_pool
+    
+    FakeLlmChat.scene_count = case["scenes"]
+    FakeLlmChat.scene_duration = args.scene_duration
+    FakeLlmChat.latency = args.llm_latency
+    director_agent.LlmChat = FakeLlmChat
+    
+    db = FakeDatabase(latency=args.db_latency)
+    workflow = WorkflowAgent(db)
+    workflow.scene_concurrency = case["concurrency"]
+    metrics = get_metrics()
+    
+    project_ids = []
+    for index in range(args.projects):
+        project = Project(
+            title=f"Benchmark {index}",
+            story_input=make_story(case["story_words"], index),
+            render_profile=case["profile"]
+        )
+        document = project.model_dump()
+        document["created_at"] = document["created_at"].isoformat()
+        document["updated_at"] = document["updated_at"].isoformat()
+        await db.projects.insert_one(document)
+        project_ids.append(project.id)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(workflow.start_project(project_id) for project_id in project_ids))
+    elapsed = time.perf_counter() - started
+    
+    projects = [await db.projects.find_one({"id": project_id}, {"_id": 0}) for project_id in project_ids]
+    failures = [project.get("error_message") for project in projects if project["status"] != "completed"]
+    output_bytes = sum(
+        os.path.getsize(project["video_url"]) for project in projects
+        if project.get("video_url") and os.path.exists(project["video_url"])
+    )
+    
+    stages = {}
+    for span in metrics.recent:
+        stages.setdefault(span["stage"], []).append(span["duration"])
+    worker_rss = [value for (name, _), value in metrics.gauges.items() if name == "render_worker_peak_rss_bytes"]
+    
+    return {
+        **case,
+        "projects": args.projects,
+        "completed": args.projects - len(failures),
+        "failures": failures,
+        "elapsed_seconds": round(elapsed, 3),
+        "projects_per_hour": round(args.projects / elapsed * 3600, 1) if elapsed else None,
+        "stages": {
+            stage: {
+                "count": len(durations),
+                "p50": round(percentile(durations, 0.50), 4),
+                "p95": round(percentile(durations, 0.95), 4),
+                "total": round(sum(durations), 3)
+            }
+            for stage, durations in sorted(stages.items())
+        },
+        # The process only ran this case, so its high-water mark is the case's
+        "peak_rss_bytes": peak_rss_bytes(),
+        "peak_worker_rss_bytes": max(worker_rss, default=None),
+        "output_bytes": output_bytes,
+        "db_round_trips": db.round_trips(),
+        "render_pool": get_render_pool().stats()
+    }
+
+
+def compare(current: Dict, baseline: Dict):
+    """Print throughput and stage p95 changes for cases present in both runs."""
+    def key(result):
+        return (result["scenes"], result["story_words"], result["profile"], result["concurrency"])
+    
+    earlier = {key(result): result for result in baseline["results"]}
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('created_at')}):")
+    for result in current["results"]:
+        before = earlier.get(key(result))
+        if before is None:
+            continue
+        print(f"  scenes={result['scenes']} words={result['story_words']} profile={result['profile']} concurrency={result['concurrency']}")
+        print(f"    projects/hour {before['projects_per_hour']} -> {result['projects_per_hour']}")
+        for stage, summary in result["stages"].items():
+            if stage in before["stages"]:
+                print(f"    {stage} p95 {before['stages'][stage]['p95']}s -> {summary['p95']}s")
+
+
+def run_single_case(args):
+    """Child process: run one case and write its result where the parent reads it."""
+    work_dir = tempfile.mkdtemp(prefix="swami-bench-")
+    configure_environment(args, work_dir)
+    
+    from tests.fakes import install_llm_stub
+    install_llm_stub()
+    from services.render_pool import get_render_pool
+    
+    try:
+        result = asyncio.run(run_case(args.case, args))
+    finally:
+        get_render_pool().shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    args.case_output.write_text(json.dumps(result, default=str))
+
+
+def run_case_process(case: Dict, argv: List[str]) -> Dict:
+    """Run a case in a fresh interpreter, with its own render pool, metrics and RSS high-water mark."""
+    with tempfile.TemporaryDirectory(prefix="swami-bench-case-") as case_dir:
+        case_output = Path(case_dir) / "result.json"
+        subprocess.run(
+            [
+                sys.executable, "-m", "tests.benchmark_pipeline", *argv,
+                "--case", json.dumps(case), "--case-output", str(case_output)
+            ],
+            cwd=TESTS_DIR.parent,
+            check=True
+        )
+        return json.loads(case_output.read_text())
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+    if args.case is not None:
+        run_single_case(args)
+        return
+    
+    cases = [
+        {"scenes": scenes, "story_words": words, "profile": profile, "concurrency": concurrency}
+        for scenes, words, profile, concurrency in itertools.product(
+            args.scenes, args.story_words, args.profile, args.concurrency
+        )
+    ]
+    
+    results = []
+    for case in cases:
+        print(f"[Benchmark] {case}")
+        result = run_case_process(case, argv)
+        print(f"[Benchmark] {result['projects_per_hour']} projects/hour, {result['completed']}/{result['projects']} completed")
+        results.append(result)
+    
+    report = {
+        "commit": current_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "settings": {
+            key: value for key, value in vars(args).items() if key not in ("output", "compare", "case", "case_output")
+        },
+        "results": results
+    }
+    
+    output = args.output or RESULTS_DIR / f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}_{report['commit'] or 'nocommit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, default=str))
+    print(f"[Benchmark] Results written to {output}")
+    
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
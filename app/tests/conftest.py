@@ -0,0 +1,67 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Tests import the backend the way the server does: `from services.x import ...`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture
+def make_workflow(tmp_path, monkeypatch):
+    """Build WorkflowAgents on an in-memory database, the canned LLM and the stub TTS.
+    
+    Keyword arguments are set as environment variables first, since the agents
+    read their settings when they are created. Outputs go under tmp_path.
+    """
+    from tests.fakes import FakeDatabase, FakeLlmChat, install_llm_stub
+    install_llm_stub()
+    
+    for name, value in {
+        "OUTPUT_DIR": str(tmp_path / "output"),
+        "TTS_BACKEND": "stub",
+        "RENDER_WORKERS": "2",
+        "RENDER_JOB_TIMEOUT": "120",
+        "RENDER_CACHE_ENABLED": "0",
+        "TTS_CACHE_ENABLED": "0",
+        "EMERGENT_LLM_KEY": "offline"
+    }.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv("ARTIFACT_STORE", raising=False)
+    monkeypatch.setattr(FakeLlmChat, "scene_count", 2)
+    monkeypatch.setattr(FakeLlmChat, "scene_duration", 2.0)
+    monkeypatch.setattr(FakeLlmChat, "dialogue_words", 4)
+    
+    import agents.director_agent as director_agent
+    from agents.workflow_agent import WorkflowAgent
+    from services import render_pool
+    monkeypatch.setattr(director_agent, "LlmChat", FakeLlmChat)
+    # Each test gets its own pool, bound to its own event loop
+    monkeypatch.setattr(render_pool, "_render_pool", None)
+    
+    def make(db=None, **env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return WorkflowAgent(db or FakeDatabase())
+    
+    yield make
+    if render_pool._render_pool is not None:
+        render_pool._render_pool.shutdown()
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """The API module on an in-memory database. The pipeline itself is not run."""
+    from tests.fakes import FakeDatabase, install_llm_stub
+    install_llm_stub()
+    # Only read the first time server is imported; the client never connects
+    monkeypatch.setenv("MONGO_URL", "mongodb://localhost:1")
+    monkeypatch.setenv("DB_NAME", "test")
+    monkeypatch.setenv("OUTPUT_DIR", str(tmp_path / "output"))
+    
+    import server
+    db = FakeDatabase()
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server.job_queue, "jobs", db.jobs)
+    monkeypatch.setattr(server, "job_execution_mode", "inline")
+    return server
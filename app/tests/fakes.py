@@ -0,0 +1,303 @@
+"""Deterministic local stand-ins for MongoDB and the LLM, used by the benchmarks."""
+import sys
+import copy
+import json
+import types
+import asyncio
+import hashlib
+from typing import Any, Dict, List, Optional
+
+
+def _matches(document: Dict, query: Dict) -> bool:
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(document, clause) for clause in condition):
+                return False
+            continue
+        value = document.get(field)
+        if isinstance(condition, dict) and any(key.startswith("$") for key in condition):
+            for op, operand in condition.items():
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$lt" and not (value is not None and value < operand):
+                    return False
+                if op == "$lte" and not (value is not None and value <= operand):
+                    return False
+                if op == "$gt" and not (value is not None and value > operand):
+                    return False
+                if op == "$gte" and not (value is not None and value >= operand):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _project(document: Dict, projection: Optional[Dict]) -> Dict:
+    document = copy.deepcopy(document)
+    if not projection:
+        return document
+    included = [field for field, flag in projection.items() if flag and field != "_id"]
+    excluded = [field for field, flag in projection.items() if not flag]
+    if included:
+        document = {field: document[field] for field in included if field in document}
+    for field in excluded:
+        document.pop(field, None)
+    return document
+
+
+def _apply(document: Dict, update: Dict, inserting: bool = False):
+    if inserting:
+        for field, value in update.get("$setOnInsert", {}).items():
+            document[field] = copy.deepcopy(value)
+    for field, value in update.get("$set", {}).items():
+        document[field] = copy.deepcopy(value)
+    for field, amount in update.get("$inc", {}).items():
+        document[field] = document.get(field, 0) + amount
+
+
+def _sorted(documents: List[Dict], sort) -> List[Dict]:
+    ordered = list(documents)
+    for field, direction in reversed(sort or []):
+        ordered.sort(key=lambda document: document.get(field) or 0, reverse=direction < 0)
+    return ordered
+
+
+class UpdateResult:
+    def __init__(self, matched: int, upserted_id: Optional[Any] = None):
+        self.matched_count = matched
+        self.modified_count = matched
+        self.upserted_id = upserted_id
+
+
+class DeleteResult:
+    def __init__(self, deleted: int):
+        self.deleted_count = deleted
+
+
+class FakeCursor:
+    def __init__(self, documents: List[Dict]):
+        self.documents = documents
+    
+    def sort(self, key, direction: int = 1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            self.documents.sort(key=lambda document: document.get(field) or 0, reverse=order < 0)
+        return self
+    
+    def limit(self, count: int):
+        if count:
+            self.documents = self.documents[:count]
+        return self
+    
+    async def to_list(self, length: Optional[int]):
+        return self.documents if length is None else self.documents[:length]
+    
+    def __aiter__(self):
+        self._iterator = iter(self.documents)
+        return self
+    
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    """The subset of motor's collection API the pipeline uses, kept in memory."""
+    
+    def __init__(self, latency: float = 0.0):
+        self.documents: List[Dict] = []
+        self.latency = latency
+        self.round_trips = 0
+    
+    async def _round_trip(self):
+        self.round_trips += 1
+        await asyncio.sleep(self.latency)
+    
+    async def find_one(self, query: Dict, projection: Optional[Dict] = None):
+        await self._round_trip()
+        for document in self.documents:
+            if _matches(document, query):
+                return _project(document, projection)
+        return None
+    
+    def find(self, query: Optional[Dict] = None, projection: Optional[Dict] = None) -> FakeCursor:
+        self.round_trips += 1
+        return FakeCursor([_project(d, projection) for d in self.documents if _matches(d, query or {})])
+    
+    async def insert_one(self, document: Dict):
+        await self._round_trip()
+        self.documents.append(copy.deepcopy(document))
+    
+    async def insert_many(self, documents: List[Dict], ordered: bool = True):
+        await self._round_trip()
+        self.documents.extend(copy.deepcopy(documents))
+    
+    async def update_one(self, query: Dict, update: Dict, upsert: bool = False):
+        await self._round_trip()
+        for document in self.documents:
+            if _matches(document, query):
+                _apply(document, update)
+                return UpdateResult(1)
+        if not upsert:
+            return UpdateResult(0)
+        # Like MongoDB, an upsert starts from the equality fields of the filter
+        document = {field: value for field, value in query.items() if not field.startswith("$") and not isinstance(value, dict)}
+        _apply(document, update, inserting=True)
+        document.setdefault("_id", len(self.documents) + 1)
+        self.documents.append(document)
+        return UpdateResult(0, upserted_id=document["_id"])
+    
+    async def update_many(self, query: Dict, update: Dict):
+        await self._round_trip()
+        matched = [document for document in self.documents if _matches(document, query)]
+        for document in matched:
+            _apply(document, update)
+        return UpdateResult(len(matched))
+    
+    async def find_one_and_update(self, query: Dict, update: Dict, projection: Optional[Dict] = None,
+                                  sort: Optional[List] = None, return_document: bool = False, **kwargs):
+        await self._round_trip()
+        for document in _sorted(self.documents, sort):
+            if _matches(document, query):
+                before = _project(document, projection)
+                _apply(document, update)
+                # pymongo's ReturnDocument.AFTER is True
+                return _project(document, projection) if return_document else before
+        return None
+    
+    async def bulk_write(self, requests: List[Any], ordered: bool = True):
+        await self._round_trip()
+        for request in requests:
+            # pymongo.UpdateOne keeps its filter and update in private attributes
+            for document in self.documents:
+                if _matches(document, request._filter):
+                    _apply(document, request._doc)
+                    break
+    
+    async def delete_many(self, query: Dict):
+        await self._round_trip()
+        kept = [document for document in self.documents if not _matches(document, query)]
+        deleted = len(self.documents) - len(kept)
+        self.documents = kept
+        return DeleteResult(deleted)
+    
+    async def delete_one(self, query: Dict):
+        await self._round_trip()
+        for index, document in enumerate(self.documents):
+            if _matches(document, query):
+                del self.documents[index]
+                return DeleteResult(1)
+        return DeleteResult(0)
+    
+    async def count_documents(self, query: Dict):
+        await self._round_trip()
+        return sum(1 for document in self.documents if _matches(document, query))
+    
+    async def estimated_document_count(self):
+        await self._round_trip()
+        return len(self.documents)
+    
+    def aggregate(self, pipeline: List[Dict]) -> FakeCursor:
+        """Supports the single `$group` count the services use."""
+        self.round_trips += 1
+        group = pipeline[0]["$group"]
+        field = group["_id"].lstrip("$")
+        counts: Dict[Any, int] = {}
+        for document in self.documents:
+            counts[document.get(field)] = counts.get(document.get(field), 0) + 1
+        return FakeCursor([{"_id": key, "count": count} for key, count in counts.items()])
+    
+    async def create_index(self, *args, **kwargs):
+        return "fake_index"
+
+
+class FakeDatabase:
+    """In-memory database; collections are created on first use like MongoDB's."""
+    
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.collections: Dict[str, FakeCollection] = {}
+    
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(self.latency)
+        return self.collections[name]
+    
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+    
+    def round_trips(self) -> int:
+        return sum(collection.round_trips for collection in self.collections.values())
+
+
+class FakeUserMessage:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeLlmChat:
+    """Answers director prompts with a fixed-size breakdown derived from the prompt.
+    
+    The same prompt always yields the same scenes, so runs are comparable.
+    Configure through the class attributes before starting the pipeline.
+    """
+    
+    scene_count = 5
+    dialogue_words = 12
+    scene_duration = 4.0
+    latency = 0.0
+    
+    def __init__(self, api_key=None, session_id=None, system_message=None):
+        self.system_message = system_message
+        self.messages = []
+    
+    def with_model(self, provider: str, model: str):
+        return self
+    
+    async def send_message(self, message) -> str:
+        await asyncio.sleep(self.latency)
+        self.messages.append(message.text)
+        if "break it down" not in message.text:
+            return message.text.strip().splitlines()[-1]
+        
+        seed = hashlib.sha256(message.text.encode("utf-8")).hexdigest()
+        scenes = [
+            {
+                "scene_number": number,
+                "description": f"Scene {number} of story {seed[:8]}: a character crosses a bright meadow toward the hills",
+                "dialogue": " ".join(f"word{(number + index) % 50}" for index in range(self.dialogue_words)),
+                "camera_direction": "Wide shot, slow pan",
+                "duration": self.scene_duration
+            }
+            for number in range(1, self.scene_count + 1)
+        ]
+        return "```json\n" + json.dumps({"title": "Benchmark", "genre": "general", "scenes": scenes}) + "\n```"
+
+
+def install_llm_stub():
+    """Make `emergentintegrations.llm.chat` importable where the real package isn't installed."""
+    try:
+        import emergentintegrations.llm.chat  # noqa: F401
+        return
+    except ImportError:
+        pass
+    package = types.ModuleType("emergentintegrations")
+    llm = types.ModuleType("emergentintegrations.llm")
+    chat = types.ModuleType("emergentintegrations.llm.chat")
+    chat.LlmChat = FakeLlmChat
+    chat.UserMessage = FakeUserMessage
+    package.llm = llm
+    llm.chat = chat
+    sys.modules.update({
+        "emergentintegrations": package,
+        "emergentintegrations.llm": llm,
+        "emergentintegrations.llm.chat": chat
+    })
@@ -0,0 +1,50 @@
+"""Small synthetic clips and voiceovers for tests that run the real ffmpeg."""
+import os
+import shutil
+import threading
+
+import pytest
+
+from services.ffmpeg_tools import ffmpeg_exe, run_ffmpeg
+
+requires_ffmpeg = pytest.mark.skipif(
+    not (os.path.isfile(ffmpeg_exe()) or shutil.which(ffmpeg_exe())),
+    reason="ffmpeg is not available"
+)
+
+
+def make_clip(path: str, seconds: float, settings: dict) -> str:
+    """Encode a test pattern the way the animator encodes scenes."""
+    run_ffmpeg([
+        "-f", "lavfi", "-i", f"testsrc=size={settings['width']}x{settings['height']}:rate={settings['fps']}",
+        "-t", str(seconds),
+        "-c:v", settings["codec"], "-preset", settings["preset"], "-threads", str(settings["threads"]),
+        "-pix_fmt", "yuv420p",
+        path
+    ])
+    return path
+
+
+def make_voice(path: str, seconds: float) -> str:
+    run_ffmpeg(["-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}", path])
+    return path
+
+
+def call_with_timeout(fn, *args, timeout: float = 60):
+    """Run a blocking call on a daemon thread, so a hung ffmpeg fails the test instead of the run."""
+    outcome = {}
+    
+    def target():
+        try:
+            outcome["result"] = fn(*args)
+        except Exception as e:
+            outcome["error"] = e
+    
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        pytest.fail(f"{fn.__name__} did not finish within {timeout}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
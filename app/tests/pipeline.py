@@ -0,0 +1,23 @@
+"""Helpers for tests that run projects through the WorkflowAgent."""
+from models import Project
+
+
+async def insert_project(db, **fields) -> str:
+    """Store a project the way POST /api/projects does and return its id."""
+    project = Project(
+        title=fields.pop("title", "Test"),
+        story_input=fields.pop("story_input", "A fox found the river and sang under bright stars."),
+        **fields
+    )
+    document = project.model_dump()
+    document["created_at"] = document["created_at"].isoformat()
+    document["updated_at"] = document["updated_at"].isoformat()
+    await db.projects.insert_one(document)
+    return project.id
+
+
+async def scenes_of(db, project_id: str):
+    return sorted(
+        [scene async for scene in db.scenes.find({"project_id": project_id}, {"_id": 0})],
+        key=lambda scene: scene["scene_number"]
+    )
@@ -0,0 +1,22 @@
+import asyncio
+
+from tests.media import requires_ffmpeg
+
+SCENE = {"description": "A fox crosses a meadow", "scene_number": 1, "duration": 1.0}
+
+
+@requires_ffmpeg
+def test_fallback_render_does_not_rewrite_the_cached_clip(make_workflow):
+    animator = make_workflow(RENDER_CACHE_ENABLED="1").animator
+    
+    async def run():
+        path = await animator.create_scene_animation("scene-1", SCENE)
+        entry = animator.cache.path_for(animator.cache_key(SCENE))
+        cached = entry.read_bytes()
+        # A later render of the same scene that fails falls back to a plain clip
+        await animator._create_fallback_animation("scene-1", SCENE)
+        return path, entry, cached
+    
+    path, entry, cached = asyncio.run(run())
+    assert entry.read_bytes() == cached
+    assert open(path, "rb").read() != cached
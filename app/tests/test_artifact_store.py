@@ -0,0 +1,144 @@
+import asyncio
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services import artifact_store
+from services.artifact_store import ArtifactStore, LocalArtifactStore, content_key
+from tests.media import requires_ffmpeg
+from tests.pipeline import insert_project, scenes_of
+
+
+def test_base_store_is_abstract():
+    with pytest.raises(TypeError):
+        ArtifactStore()
+    
+    class Incomplete(ArtifactStore):
+        backend = "incomplete"
+        
+        def exists(self, key: str) -> bool:
+            return False
+    
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_backends_name_themselves_in_stats(tmp_path):
+    assert LocalArtifactStore(str(tmp_path)).stats()["backend"] == "local"
+
+
+def test_identical_files_are_stored_once(tmp_path):
+    store = LocalArtifactStore(str(tmp_path / "store"))
+    first, second = tmp_path / "a.mp4", tmp_path / "b.MP4"
+    first.write_bytes(b"frames" * 1000)
+    second.write_bytes(b"frames" * 1000)
+    
+    key = asyncio.run(store.put_file(str(first)))
+    assert key == content_key(str(first))
+    assert asyncio.run(store.put_file(str(second))) == key
+    
+    stats = store.stats()
+    assert (stats["uploads"], stats["dedup_hits"]) == (1, 1)
+    assert (stats["bytes_uploaded"], stats["bytes_deduplicated"]) == (6000, 6000)
+    # The stored blob is a copy; rewriting the working file leaves it alone
+    first.write_bytes(b"rewritten")
+    assert b"".join(store.read_range(key)) == b"frames" * 1000
+
+
+def test_fetch_downloads_once(tmp_path):
+    store = LocalArtifactStore(str(tmp_path / "store"))
+    source = tmp_path / "voice.mp3"
+    source.write_bytes(b"audio" * 100)
+    key = asyncio.run(store.put_file(str(source)))
+    
+    target = tmp_path / "elsewhere" / "voice.mp3"
+    assert asyncio.run(store.fetch(key, str(target))) == str(target)
+    assert target.read_bytes() == source.read_bytes()
+    asyncio.run(store.fetch(key, str(target)))
+    
+    assert store.stats()["fetches"] == 1
+    assert os.listdir(target.parent) == ["voice.mp3"]
+
+
+def test_read_range_is_inclusive_and_chunked(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifact_store, "CHUNK_SIZE", 4)
+    store = LocalArtifactStore(str(tmp_path / "store"))
+    source = tmp_path / "clip.mp4"
+    source.write_bytes(bytes(range(20)))
+    key = asyncio.run(store.put_file(str(source)))
+    
+    assert b"".join(store.read_range(key)) == bytes(range(20))
+    assert b"".join(store.read_range(key, 3, 12)) == bytes(range(3, 13))
+    assert b"".join(store.read_range(key, 15)) == bytes(range(15, 20))
+    assert [len(chunk) for chunk in store.read_range(key, 1, 10)] == [4, 4, 2]
+
+
+def test_keys_outside_the_store_are_rejected(tmp_path):
+    store = LocalArtifactStore(str(tmp_path / "store"))
+    with pytest.raises(Exception, match="Invalid artifact key"):
+        store.exists("../../etc/passwd")
+
+
+def test_artifact_endpoint_serves_byte_ranges(api, tmp_path, monkeypatch):
+    store = LocalArtifactStore(str(tmp_path / "store"))
+    monkeypatch.setattr(api.workflow_agent, "store", store)
+    source = tmp_path / "movie.mp4"
+    source.write_bytes(bytes(range(100)))
+    key = asyncio.run(store.put_file(str(source)))
+    client = TestClient(api.app)
+    
+    response = client.get(f"/api/artifacts/{key}")
+    assert response.status_code == 200
+    assert response.content == bytes(range(100))
+    assert response.headers["content-type"] == "video/mp4"
+    assert response.headers["accept-ranges"] == "bytes"
+    
+    response = client.get(f"/api/artifacts/{key}", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == bytes(range(10, 20))
+    assert response.headers["content-range"] == "bytes 10-19/100"
+    
+    # Suffix and open-ended ranges
+    assert client.get(f"/api/artifacts/{key}", headers={"Range": "bytes=-5"}).content == bytes(range(95, 100))
+    assert client.get(f"/api/artifacts/{key}", headers={"Range": "bytes=90-"}).content == bytes(range(90, 100))
+    
+    assert client.get(f"/api/artifacts/{key}", headers={"Range": "bytes=200-"}).status_code == 416
+    assert client.get(f"/api/artifacts/{key}", headers={"Range": "bytes=0-1,5-6"}).status_code == 416
+    assert client.get("/api/artifacts/not-a-key").status_code == 400
+    assert client.get(f"/api/artifacts/{'0' * 2}/{'0' * 64}.mp4").status_code == 404
+
+
+@requires_ffmpeg
+def test_another_host_finishes_a_project_from_the_store(make_workflow, tmp_path, monkeypatch):
+    monkeypatch.setattr(artifact_store, "_store", None)
+    first = make_workflow(ARTIFACT_STORE="local", ARTIFACT_STORE_DIR=str(tmp_path / "store"))
+    
+    async def run():
+        project_id = await insert_project(first.db)
+        await asyncio.wait_for(first.start_project(project_id), timeout=180)
+        scenes = await scenes_of(first.db, project_id)
+        
+        # The second host shares the database and the store, but none of the files
+        for scene in scenes:
+            for field in ("animation_path", "voice_path", "video_path"):
+                os.remove(scene[field])
+        second = make_workflow(first.db)
+        rendered = []
+        
+        async def render(*args, **kwargs):
+            rendered.append(args)
+        
+        second.animator.create_scene_animation = render
+        second.voice.generate_voiceover = render
+        await asyncio.wait_for(second.resume_project(project_id), timeout=180)
+        return await first.db.projects.find_one({"id": project_id}), scenes, rendered
+    
+    project, scenes, rendered = asyncio.run(run())
+    
+    assert project["status"] == "completed", project.get("error_message")
+    assert rendered == []
+    assert set(project["artifacts"]) == {"video"}
+    for scene in scenes:
+        assert set(scene["artifacts"]) == {"animation", "voice", "video"}
+        assert os.path.getsize(scene["video_path"]) > 0
@@ -0,0 +1,27 @@
+import asyncio
+import math
+
+from services.ffmpeg_tools import probe_media
+from tests.media import requires_ffmpeg
+from tests.pipeline import insert_project, scenes_of
+
+
+@requires_ffmpeg
+def test_audio_first_project_completes_with_scenes_fitted_to_their_voice(make_workflow):
+    workflow = make_workflow(SCENE_SCHEDULING="audio_first")
+    
+    async def run():
+        project_id = await insert_project(workflow.db)
+        await asyncio.wait_for(workflow.start_project(project_id), timeout=180)
+        return await workflow.db.projects.find_one({"id": project_id}), await scenes_of(workflow.db, project_id)
+    
+    project, scenes = asyncio.run(run())
+    
+    assert project["status"] == "completed", project.get("error_message")
+    assert probe_media(project["video_url"])["has_audio"]
+    for scene in scenes:
+        voice = probe_media(scene["voice_path"])["duration"]
+        # The scene is as long as its voiceover, rounded up to a whole frame at 15 fps
+        assert scene["duration"] == math.ceil(voice * 15) / 15
+        segment = probe_media(scene["video_path"])
+        assert abs(segment["duration"] - scene["duration"]) < 0.1
@@ -0,0 +1,103 @@
+import subprocess
+
+import numpy as np
+
+from agents.animator_agent import render_scene, render_scene_numpy
+from services.compositor import FrameCompositor, rasterize_caption
+from services.ffmpeg_tools import ffmpeg_exe, probe_media, video_signature
+from services.render_profiles import get_profile
+from tests.media import requires_ffmpeg
+
+DESCRIPTION = "A fox crosses a bright meadow toward the hills while the sun sets"
+
+
+def caption(text="Scene 1", size=24):
+    return rasterize_caption(text, size, (255, 255, 255), 300)
+
+
+def frame_at(path, seconds, settings):
+    raw = subprocess.run(
+        [
+            ffmpeg_exe(), "-hide_banner", "-loglevel", "error",
+            "-ss", str(seconds), "-i", path, "-frames:v", "1",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"
+        ],
+        capture_output=True, check=True
+    ).stdout
+    return np.frombuffer(raw, dtype=np.uint8).reshape(settings["height"], settings["width"], 3)
+
+
+def test_base_frame_matches_a_moviepy_composite():
+    from moviepy import ColorClip, CompositeVideoClip, ImageClip
+    
+    title, description = caption("Scene 3", 40), caption(DESCRIPTION)
+    compositor = FrameCompositor(426, 240, (50, 50, 100))
+    compositor.add_caption(title, y=20)
+    compositor.add_caption(description)
+    
+    clip = CompositeVideoClip([
+        ColorClip(size=(426, 240), color=(50, 50, 100), duration=1),
+        ImageClip(title, transparent=True).with_position(("center", 20)).with_duration(1),
+        ImageClip(description, transparent=True).with_position(("center", "center")).with_duration(1)
+    ])
+    expected = clip.get_frame(0).astype(np.int16)
+    clip.close()
+    actual = np.clip(compositor.base_frame() + 0.5, 0, 255).astype(np.int16)
+    
+    assert actual.shape == expected.shape
+    assert np.abs(actual - expected).max() <= 1
+
+
+def test_frames_fade_and_pan():
+    compositor = FrameCompositor(200, 100, (100, 100, 100))
+    compositor.add_caption(caption(), pan=True)
+    
+    frames = [np.frombuffer(frame, dtype=np.uint8).reshape(100, 200, 3) for frame in compositor.frames(2.0, 10, fade=0.5, pan=40)]
+    
+    assert len(frames) == 20
+    # Fades from and to black, through the full-brightness background
+    assert frames[0].max() < frames[10].max()
+    assert frames[-1].max() < frames[10].max()
+    assert frames[10][0, 0].tolist() == [100, 100, 100]
+    # The caption travels left to right
+    columns = [np.nonzero((frame > 150).any(axis=(0, 2)))[0] for frame in frames[5:15]]
+    assert columns[0].min() < columns[-1].min()
+
+
+def test_unchanged_frames_share_one_buffer():
+    compositor = FrameCompositor(64, 32, (0, 0, 0))
+    compositor.add_caption(caption())
+    
+    frames = list(compositor.frames(1.0, 12))
+    
+    assert len(frames) == 12
+    assert all(frame is frames[0] for frame in frames)
+    assert compositor.is_static(0, 40)
+
+
+def test_still_scenes_keep_their_panned_captions():
+    compositor = FrameCompositor(200, 100, (0, 0, 0))
+    compositor.add_caption(caption(), pan=True)
+    
+    assert compositor.is_static(0, 0)
+    still = np.clip(compositor.still_frame() + 0.5, 0, 255).astype(np.uint8)
+    assert still.max() > 150
+    assert still.tobytes() == next(compositor.frames(1.0, 10))
+
+
+@requires_ffmpeg
+def test_numpy_renderer_matches_the_moviepy_renderer(tmp_path):
+    settings = get_profile("preview")
+    moviepy_path = render_scene(str(tmp_path / "moviepy.mp4"), DESCRIPTION, 2, 2.0, settings)
+    numpy_path = render_scene_numpy(str(tmp_path / "numpy.mp4"), DESCRIPTION, 2, 2.0, settings)
+    
+    moviepy_media, numpy_media = probe_media(moviepy_path), probe_media(numpy_path)
+    # Same stream parameters, so the editor can join either kind of clip by stream copy
+    assert video_signature(numpy_media) == video_signature(moviepy_media)
+    assert abs(numpy_media["duration"] - moviepy_media["duration"]) < 1 / settings["fps"] + 0.01
+    
+    for seconds in (0.0, 1.0):
+        difference = np.abs(frame_at(numpy_path, seconds, settings).astype(np.int16) - frame_at(moviepy_path, seconds, settings))
+        # Only encoder noise between the two
+        assert difference.mean() < 1
+        assert np.percentile(difference, 99) <= 4
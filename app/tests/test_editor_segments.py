@@ -0,0 +1,128 @@
+import asyncio
+import os
+
+import pytest
+
+from agents.editor_agent import NonUniformScenes, build_scene_segment, concat_scenes, mux_scene_segment
+from models import Scene
+from services.ffmpeg_tools import probe_media, video_signature
+from services.render_profiles import get_profile
+from tests.media import call_with_timeout, make_clip, make_voice, requires_ffmpeg
+from tests.pipeline import insert_project, scenes_of
+
+SETTINGS = get_profile("standard")
+
+
+@requires_ffmpeg
+def test_voice_shorter_than_the_clip_is_padded_to_its_length(tmp_path):
+    clip = make_clip(str(tmp_path / "scene.mp4"), 3, SETTINGS)
+    voice = make_voice(str(tmp_path / "voice.wav"), 1)
+    
+    output = call_with_timeout(build_scene_segment, clip, voice, str(tmp_path / "segment.mp4"), SETTINGS)
+    
+    media = probe_media(output)
+    assert media["has_audio"] and media["has_video"]
+    assert abs(media["duration"] - 3) < 0.1
+
+
+@requires_ffmpeg
+def test_scene_without_voice_gets_a_silent_track(tmp_path):
+    clip = make_clip(str(tmp_path / "scene.mp4"), 2, SETTINGS)
+    
+    output = call_with_timeout(build_scene_segment, clip, None, str(tmp_path / "segment.mp4"), SETTINGS)
+    
+    media = probe_media(output)
+    assert media["has_audio"] and media["sample_rate"] == 44100
+    assert abs(media["duration"] - 2) < 0.1
+
+
+@requires_ffmpeg
+def test_voice_longer_than_the_clip_holds_the_last_frame(tmp_path):
+    clip = make_clip(str(tmp_path / "scene.mp4"), 2, SETTINGS)
+    voice = make_voice(str(tmp_path / "voice.wav"), 3)
+    
+    output = call_with_timeout(build_scene_segment, clip, voice, str(tmp_path / "segment.mp4"), SETTINGS)
+    
+    media = probe_media(output)
+    assert abs(media["duration"] - 3) < 0.15
+    # Re-encoded, but still joinable with the other clips by stream copy
+    assert video_signature(media) == video_signature(probe_media(clip))
+
+
+@requires_ffmpeg
+def test_mux_scene_segment_leaves_no_partial_file(tmp_path):
+    clip = make_clip(str(tmp_path / "scene.mp4"), 1, SETTINGS)
+    output = str(tmp_path / "segment.mp4")
+    
+    assert call_with_timeout(mux_scene_segment, clip, None, output, SETTINGS) == output
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["scene.mp4", "segment.mp4"]
+
+
+def scene(number: int, animation_path: str, **fields) -> dict:
+    return {"scene_number": number, "animation_path": animation_path, "render_profile": "standard", **fields}
+
+
+@requires_ffmpeg
+def test_concat_joins_muxed_and_unmuxed_scenes(tmp_path):
+    first = make_clip(str(tmp_path / "one.mp4"), 1, SETTINGS)
+    second = make_clip(str(tmp_path / "two.mp4"), 1, SETTINGS)
+    muxed = call_with_timeout(mux_scene_segment, first, None, str(tmp_path / "segment_one.mp4"), SETTINGS)
+    
+    output = call_with_timeout(
+        concat_scenes, str(tmp_path / "movie.mp4"),
+        [scene(2, second), scene(1, first, video_path=muxed)], SETTINGS
+    )
+    
+    assert abs(probe_media(output)["duration"] - 2) < 0.15
+
+
+@requires_ffmpeg
+def test_concat_checks_the_segments_it_joins_not_the_clips(tmp_path):
+    first = make_clip(str(tmp_path / "one.mp4"), 1, SETTINGS)
+    second = make_clip(str(tmp_path / "two.mp4"), 1, SETTINGS)
+    # Same clips, but one scene's muxed segment was made at another size
+    odd = make_clip(str(tmp_path / "odd.mp4"), 1, {**SETTINGS, "width": 320, "height": 240})
+    
+    with pytest.raises(NonUniformScenes):
+        call_with_timeout(
+            concat_scenes, str(tmp_path / "movie.mp4"),
+            [scene(1, first), scene(2, second, video_path=odd)], SETTINGS
+        )
+
+
+@requires_ffmpeg
+def test_scenes_are_muxed_in_the_scene_stage_and_reused_on_resume(make_workflow):
+    workflow = make_workflow()
+    built = []
+    build_segment = workflow.editor.build_segment
+    
+    async def counting_build_segment(scene, profile):
+        built.append(scene["scene_number"])
+        return await build_segment(scene, profile)
+    
+    workflow.editor.build_segment = counting_build_segment
+    
+    async def run():
+        project_id = await insert_project(workflow.db)
+        await asyncio.wait_for(workflow.start_project(project_id), timeout=180)
+        scenes = await scenes_of(workflow.db, project_id)
+        mtimes = [os.path.getmtime(scene["video_path"]) for scene in scenes]
+        
+        await asyncio.wait_for(workflow.resume_project(project_id), timeout=180)
+        return await workflow.db.projects.find_one({"id": project_id}), scenes, mtimes
+    
+    project, scenes, mtimes = asyncio.run(run())
+    
+    assert project["status"] == "completed", project.get("error_message")
+    # One segment per scene, built during the scene stage and kept by the resume
+    assert sorted(built) == [1, 2]
+    for scene, mtime in zip(scenes, mtimes):
+        segment = probe_media(scene["video_path"])
+        assert segment["has_audio"]
+        assert abs(segment["duration"] - scene["duration"]) < 0.1
+        assert scene["fingerprints"]["video"] == workflow.fingerprints(Scene(**scene), "standard")["video"]
+        assert os.path.getmtime(scene["video_path"]) == mtime
+    
+    movie = probe_media(project["video_url"])
+    assert movie["has_audio"]
+    assert abs(movie["duration"] - sum(scene["duration"] for scene in scenes)) < 0.2
@@ -0,0 +1,52 @@
+import json
+import asyncio
+
+import httpx
+
+from services.events import project_event
+from tests.pipeline import insert_project
+
+
+def sse_events(body: str):
+    """(event, data) for every message in an SSE body, skipping keepalives."""
+    messages = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if lines:
+            messages.append((lines["event"], json.loads(lines["data"])))
+    return messages
+
+
+async def stream(server, project_id: str, during=None) -> str:
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        request = asyncio.create_task(client.get(f"/api/projects/{project_id}/events"))
+        if during is not None:
+            await asyncio.sleep(0.1)
+            during()
+        response = await asyncio.wait_for(request, timeout=10)
+    assert response.status_code == 200
+    return response.text
+
+
+def test_stream_of_a_project_waiting_on_its_preview_ends_after_the_snapshot(api):
+    async def run():
+        project_id = await insert_project(api.db, status="preview_ready", preview_first=True)
+        return await stream(api, project_id)
+    
+    events = sse_events(asyncio.run(run()))
+    assert [event for event, _ in events] == ["snapshot"]
+
+
+def test_stream_ends_when_the_preview_becomes_ready(api):
+    async def run():
+        project_id = await insert_project(api.db, status="processing", preview_first=True)
+        
+        def preview_ready():
+            api.event_bus.publish(project_id, project_event(project_id, {"status": "preview_ready"}))
+        
+        return await stream(api, project_id, during=preview_ready)
+    
+    events = sse_events(asyncio.run(run()))
+    assert [event for event, _ in events] == ["snapshot", "project"]
+    assert events[-1][1]["status"] == "preview_ready"
@@ -0,0 +1,116 @@
+import asyncio
+
+from services.file_cache import FileCache, write_replacing
+
+
+def write(content: bytes):
+    async def produce(tmp_path: str):
+        await asyncio.sleep(0.01)
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+    return produce
+
+
+def test_concurrent_misses_produce_a_key_once(tmp_path):
+    cache = FileCache(str(tmp_path), max_bytes=1024)
+    calls = []
+    
+    async def produce(path: str):
+        calls.append(path)
+        await write(b"voice")(path)
+    
+    async def run():
+        return await asyncio.gather(*(cache.get_or_create("a" * 64, produce) for _ in range(3)))
+    
+    paths = asyncio.run(run())
+    assert len(calls) == 1
+    assert len(set(paths)) == 1 and paths[0].read_bytes() == b"voice"
+    assert cache.stats()["coalesced"] == 2
+
+
+def test_lock_files_are_per_key_and_removed(tmp_path):
+    cache = FileCache(str(tmp_path), max_bytes=1024)
+    # Same two-character prefix, which used to share one lock file
+    first, second = "ab" + "0" * 62, "ab" + "1" * 62
+    
+    async def run():
+        async with cache.lock(first):
+            # Would wait forever if the keys shared a lock
+            await asyncio.wait_for(cache.get_or_create(second, write(b"scene")), timeout=2)
+    
+    asyncio.run(run())
+    assert list((tmp_path / "locks").iterdir()) == []
+
+
+def test_processes_sharing_a_cache_take_turns_on_a_key(tmp_path):
+    # Two instances stand in for two processes: only the flock is shared
+    caches = [FileCache(str(tmp_path), max_bytes=1024) for _ in range(2)]
+    key = "c" * 64
+    order = []
+    
+    async def hold(cache: FileCache, name: str):
+        async with cache.lock(key):
+            order.append(f"{name} in")
+            await asyncio.sleep(0.05)
+            order.append(f"{name} out")
+    
+    async def run():
+        await asyncio.gather(hold(caches[0], "first"), hold(caches[1], "second"))
+    
+    asyncio.run(run())
+    # The second waited, and relocked after the first deleted the lock file
+    assert order == ["first in", "first out", "second in", "second out"]
+    assert list((tmp_path / "locks").iterdir()) == []
+
+
+def test_evicts_least_recently_used_once_over_budget(tmp_path):
+    cache = FileCache(str(tmp_path), max_bytes=10)
+    
+    async def run():
+        oldest = await cache.get_or_create("1" * 64, write(b"x" * 6))
+        newest = await cache.get_or_create("2" * 64, write(b"y" * 6))
+        return oldest, newest
+    
+    oldest, newest = asyncio.run(run())
+    assert not oldest.exists() and newest.exists()
+    assert cache.stats()["evictions"] == 1
+    assert cache._size == 6
+
+
+def test_write_replacing_leaves_a_linked_cache_entry_alone(tmp_path):
+    cache = FileCache(str(tmp_path / "cache"), max_bytes=1024)
+    working = str(tmp_path / "scene.mp4")
+    
+    async def run():
+        entry = await cache.get_or_create("d" * 64, write(b"cached"))
+        await cache.place("d" * 64, write(b"unused"), working)
+        await write_replacing(working, write(b"fallback"))
+        return entry
+    
+    entry = asyncio.run(run())
+    assert entry.read_bytes() == b"cached"
+    assert open(working, "rb").read() == b"fallback"
+
+
+def test_place_produces_an_entry_evicted_before_it_was_linked(tmp_path, monkeypatch):
+    cache = FileCache(str(tmp_path / "cache"), max_bytes=1024)
+    produced = []
+    
+    async def produce(tmp_path: str):
+        produced.append(tmp_path)
+        await write(b"voice")(tmp_path)
+    
+    original = cache.get_or_create
+    
+    async def get_then_evict(key, produce):
+        path = await original(key, produce)
+        if len(produced) == 1:
+            path.unlink()  # Another process evicted it in between
+        return path
+    
+    monkeypatch.setattr(cache, "get_or_create", get_then_evict)
+    destination = str(tmp_path / "voice.wav")
+    
+    assert asyncio.run(cache.place("e" * 64, produce, destination)) == destination
+    assert len(produced) == 2
+    assert open(destination, "rb").read() == b"voice"
@@ -0,0 +1,92 @@
+import asyncio
+import os
+
+from services.hls import HLSPlaylist, read_media_playlist
+from tests.media import requires_ffmpeg
+from tests.pipeline import insert_project
+
+
+def segments(scene_number, *durations):
+    return [(duration, f"scene_{scene_number:04d}_{index:03d}.ts") for index, duration in enumerate(durations)]
+
+
+def listed(playlist):
+    return [uri for _, uri in read_media_playlist(str(playlist.path))]
+
+
+def test_reset_writes_an_empty_live_playlist(tmp_path):
+    playlist = HLSPlaylist(tmp_path / "p1", 4)
+    (tmp_path / "p1").mkdir()
+    (tmp_path / "p1" / "stale.ts").write_bytes(b"old")
+    
+    playlist.reset()
+    
+    assert os.listdir(tmp_path / "p1") == ["playlist.m3u8"]
+    text = playlist.path.read_text()
+    assert "#EXT-X-PLAYLIST-TYPE:EVENT" in text
+    assert "#EXT-X-ENDLIST" not in text
+    assert listed(playlist) == []
+
+
+def test_only_the_finished_prefix_is_published(tmp_path):
+    playlist = HLSPlaylist(tmp_path, 4)
+    playlist.reset()
+    playlist.expect([1, 2, 3])
+    
+    # Scene 2 finishes first but can't be played before scene 1
+    playlist.add_scene(2, segments(2, 3.0))
+    assert listed(playlist) == []
+    
+    playlist.add_scene(1, segments(1, 4.0, 1.5))
+    assert listed(playlist) == ["scene_0001_000.ts", "scene_0001_001.ts", "scene_0002_000.ts"]
+    assert playlist.stats() == {"expected_scenes": 3, "packaged_scenes": 2, "published_scenes": 2, "finished": False}
+    
+    playlist.add_scene(3, segments(3, 2.0))
+    text = playlist.path.read_text()
+    # Each scene restarts its timestamps
+    assert text.count("#EXT-X-DISCONTINUITY") == 2
+    assert text.index("scene_0001_001.ts") < text.index("#EXT-X-DISCONTINUITY") < text.index("scene_0002_000.ts")
+
+
+def test_target_duration_covers_the_longest_segment(tmp_path):
+    playlist = HLSPlaylist(tmp_path, 4)
+    playlist.reset()
+    playlist.add_scene(1, segments(1, 6.2))
+    
+    assert "#EXT-X-TARGETDURATION:7" in playlist.path.read_text()
+
+
+def test_finish_lists_packaged_scenes_and_ends_the_playlist(tmp_path):
+    playlist = HLSPlaylist(tmp_path, 4)
+    playlist.reset()
+    playlist.expect([1, 2, 3])
+    playlist.add_scene(1, segments(1, 4.0))
+    playlist.add_scene(3, segments(3, 4.0))
+    
+    playlist.finish()
+    
+    # Scene 2 never packaged; the rest still play
+    assert listed(playlist) == ["scene_0001_000.ts", "scene_0003_000.ts"]
+    assert playlist.path.read_text().rstrip().endswith("#EXT-X-ENDLIST")
+
+
+@requires_ffmpeg
+def test_hls_project_publishes_every_scene(make_workflow):
+    workflow = make_workflow(HLS_OUTPUT="1", HLS_SEGMENT_SECONDS="1")
+    
+    async def run():
+        project_id = await insert_project(workflow.db)
+        await asyncio.wait_for(workflow.start_project(project_id), timeout=180)
+        return await workflow.db.projects.find_one({"id": project_id})
+    
+    project = asyncio.run(run())
+    assert project["status"] == "completed", project.get("error_message")
+    assert project["playlist_url"] == f"/output/hls/{project['id']}/playlist.m3u8"
+    
+    path = workflow.editor.hls_dir / project["id"] / "playlist.m3u8"
+    entries = read_media_playlist(str(path))
+    assert path.read_text().count("#EXT-X-DISCONTINUITY") == 1
+    assert path.read_text().rstrip().endswith("#EXT-X-ENDLIST")
+    assert abs(sum(duration for duration, _ in entries) - 4.0) < 0.3
+    for _, uri in entries:
+        assert (path.parent / uri).stat().st_size > 0
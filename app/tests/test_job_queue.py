@@ -0,0 +1,149 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+from services.job_queue import JobQueue, _timestamp
+from tests.fakes import FakeDatabase
+
+
+def make_queue():
+    queue = JobQueue(FakeDatabase())
+    queue.lease_seconds = 60
+    queue.retry_backoff = 10
+    queue.max_backoff = 600
+    queue.max_attempts = 3
+    return queue
+
+
+def expire_lease(queue: JobQueue, job_id: str):
+    for document in queue.jobs.documents:
+        if document["id"] == job_id:
+            document["lease_expires_at"] = _timestamp(datetime.now(timezone.utc) - timedelta(seconds=1))
+
+
+def test_enqueue_is_idempotent_per_project():
+    async def run():
+        queue = make_queue()
+        first = await queue.enqueue("project", "p1")
+        second = await queue.enqueue("project", "p1")
+        other = await queue.enqueue("project", "p2")
+        return queue, first, second, other
+    
+    queue, first, second, other = asyncio.run(run())
+    assert second.id == first.id
+    assert other.id != first.id
+    assert len(queue.jobs.documents) == 2
+
+
+def test_enqueue_while_running_returns_running_job():
+    async def run():
+        queue = make_queue()
+        first = await queue.enqueue("project", "p1")
+        await queue.claim("w1")
+        return queue, first, await queue.enqueue("project", "p1")
+    
+    queue, first, again = asyncio.run(run())
+    assert again.id == first.id and again.status == "running"
+
+
+def test_claim_takes_oldest_runnable_job_once():
+    async def run():
+        queue = make_queue()
+        first = await queue.enqueue("project", "p1")
+        await queue.enqueue("project", "p2")
+        return queue, first, await queue.claim("w1"), await queue.claim("w2"), await queue.claim("w3")
+    
+    queue, first, claimed, second, none = asyncio.run(run())
+    assert claimed["id"] == first.id
+    assert claimed["status"] == "running" and claimed["lease_owner"] == "w1" and claimed["attempts"] == 1
+    assert second["project_id"] == "p2"
+    assert none is None
+
+
+def test_expired_lease_is_reclaimed_and_old_owner_loses_it():
+    async def run():
+        queue = make_queue()
+        job = await queue.enqueue("project", "p1")
+        await queue.claim("w1")
+        expire_lease(queue, job.id)
+        reclaimed = await queue.claim("w2")
+        return reclaimed, await queue.heartbeat(job.id, "w1"), await queue.heartbeat(job.id, "w2")
+    
+    reclaimed, old_heartbeat, new_heartbeat = asyncio.run(run())
+    assert reclaimed["lease_owner"] == "w2" and reclaimed["attempts"] == 2
+    assert old_heartbeat is False
+    assert new_heartbeat is True
+
+
+def test_lease_expiring_too_often_fails_the_job():
+    async def run():
+        queue = make_queue()
+        job = await queue.enqueue("project", "p1")
+        for worker in ("w1", "w2", "w3"):
+            await queue.claim(worker)
+            expire_lease(queue, job.id)
+        return queue, await queue.claim("w4")
+    
+    queue, claimed = asyncio.run(run())
+    assert claimed is None
+    document = queue.jobs.documents[0]
+    assert document["status"] == "failed" and document["active"] is False
+
+
+def test_fail_retries_with_exponential_backoff_then_gives_up():
+    async def run():
+        queue = make_queue()
+        job = await queue.enqueue("project", "p1")
+        delays = []
+        for attempt in range(3):
+            # Make the retry runnable straight away so it can be claimed again
+            for document in queue.jobs.documents:
+                document["available_at"] = _timestamp(datetime.now(timezone.utc))
+            await queue.claim("w1")
+            before = datetime.now(timezone.utc)
+            await queue.fail(job.id, "w1", "boom")
+            document = queue.jobs.documents[0]
+            if document["status"] == "pending":
+                delays.append((datetime.fromisoformat(document["available_at"]) - before).total_seconds())
+        return queue.jobs.documents[0], delays
+    
+    document, delays = asyncio.run(run())
+    assert [round(delay) for delay in delays] == [10, 20]
+    assert document["status"] == "failed" and document["active"] is False
+    assert document["message"] == "boom"
+
+
+def test_completed_job_frees_the_project_for_a_new_one():
+    async def run():
+        queue = make_queue()
+        first = await queue.enqueue("project", "p1")
+        await queue.claim("w1")
+        await queue.complete(first.id, "w1")
+        return first, await queue.enqueue("project", "p1")
+    
+    first, second = asyncio.run(run())
+    assert second.id != first.id
+
+
+def test_release_hands_job_back_without_using_an_attempt():
+    async def run():
+        queue = make_queue()
+        job = await queue.enqueue("project", "p1")
+        await queue.claim("w1")
+        await queue.release(job.id, "w1")
+        return queue, await queue.claim("w2")
+    
+    queue, claimed = asyncio.run(run())
+    assert claimed["lease_owner"] == "w2"
+    assert claimed["attempts"] == 1
+
+
+def test_stats_counts_jobs_by_status():
+    async def run():
+        queue = make_queue()
+        await queue.enqueue("project", "p1")
+        await queue.enqueue("project", "p2")
+        await queue.claim("w1")
+        return await queue.stats()
+    
+    stats = asyncio.run(run())
+    assert stats["pending"] == 1 and stats["running"] == 1 and stats["ready"] == 1
@@ -0,0 +1,49 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from tests.pipeline import insert_project
+
+
+def test_projects_are_paged_through_the_cursor_header(api):
+    async def seed():
+        return [await insert_project(api.db, title=f"Project {index}") for index in range(5)]
+    
+    created = asyncio.run(seed())
+    client = TestClient(api.app)
+    
+    seen = []
+    response = client.get("/api/projects", params={"limit": 2, "view": "summary"})
+    while True:
+        assert response.status_code == 200
+        seen += [project["id"] for project in response.json()]
+        assert all("story_input" not in project for project in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        response = client.get("/api/projects", params={"limit": 2, "view": "summary", "cursor": cursor})
+    
+    # Every project exactly once, across three pages
+    assert sorted(seen) == sorted(created)
+
+
+def test_unpaged_listing_returns_every_project(api):
+    async def seed():
+        for index in range(120):
+            await insert_project(api.db, title=f"Project {index}")
+    
+    asyncio.run(seed())
+    response = TestClient(api.app).get("/api/projects")
+    assert len(response.json()) == 120
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_cursor_header_is_readable_cross_origin(api):
+    response = TestClient(api.app).get("/api/projects", headers={"Origin": "http://frontend.test"})
+    assert "X-Next-Cursor" in response.headers["access-control-expose-headers"]
+
+
+def test_listings_do_not_claim_a_response_model(api):
+    paths = TestClient(api.app).get("/openapi.json").json()["paths"]
+    for path in ("/api/projects", "/api/projects/{project_id}/scenes"):
+        assert "$ref" not in str(paths[path]["get"]["responses"]["200"])
@@ -0,0 +1,78 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from services.ffmpeg_tools import probe_media
+from tests.media import requires_ffmpeg
+from tests.pipeline import insert_project, scenes_of
+
+
+@requires_ffmpeg
+def test_preview_then_accept_renders_the_final_profile(make_workflow):
+    workflow = make_workflow()
+    
+    async def run():
+        project_id = await insert_project(workflow.db, preview_first=True, render_profile="standard")
+        await asyncio.wait_for(workflow.start_project(project_id), timeout=180)
+        preview = await workflow.db.projects.find_one({"id": project_id}), await scenes_of(workflow.db, project_id)
+        
+        # What POST /accept does before it resumes the project
+        await workflow.db.projects.update_one({"id": project_id}, {"$set": {"preview_accepted": True}})
+        await asyncio.wait_for(workflow.resume_project(project_id), timeout=180)
+        return preview, (await workflow.db.projects.find_one({"id": project_id}), await scenes_of(workflow.db, project_id))
+    
+    (preview, preview_scenes), (final, scenes) = asyncio.run(run())
+    
+    assert preview["status"] == "preview_ready", preview.get("error_message")
+    assert preview["video_url"] is None
+    assert probe_media(preview["preview_url"])["height"] == 240
+    assert {scene["render_profile"] for scene in preview_scenes} == {"preview"}
+    
+    assert final["status"] == "completed", final.get("error_message")
+    assert final["preview_url"] == preview["preview_url"]
+    media = probe_media(final["video_url"])
+    assert (media["width"], media["height"], media["fps"]) == (854, 480, 15)
+    assert {scene["render_profile"] for scene in scenes} == {"standard"}
+    # Scenes were rendered again, not reused from the preview
+    assert not {scene["video_path"] for scene in scenes} & {scene["video_path"] for scene in preview_scenes}
+
+
+class Resumes:
+    def __init__(self):
+        self.project_ids = []
+    
+    async def __call__(self, project_id):
+        self.project_ids.append(project_id)
+
+
+def test_accept_starts_the_final_render_once(api, monkeypatch):
+    resumes = Resumes()
+    monkeypatch.setattr(api.workflow_agent, "resume_project", resumes)
+    project_id = asyncio.run(insert_project(api.db, preview_first=True, status="preview_ready"))
+    client = TestClient(api.app)
+    
+    response = client.post(f"/api/projects/{project_id}/accept")
+    assert response.status_code == 200
+    assert resumes.project_ids == [project_id]
+    assert asyncio.run(api.db.projects.find_one({"id": project_id}))["preview_accepted"]
+    
+    # A second click doesn't start another render
+    assert client.post(f"/api/projects/{project_id}/accept").status_code == 409
+    assert resumes.project_ids == [project_id]
+
+
+def test_accept_needs_a_finished_preview(api, monkeypatch):
+    resumes = Resumes()
+    monkeypatch.setattr(api.workflow_agent, "resume_project", resumes)
+    processing = asyncio.run(insert_project(api.db, preview_first=True, status="processing"))
+    ready = asyncio.run(insert_project(api.db, preview_first=True, status="preview_ready"))
+    client = TestClient(api.app)
+    
+    assert client.post("/api/projects/missing/accept").status_code == 404
+    assert client.post(f"/api/projects/{processing}/accept").status_code == 409
+    
+    # The preview run is still wrapping up on this host
+    monkeypatch.setitem(api.workflow_agent.active_projects, ready, {})
+    assert client.post(f"/api/projects/{ready}/accept").status_code == 409
+    assert not asyncio.run(api.db.projects.find_one({"id": ready}))["preview_accepted"]
+    assert resumes.project_ids == []
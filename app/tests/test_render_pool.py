@@ -0,0 +1,81 @@
+import time
+import asyncio
+import subprocess
+
+import pytest
+
+from services.ffmpeg_tools import run_ffmpeg
+from services.render_pool import RenderPool, RenderTimeout
+from services.render_profiles import get_profile
+from tests.media import make_clip, make_voice, requires_ffmpeg
+
+
+def square(value: int) -> int:
+    return value * value
+
+
+def start_child_and_hang(pid_file: str):
+    """A job whose encoder never finishes."""
+    child = subprocess.Popen(["sleep", "60"])
+    with open(pid_file, "w") as f:
+        f.write(str(child.pid))
+    time.sleep(60)
+
+
+def running(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_jobs_run_in_workers():
+    pool = RenderPool(max_workers=2, job_timeout=60)
+    
+    async def run():
+        return await asyncio.gather(*(pool.submit(square, value) for value in range(4)))
+    
+    try:
+        assert asyncio.run(run()) == [0, 1, 4, 9]
+        assert pool.stats()["completed_jobs"] == 4
+    finally:
+        pool.shutdown()
+
+
+def test_timeout_kills_the_children_of_the_hung_worker(tmp_path):
+    pool = RenderPool(max_workers=1, job_timeout=60)
+    pid_file = tmp_path / "child.pid"
+    
+    async def run():
+        await pool.submit(start_child_and_hang, str(pid_file), timeout=5)
+    
+    try:
+        with pytest.raises(RenderTimeout):
+            asyncio.run(run())
+        child = int(pid_file.read_text())
+        deadline = time.monotonic() + 5
+        while running(child) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert not running(child)
+        assert pool.stats()["pool_restarts"] == 1
+        # The next job gets a fresh pool
+        assert asyncio.run(pool.submit(square, 3)) == 9
+    finally:
+        pool.shutdown()
+
+
+@requires_ffmpeg
+def test_hung_ffmpeg_is_killed_by_its_own_timeout(tmp_path):
+    settings = get_profile("standard")
+    clip = make_clip(str(tmp_path / "scene.mp4"), 3, settings)
+    voice = make_voice(str(tmp_path / "voice.wav"), 1)
+    
+    started = time.monotonic()
+    with pytest.raises(Exception, match="did not finish"):
+        # Stream copy with an unbounded apad: ffmpeg 7 never stops on its own
+        run_ffmpeg([
+            "-i", clip, "-i", voice, "-map", "0:v:0", "-map", "1:a:0",
+            "-c:v", "copy", "-af", "apad", "-c:a", "aac", "-shortest", str(tmp_path / "out.mp4")
+        ], timeout=2)
+    assert time.monotonic() - started < 10
@@ -0,0 +1,84 @@
+import asyncio
+
+from models import Scene
+
+
+class InFlight:
+    """Stands in for WorkflowAgent._process_scene and records how many scenes overlap."""
+    
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.done = []
+    
+    async def __call__(self, project_id, scene, concurrent_stages=False):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        self.done.append((project_id, scene.scene_number))
+
+
+def scenes(project_id, count):
+    return [Scene(project_id=project_id, scene_number=number, description="A scene") for number in range(1, count + 1)]
+
+
+def test_scenes_of_a_project_are_bounded_by_scene_concurrency(make_workflow, monkeypatch):
+    workflow = make_workflow(SCENE_CONCURRENCY="2", GLOBAL_SCENE_CONCURRENCY="8")
+    tracker = InFlight()
+    monkeypatch.setattr(workflow, "_process_scene", tracker)
+    
+    asyncio.run(workflow._process_scenes("p1", scenes("p1", 6)))
+    
+    assert tracker.peak == 2
+    assert sorted(tracker.done) == [("p1", number) for number in range(1, 7)]
+
+
+def test_projects_share_the_global_scene_slots(make_workflow, monkeypatch):
+    workflow = make_workflow(SCENE_CONCURRENCY="3", GLOBAL_SCENE_CONCURRENCY="4")
+    tracker = InFlight()
+    monkeypatch.setattr(workflow, "_process_scene", tracker)
+    
+    async def run():
+        await asyncio.gather(*(
+            workflow._process_scenes(project_id, scenes(project_id, 5))
+            for project_id in ("p1", "p2", "p3")
+        ))
+    
+    asyncio.run(run())
+    
+    assert tracker.peak == 4
+    assert len(tracker.done) == 15
+
+
+def test_sequential_mode_renders_one_scene_at_a_time_in_order(make_workflow, monkeypatch):
+    workflow = make_workflow(SCENE_PROCESSING_MODE="sequential", SCENE_CONCURRENCY="4")
+    tracker = InFlight()
+    monkeypatch.setattr(workflow, "_process_scene", tracker)
+    
+    asyncio.run(workflow._process_scenes("p1", scenes("p1", 4)))
+    
+    assert tracker.peak == 1
+    assert tracker.done == [("p1", number) for number in range(1, 5)]
+
+
+def test_a_failed_scene_cancels_the_rest_of_the_project(make_workflow, monkeypatch):
+    workflow = make_workflow(SCENE_CONCURRENCY="2")
+    started = []
+    
+    async def process(project_id, scene, concurrent_stages=False):
+        started.append(scene.scene_number)
+        if scene.scene_number == 1:
+            raise Exception("render failed")
+        await asyncio.sleep(0.05)
+    
+    monkeypatch.setattr(workflow, "_process_scene", process)
+    
+    async def run():
+        try:
+            await workflow._process_scenes("p1", scenes("p1", 6))
+        except Exception as e:
+            return str(e)
+    
+    assert asyncio.run(run()) == "render failed"
+    assert len(started) < 6
@@ -0,0 +1,89 @@
+import asyncio
+import os
+
+import httpx
+from fastapi.testclient import TestClient
+
+from tests.media import requires_ffmpeg
+from tests.pipeline import insert_project, scenes_of
+
+
+async def insert_scene(db, project_id, **fields):
+    scene = {"id": "scene-1", "project_id": project_id, "scene_number": 1, "description": "A meadow", "duration": 2.0, **fields}
+    await db.scenes.insert_one(scene)
+    return scene["id"]
+
+
+def test_scene_edits_are_validated(api):
+    async def seed():
+        project_id = await insert_project(api.db, breakdown_complete=True, status="completed")
+        return await insert_scene(api.db, project_id)
+    
+    scene_id = asyncio.run(seed())
+    client = TestClient(api.app)
+    
+    assert client.patch(f"/api/scenes/{scene_id}", json={}).status_code == 400
+    assert client.patch(f"/api/scenes/{scene_id}", json={"description": None}).status_code == 400
+    assert client.patch(f"/api/scenes/{scene_id}", json={"duration": None}).status_code == 400
+    assert client.patch(f"/api/scenes/{scene_id}", json={"duration": 0}).status_code == 400
+    assert client.patch("/api/scenes/missing", json={"dialogue": "Hello"}).status_code == 404
+    # Nothing was written by the rejected edits
+    assert asyncio.run(api.db.scenes.find_one({"id": scene_id}))["description"] == "A meadow"
+
+
+def test_scenes_of_running_or_unfinished_projects_can_not_be_edited(api, monkeypatch):
+    async def seed():
+        running = await insert_project(api.db, breakdown_complete=True, status="processing")
+        unfinished = await insert_project(api.db, breakdown_complete=False, status="failed")
+        return await insert_scene(api.db, running, id="running"), await insert_scene(api.db, unfinished, id="unfinished"), running
+    
+    running_scene, unfinished_scene, running = asyncio.run(seed())
+    monkeypatch.setitem(api.workflow_agent.active_projects, running, {})
+    client = TestClient(api.app)
+    
+    assert client.patch(f"/api/scenes/{running_scene}", json={"dialogue": "Hello"}).status_code == 409
+    assert client.patch(f"/api/scenes/{unfinished_scene}", json={"dialogue": "Hello"}).status_code == 409
+
+
+@requires_ffmpeg
+def test_edits_re_render_only_the_stale_stages(api, make_workflow, monkeypatch):
+    workflow = make_workflow()
+    monkeypatch.setattr(api, "workflow_agent", workflow)
+    monkeypatch.setattr(api, "db", workflow.db)
+    
+    def outputs(scene):
+        return {field: os.path.getmtime(scene[field]) for field in ("animation_path", "voice_path", "video_path")}
+    
+    async def run():
+        project_id = await insert_project(workflow.db)
+        await asyncio.wait_for(workflow.start_project(project_id), timeout=180)
+        first, second = await scenes_of(workflow.db, project_id)
+        before = [outputs(first), outputs(second)]
+        
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # The camera direction isn't rendered, so nothing is stale
+            unchanged = await client.patch(f"/api/scenes/{first['id']}", json={"camera_direction": "Close up"})
+            # The re-render runs as a background task, finished before the response is returned here
+            voiced = await client.patch(f"/api/scenes/{second['id']}", json={"dialogue": "A brand new line"})
+            redrawn = await client.patch(f"/api/scenes/{first['id']}", json={"description": "A dark forest"})
+        
+        project = await workflow.db.projects.find_one({"id": project_id})
+        return unchanged.json(), voiced.json(), redrawn.json(), before, await scenes_of(workflow.db, project_id), project
+    
+    unchanged, voiced, redrawn, before, (first, second), project = asyncio.run(run())
+    
+    assert unchanged["stale"] == []
+    assert voiced["stale"] == ["voice", "video"]
+    assert redrawn["stale"] == ["animation", "video"]
+    assert project["status"] == "completed", project.get("error_message")
+    assert first["camera_direction"] == "Close up"
+    assert second["dialogue"] == "A brand new line"
+    
+    after = [outputs(first), outputs(second)]
+    # Scene 1 was redrawn but kept its voice; scene 2 was voiced again but kept its animation
+    assert after[0]["animation_path"] > before[0]["animation_path"]
+    assert after[0]["voice_path"] == before[0]["voice_path"]
+    assert after[1]["animation_path"] == before[1]["animation_path"]
+    assert after[1]["voice_path"] > before[1]["voice_path"]
+    assert all(after[index]["video_path"] > before[index]["video_path"] for index in (0, 1))
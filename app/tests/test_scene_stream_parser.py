@@ -0,0 +1,116 @@
+import json
+import asyncio
+
+from tests.fakes import FakeLlmChat, install_llm_stub
+from tests.media import requires_ffmpeg
+from tests.pipeline import insert_project, scenes_of
+
+install_llm_stub()
+
+import agents.director_agent as director_agent
+from agents.director_agent import DirectorAgent, SceneStreamParser
+
+SCENES = [
+    {"scene_number": 1, "description": 'A sign reads "OPEN {daily}" over the door', "dialogue": "Hi\\there", "duration": 4},
+    {"scene_number": 2, "description": "Rain", "props": [{"name": "umbrella"}, {"name": "boots"}], "duration": 3},
+    {"scene_number": 3, "description": "Sunset ] over } the hills", "dialogue": None, "duration": 5}
+]
+RESPONSE = "Here is the breakdown:\n```json\n" + json.dumps(
+    {"title": "Test", "credits": [{"name": "not a scene"}], "scenes": SCENES}, indent=2
+) + "\n```"
+
+
+def feed_in_chunks(text, size):
+    parser = SceneStreamParser()
+    scenes = []
+    for start in range(0, len(text), size):
+        scenes.extend(parser.feed(text[start:start + size]))
+    return scenes
+
+
+def test_parser_returns_each_scene_whatever_the_chunking():
+    for size in (1, 2, 7, 64, len(RESPONSE)):
+        assert feed_in_chunks(RESPONSE, size) == SCENES
+
+
+def test_parser_returns_a_scene_once_its_closing_brace_arrives():
+    parser = SceneStreamParser()
+    text = json.dumps({"scenes": SCENES})
+    first_end = text.index("}, {") + 1
+    
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1:first_end]) == [SCENES[0]]
+    assert parser.feed(text[first_end:]) == SCENES[1:]
+
+
+def test_parser_tolerates_trailing_commas_and_skips_broken_scenes():
+    text = '{"scenes": [{"scene_number": 1, "duration": 4,}, {"scene_number": 2, "duration": oops}, {"scene_number": 3}]}'
+    assert feed_in_chunks(text, 5) == [{"scene_number": 1, "duration": 4}, {"scene_number": 3}]
+
+
+class StreamingChat(FakeLlmChat):
+    """Streams the canned response in small chunks and counts what it has sent."""
+    
+    sent = 0
+    
+    async def stream_message(self, message):
+        for start in range(0, len(RESPONSE), 16):
+            StreamingChat.sent = start + 16
+            yield RESPONSE[start:start + 16]
+            await asyncio.sleep(0)
+
+
+def test_stream_scenes_yields_scenes_before_the_response_ends(monkeypatch):
+    monkeypatch.setattr(director_agent, "LlmChat", StreamingChat)
+    director = DirectorAgent()
+    
+    async def run():
+        return [(scene, StreamingChat.sent) async for scene in director.stream_scenes("A story")]
+    
+    received = asyncio.run(run())
+    assert [scene for scene, _ in received] == SCENES
+    assert received[0][1] < len(RESPONSE) // 2
+
+
+def test_stream_scenes_caches_the_breakdown(monkeypatch):
+    monkeypatch.setattr(director_agent, "LlmChat", StreamingChat)
+    director = DirectorAgent()
+    
+    async def collect():
+        return [scene async for scene in director.stream_scenes("A story")]
+    
+    assert asyncio.run(collect()) == SCENES
+    assert asyncio.run(collect()) == SCENES
+    assert (director.cache_hits, director.cache_misses) == (1, 1)
+    assert asyncio.run(director.analyze_story("A story")) == json.loads(RESPONSE.split("```json")[1].split("```")[0])
+
+
+def test_stream_scenes_falls_back_when_no_scene_parses(monkeypatch):
+    class Rambling(FakeLlmChat):
+        async def send_message(self, message):
+            return "I would rather not."
+    
+    monkeypatch.setattr(director_agent, "LlmChat", Rambling)
+    
+    async def collect():
+        return [scene async for scene in DirectorAgent().stream_scenes("A fox and a river")]
+    
+    scenes = asyncio.run(collect())
+    assert len(scenes) == 1
+    assert scenes[0]["description"] == "A fox and a river"
+
+
+@requires_ffmpeg
+def test_streamed_project_completes_with_every_scene(make_workflow):
+    workflow = make_workflow(DIRECTOR_STREAMING="1")
+    
+    async def run():
+        project_id = await insert_project(workflow.db)
+        await asyncio.wait_for(workflow.start_project(project_id), timeout=180)
+        return await workflow.db.projects.find_one({"id": project_id}), await scenes_of(workflow.db, project_id)
+    
+    project, scenes = asyncio.run(run())
+    assert project["status"] == "completed", project.get("error_message")
+    assert project["breakdown_complete"]
+    assert project["total_scenes"] == project["completed_scenes"] == 2
+    assert [scene["status"] for scene in scenes] == ["completed", "completed"]
@@ -0,0 +1,99 @@
+import asyncio
+
+from services.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+        
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "voice.mp3"
+        
+        results = await asyncio.gather(*(flight.do("line", work) for _ in range(3)))
+        return flight, calls, results
+    
+    flight, calls, results = asyncio.run(run())
+    assert results == ["voice.mp3"] * 3
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "executed": 1, "shared": 2}
+
+
+def test_cancelling_first_caller_does_not_cancel_waiters():
+    async def run():
+        flight = SingleFlight()
+        
+        async def work():
+            await asyncio.sleep(0.05)
+            return "voice.mp3"
+        
+        first = asyncio.create_task(flight.do("line", work))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flight.do("line", work))
+        await asyncio.sleep(0)
+        
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        return first, await second
+    
+    first, result = asyncio.run(run())
+    assert first.cancelled()
+    assert result == "voice.mp3"
+
+
+def test_work_is_cancelled_once_every_caller_is():
+    async def run():
+        flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = []
+        
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        
+        callers = [asyncio.create_task(flight.do("line", work)) for _ in range(2)]
+        await started.wait()
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        return flight, cancelled
+    
+    flight, cancelled = asyncio.run(run())
+    assert cancelled == [True]
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_errors_reach_every_caller():
+    async def run():
+        flight = SingleFlight()
+        
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("tts down")
+        
+        return await asyncio.gather(*(flight.do("line", work) for _ in range(2)), return_exceptions=True)
+    
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_key_is_free_again_after_completion():
+    async def run():
+        flight = SingleFlight()
+        
+        async def work():
+            return len(flight._inflight)
+        
+        await flight.do("line", work)
+        await flight.do("line", work)
+        return flight
+    
+    assert asyncio.run(run()).executed == 2
@@ -0,0 +1,135 @@
+import asyncio
+
+from pymongo.errors import BulkWriteError
+
+from services.write_coalescer import WriteCoalescer, merge_ops
+from tests.fakes import FakeCollection, FakeDatabase
+
+
+def test_set_last_wins():
+    ops = {}
+    merge_ops(ops, set={"status": "animating", "voice_path": "a.mp3"})
+    merge_ops(ops, set={"status": "completed"})
+    assert ops == {"$set": {"status": "completed", "voice_path": "a.mp3"}}
+
+
+def test_inc_summed():
+    ops = {}
+    merge_ops(ops, inc={"completed_scenes": 1})
+    merge_ops(ops, inc={"completed_scenes": 2, "total_scenes": 1})
+    assert ops == {"$inc": {"completed_scenes": 3, "total_scenes": 1}}
+
+
+def test_inc_folded_into_pending_set():
+    ops = {}
+    merge_ops(ops, set={"completed_scenes": 4})
+    merge_ops(ops, inc={"completed_scenes": 1})
+    assert ops == {"$set": {"completed_scenes": 5}}
+
+
+def test_set_replaces_pending_inc():
+    ops = {}
+    merge_ops(ops, inc={"completed_scenes": 1})
+    merge_ops(ops, set={"completed_scenes": 0})
+    assert ops == {"$set": {"completed_scenes": 0}}
+
+
+def test_flush_coalesces_updates_into_one_round_trip():
+    async def run():
+        db = FakeDatabase()
+        await db.scenes.insert_one({"id": "s1", "status": "pending", "count": 0})
+        writes = WriteCoalescer(db, window=60)
+        writes.update("scenes", "s1", set={"status": "animating"})
+        writes.update("scenes", "s1", set={"status": "completed"}, inc={"count": 2})
+        await writes.flush()
+        return db, writes
+    
+    db, writes = asyncio.run(run())
+    assert db.scenes.documents[0]["status"] == "completed"
+    assert db.scenes.documents[0]["count"] == 2
+    assert writes.round_trips == 1
+
+
+class FailingCollection(FakeCollection):
+    """Refuses bulk writes while `error` is set."""
+    
+    error = None
+    
+    async def bulk_write(self, requests, ordered=True):
+        if self.error is not None:
+            raise self.error
+        return await super().bulk_write(requests, ordered=ordered)
+
+
+class FailingDatabase(FakeDatabase):
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = FailingCollection(self.latency)
+        return self.collections[name]
+
+
+def test_failed_flush_keeps_updates_and_raises():
+    async def run():
+        db = FailingDatabase()
+        await db.scenes.insert_one({"id": "s1", "status": "pending", "count": 0})
+        db.scenes.error = ConnectionError("primary stepped down")
+        writes = WriteCoalescer(db, window=60)
+        writes.update("scenes", "s1", set={"animation_path": "a.mp4"}, inc={"count": 1})
+        
+        try:
+            await writes.flush()
+            raise AssertionError("flush should have raised")
+        except ConnectionError:
+            pass
+        
+        # Queued after the failure: newer values win over the requeued batch
+        writes.update("scenes", "s1", set={"status": "completed"}, inc={"count": 1})
+        db.scenes.error = None
+        await writes.flush()
+        return db
+    
+    document = asyncio.run(run()).scenes.documents[0]
+    assert document["animation_path"] == "a.mp4"
+    assert document["status"] == "completed"
+    assert document["count"] == 2
+
+
+def test_partial_bulk_write_error_requeues_only_failed_documents():
+    async def run():
+        db = FailingDatabase()
+        for doc_id in ("s1", "s2"):
+            await db.scenes.insert_one({"id": doc_id, "count": 0})
+        db.scenes.error = BulkWriteError({"writeErrors": [{"index": 1, "code": 112, "errmsg": "write conflict"}]})
+        writes = WriteCoalescer(db, window=60)
+        writes.update("scenes", "s1", inc={"count": 1})
+        writes.update("scenes", "s2", inc={"count": 1})
+        
+        try:
+            await writes.flush()
+        except BulkWriteError:
+            pass
+        return writes
+    
+    writes = asyncio.run(run())
+    assert list(writes._pending["scenes"]) == ["s2"]
+
+
+def test_permanent_write_errors_are_dropped_not_retried():
+    async def run():
+        db = FailingDatabase()
+        await db.scenes.insert_one({"id": "s1", "count": 0})
+        await db.projects.insert_one({"id": "p1", "completed_scenes": 0})
+        db.scenes.error = BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "duplicate key"}]})
+        writes = WriteCoalescer(db, window=60)
+        writes.update("scenes", "s1", set={"status": "completed"})
+        writes.update("projects", "p1", inc={"completed_scenes": 1})
+        
+        # Nothing left that a retry could fix, so the flush succeeds
+        await writes.flush()
+        return db, writes
+    
+    db, writes = asyncio.run(run())
+    assert writes._pending == {}
+    assert writes.stats()["dropped_updates"] == 1
+    # The rest of the flush still went out
+    assert db.projects.documents[0]["completed_scenes"] == 1